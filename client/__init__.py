@@ -1,10 +1,22 @@
 from .base import MCPClientBase
-from .openai import MCPClientOpenAI
-from .deepseek import MCPClientDeepSeek
-from .siliconflow import MCPClientSiliconflow
-from .ollama import MCPClientLocalOllama
-from .claude import MCPClientClaude
-from .openrouter import MCPClientOpenRouter
+from .registry import CLIENT_MODULES, load_client, load_all_clients
+
+# 客户端在首次访问时才导入(例如 client.MCPClientDeepSeek), 避免启动时导入所有服务商
+LAZY_ATTRIBUTES = {"ProviderConfig": ".router"}
+
+
+def __getattr__(name: str):
+    if name in CLIENT_MODULES:
+        return load_client(name)
+    if name in LAZY_ATTRIBUTES:
+        import importlib
+        return getattr(importlib.import_module(LAZY_ATTRIBUTES[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(CLIENT_MODULES) + list(LAZY_ATTRIBUTES))
+
 
 def register():
     pass
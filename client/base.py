@@ -1,19 +1,30 @@
 import json
-import math
-import random
 import queue
 import asyncio
-import requests
-from threading import Thread
-from copy import deepcopy
+import concurrent.futures
+import httpx
+from threading import Lock, Thread
+from functools import partial
+from copy import copy
 from dataclasses import dataclass
-from typing import Union, Literal
+from typing import TYPE_CHECKING, Union, Literal
 from contextlib import AsyncExitStack
-from mcp import ClientSession
-from mcp.client.sse import sse_client
 from pathlib import Path
 
 from logger import getLogger
+from metrics import Metrics, MetricsExporter
+from .http_pool import HttpPool
+from .history import HistoryManager
+from .model_cache import ModelCache
+from .output import ConsoleSink, OutputSink
+from .sse import SSEEvent
+from .message import make_message
+from .utils import IncrementalJsonParser, lenient_json_loads
+from .registry import CLIENT_MODULES, load_all_clients, load_client
+
+if TYPE_CHECKING:
+    # mcp 导入较慢, 只在连接服务器时导入
+    from mcp import ClientSession, types
 
 # 设置日志
 logger = getLogger("BaseClient")
@@ -42,6 +53,36 @@ class ContentTool:
 ContentType = Union[ContentEmpty, ContentText, ContentTool]
 
 
+@dataclass
+class Command:
+    query: str
+    conversation_id: str = None
+    future: concurrent.futures.Future = None
+
+
+class CommandQueue(queue.Queue):
+    """
+    命令队列, put 时立即唤醒客户端的事件循环(替代轮询)
+    """
+
+    def __init__(self, maxsize=0):
+        super().__init__(maxsize)
+        self.waker = None
+
+    def _put(self, item):
+        super()._put(item)
+        self.wakeup()
+
+    def wakeup(self):
+        if not (waker := self.waker):
+            return
+        try:
+            waker()
+        except RuntimeError:
+            # 事件循环已关闭
+            self.waker = None
+
+
 class ResponseParser:
     @staticmethod
     def parse_response(response: str) -> ContentType:
@@ -63,23 +104,38 @@ class MCPClientBase:
     param: stream: bool = True
     param: mcp_url: str = "http://localhost:45677/sse"
     param: session: ClientSession = None
+    param: server_tools: list = None 服务器工具列表缓存, 收到 tools/list_changed 通知后失效
     param: messages: list = []
     param: tool_calls: dict = {}
+    param: tool_call_parsers: dict = {} 每个工具调用的增量参数解析器
+    param: tool_tasks: dict = {} 正在执行的工具调用
+    param: max_tool_concurrency: int = 4 同一会话同时执行的工具调用数量
+    param: tool_result_max_chars: int = 20000 写入 messages 的单个文本工具结果最大字符数, 为 0 时不限制
     param: should_clear_messages: bool = False
     param: command_processing: bool = False
     param: use_history: bool = False
+    param: history: HistoryManager = HistoryManager() 历史消息压缩(token 预算), 每轮请求前执行
+    param: output: OutputSink = ConsoleSink() 流式输出(文本, 工具调用)的接收端, OutputSink() 不输出
     param: models: list = []
     param: exit_stack: AsyncExitStack = AsyncExitStack()
     param: should_stop: bool = False
     param: skip_current_command: bool = False
-    param: command_queue: queue.Queue = queue.Queue()
+    param: command_queue: CommandQueue = CommandQueue()
     param: is_running: bool = False
     param: client_pools: dict[object, "MCPClientBase"] = {}
+    param: max_concurrency: int = 1 同时处理的会话(命令)数量
+    param: conversations: dict[str, "MCPClientBase"] = {} 共享连接的独立会话
+    param: parent: "MCPClientBase" = None 会话所属的客户端实例
+    param: http_pool: HttpPool = HttpPool 共享的HTTP连接池
+    param: metrics_port: int = None Prometheus 指标采集端口(客户端进程), 为空时不提供采集接口
     """
     # region MCPClientBase类
     # endregion MCPClientBase类
     client_pools: dict[object, "MCPClientBase"] = {}
+    http_pool = HttpPool
     __clients__: dict[str, "MCPClientBase"] = {}
+    # 会话从客户端实例读取(而不是复制)的配置, 修改客户端实例的配置后所有会话立即生效
+    shared_config = ("_base_url", "api_key", "model", "stream", "mcp_url", "timeout", "use_history", "history", "output")
 
     def __init__(
             self, 
@@ -88,6 +144,7 @@ class MCPClientBase:
             model="", 
             stream=True, 
             mcp_url:str="http://localhost:45677/sse",
+            register: bool = True,
             **kwargs
         ):
         self._base_url = ""
@@ -96,22 +153,48 @@ class MCPClientBase:
         self.model = model
         self.stream = stream
         self.mcp_url = mcp_url
-        self.session: ClientSession = None
+        self.session: "ClientSession" = None
+        self.server_tools: "list[types.Tool]" = None
         self.messages = []
         self.tool_calls: dict[str, dict] = {}
+        self.tool_call_parsers: dict[int, IncrementalJsonParser] = {}
+        self.tool_tasks: dict[int, asyncio.Task] = {}
+        self.max_tool_concurrency = 4
+        self.tool_result_max_chars = 20000
+        self.tool_semaphore: asyncio.Semaphore = None
         self.should_clear_messages = False
         self.command_processing = False
         self.use_history = False
+        self.history = HistoryManager()
+        self.output: OutputSink = ConsoleSink()
         self.models = []
         self.exit_stack = AsyncExitStack()
         self.should_stop = False
         self.skip_current_command = False
-        self.command_queue = queue.Queue()
+        self.command_queue = CommandQueue()
         self.is_running = False
-        self.push_instance(self)
+        self.timeout = httpx.Timeout(60, connect=10)
+        self.loop: asyncio.AbstractEventLoop = None
+        self.query_task: asyncio.Task = None
+        self.max_concurrency = 1
+        self.conversations: dict[str, "MCPClientBase"] = {}
+        self.conversations_lock = Lock()
+        self.parent: "MCPClientBase" = None
+        self.command_lock: asyncio.Lock = None
+        self.metrics_port: int = kwargs.get("metrics_port")
+        if register:
+            # register=False 时只作为配置对象使用(例如路由客户端的后端), 不替换客户端池中的实例
+            self.push_instance(self)
         self.reset_config()
         self.clear_messages()
 
+    def __getattr__(self, name: str):
+        # 只有实例中不存在该属性时才会调用: 会话的共享配置从所属的客户端实例读取
+        parent = self.__dict__.get("parent")
+        if parent is not None and name in self.shared_config:
+            return getattr(parent, name)
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
     @property
     def base_url(self):
         return self._base_url
@@ -126,14 +209,22 @@ class MCPClientBase:
         :param message: 消息内容
         """
         # 这里可以根据实际需求实现具体逻辑，例如将消息添加到某个列表中
-        print(f"Pushing stream message: {message}")
+        # 控制台输出由 self.output 负责, 这里不再逐个分片打印
 
     def push_message(self, message):
         """
-        推送消息
+        推送消息, 消息转换为只读结构后直接保存引用, 不复制内容
         :param message: 消息内容
         """
-        self.messages.append(deepcopy(message))
+        self.messages.append(make_message(message))
+
+    def compact_history(self):
+        """
+        按 token 预算压缩历史消息(原地修改 messages, 请求体引用的是同一个列表)
+        """
+        compacted = self.history.compact(self.messages)
+        if compacted is not self.messages:
+            self.messages[:] = compacted
 
     def clear_messages(self):
         """
@@ -162,19 +253,68 @@ class MCPClientBase:
     def get_chat_url(self):
         return ""
 
+    def get_http_client(self) -> httpx.Client:
+        """
+        获取共享连接池中的同步HTTP客户端(用于获取模型列表等)
+        """
+        return self.http_pool.get_client(self.base_url)
+
+    def get_async_http_client(self) -> httpx.AsyncClient:
+        """
+        获取共享连接池中当前事件循环的异步HTTP客户端, 在多次查询和多轮工具调用之间复用连接
+        """
+        return self.http_pool.get_async_client(self.base_url)
+
+    def model_cache_key(self) -> str:
+        return ModelCache.make_key(type(self).__name__, self.base_url, self.api_key)
+
     def fetch_models(self, force=False) -> list:
         """
-        获取模型列表
+        获取模型列表, 使用共享的磁盘缓存, 缓存过期时先返回旧列表并在后台刷新
+        每次都经过 ModelCache(内存命中时开销很小), 修改 base_url/api_key 后使用对应服务商的列表
         :param force: 是否强制刷新模型列表
         :return: 模型列表
         """
-        # 如果模型列表已经存在且不强制刷新，则直接返回
-        if self.models and not force:
-            return self.models
-        logger.info("正在获取模型列表...")
-        self.models = sorted(self.fetch_models_ex())
+        key = self.model_cache_key()
+        self.models = ModelCache.get(
+            key,
+            self.fetch_models_ex,
+            force=force,
+            on_refresh=partial(self.set_models, key),
+            provider=type(self).__name__,
+            base_url=self.base_url,
+        )
         return self.models
 
+    def set_models(self, key: str, models: list):
+        """
+        后台刷新完成后更新模型列表, 期间切换了服务商(缓存键变化)时忽略
+        """
+        if key == self.model_cache_key():
+            self.models = models
+
+    async def fetch_models_async(self, force=False) -> list:
+        """
+        异步获取模型列表(在线程中执行, 不阻塞事件循环)
+        """
+        return await asyncio.to_thread(self.fetch_models, force)
+
+    def prefetch_models(self) -> concurrent.futures.Future:
+        """
+        在后台获取模型列表(例如界面启动时), 不阻塞调用方
+        :return: Future, 结果为模型列表
+        """
+        future = concurrent.futures.Future()
+
+        def run():
+            try:
+                future.set_result(self.fetch_models())
+            except Exception as e:
+                future.set_exception(e)
+
+        Thread(target=run, name="PrefetchModels", daemon=True).start()
+        return future
+
     def fetch_models_ex(self):
         return []
 
@@ -221,6 +361,7 @@ class MCPClientBase:
         """
         获取所有客户端的名称、描述和版本
         """
+        load_all_clients()
         return [(c.__name__, c.info()["name"], c.info()["description"]) for c in cls.get_all_clients()]
 
     @classmethod
@@ -230,9 +371,12 @@ class MCPClientBase:
     @classmethod
     def get_client_by_name(cls, name: str) -> "MCPClientBase":
         """
-        根据名称获取客户端
+        根据名称获取客户端, 已注册的客户端只导入其所在的模块
         """
+        if name not in cls.__clients__ and name in CLIENT_MODULES:
+            cls.__clients__[name] = load_client(name)
         if name not in cls.__clients__:
+            # 未注册的客户端(例如外部定义的子类), 从已导入的子类中查找
             for c in cls.get_all_clients():
                 cls.__clients__[c.__name__] = c
         return cls.__clients__[name]
@@ -245,6 +389,7 @@ class MCPClientBase:
         if not (instance := cls.pop_instance()):
             return
         instance.should_stop = True
+        instance.command_queue.wakeup()
 
     @classmethod
     def try_start_client(cls):
@@ -267,8 +412,82 @@ class MCPClientBase:
         job = Thread(target=run_client, daemon=True)
         job.start()
 
+    def submit(self, query: str, conversation_id: str = None) -> concurrent.futures.Future:
+        """
+        提交命令(线程安全), 立即唤醒事件循环处理
+        :param query: 命令内容
+        :param conversation_id: 会话ID, 为空时使用默认会话
+        :return: Future, 结果为模型的最终回复; 在协程中可以通过 asyncio.wrap_future 等待
+        """
+        future = concurrent.futures.Future()
+        root = self.root()
+        root.command_queue.put(Command(query, conversation_id, future))
+        if root.should_stop:
+            # 客户端已停止, 不会再处理队列中的命令
+            root.cancel_pending_commands()
+        return future
+
     def should_skip(self):
-        return self.skip_current_command or self.should_stop
+        return self.skip_current_command or self.root().should_stop
+
+    def root(self) -> "MCPClientBase":
+        """
+        获取会话所属的客户端实例(非会话时为自身)
+        """
+        return self.parent or self
+
+    def fork(self) -> "MCPClientBase":
+        """
+        创建一个独立会话: 拥有自己的 messages 和 tool_calls,
+        共享 MCP 会话, HTTP 连接池, 工具缓存和配置(shared_config 从客户端实例读取, 在会话中赋值只影响该会话)
+        """
+        conversation = copy(self)
+        for name in self.shared_config:
+            conversation.__dict__.pop(name, None)
+        conversation.parent = self
+        conversation.messages = []
+        conversation.tool_calls = {}
+        conversation.tool_call_parsers = {}
+        conversation.tool_tasks = {}
+        conversation.tool_semaphore = None
+        conversation.conversations = {}
+        conversation.should_clear_messages = False
+        conversation.skip_current_command = False
+        conversation.command_processing = False
+        conversation.query_task = None
+        conversation.command_lock = asyncio.Lock()
+        return conversation
+
+    def get_conversation(self, conversation_id: str = None) -> "MCPClientBase":
+        """
+        获取会话, 不存在时创建; conversation_id 为空时返回客户端实例本身
+        """
+        root = self.root()
+        if conversation_id is None:
+            return root
+        with root.conversations_lock:
+            if not (conversation := root.conversations.get(conversation_id)):
+                conversation = root.conversations[conversation_id] = root.fork()
+        return conversation
+
+    def close_conversation(self, conversation_id: str):
+        """
+        关闭会话, 正在处理的命令会被取消
+        """
+        root = self.root()
+        with root.conversations_lock:
+            conversation = root.conversations.pop(conversation_id, None)
+        if conversation:
+            conversation.cancel_command()
+
+    def cancel_command(self):
+        """
+        取消当前命令(线程安全), 正在等待的网络请求会被立即中断
+        """
+        self.skip_current_command = True
+        if not self.loop or not self.query_task:
+            return
+        self.loop.call_soon_threadsafe(self.query_task.cancel)
 
     def system_prompt(self):
         # region prompt
@@ -289,6 +508,9 @@ class MCPClientBase:
     async def connect_to_server(self):
         """连接到MCP服务器"""
         # region 连接到MCP服务器
+        from mcp import ClientSession
+        from mcp.client.sse import sse_client
+
         try:
             headers = {
                 "Content-Type": "application/json",
@@ -296,7 +518,9 @@ class MCPClientBase:
             }
             stdio_transport = await self.exit_stack.enter_async_context(sse_client(url=self.mcp_url, headers=headers))
             self.stdio, self.write = stdio_transport
-            self.session = await self.exit_stack.enter_async_context(ClientSession(self.stdio, self.write))
+            self.session = await self.exit_stack.enter_async_context(
+                ClientSession(self.stdio, self.write, message_handler=self.handle_server_message)
+            )
             await self.session.initialize()
         except Exception as e:
             logger.error(f"连接失败: {e}")
@@ -304,30 +528,81 @@ class MCPClientBase:
             raise
         # endregion 连接到MCP服务器
         # 列出可用工具
-        response = await self.session.list_tools()
-        tools = response.tools
+        tools = await self.list_server_tools(force=True)
         print("\n已连接到服务器，可用工具:", [tool.name for tool in tools])
 
+    async def handle_server_message(self, message):
+        """
+        处理服务器主动发送的消息, 工具列表变化时使工具缓存失效
+        """
+        from mcp import types
+
+        if not isinstance(message, types.ServerNotification):
+            return
+        if isinstance(message.root, types.ToolListChangedNotification):
+            logger.info("服务器工具列表已变化")
+            self.refresh_tools()
+
+    def refresh_tools(self):
+        """
+        使工具缓存失效, 下次查询时重新获取工具列表
+        """
+        self.root().server_tools = None
+
+    async def list_server_tools(self, force=False) -> "list[types.Tool]":
+        """
+        获取服务器工具列表(带缓存, 所有会话共享)
+        :param force: 是否强制刷新
+        """
+        root = self.root()
+        if root.server_tools is None or force:
+            response = await self.session.list_tools()
+            root.server_tools = response.tools
+        return root.server_tools
+
 
-    def parse_line(self, line: str) -> dict:
-        # logger.info(f"{self.api_key} {self.model} {self.stream}")
-        # logger.info(f"当前命令: {self.command_queue.queue}")
-        # logger.info(f"原始行: {line}")
+    def parse_line(self, line: str | bytes) -> dict:
+        """
+        解析单行数据(兼容旧接口), 只去掉行首的 data: 字段名
+        """
         if not line:
             return {}
-        line = line.decode("utf-8").replace("data:", "").strip()
-        # logger.info(f"解析行: {line}")
-        if line.endswith(("[DONE]", "PROCESSING")):
+        if isinstance(line, str):
+            line = line.encode("utf-8")
+        line = line.strip()
+        if line.startswith(b"data:"):
+            line = line[5:]
+        return self.parse_data(line)
+
+    @Metrics.timed("client_parse_line_seconds")
+    def parse_event(self, event: SSEEvent) -> dict:
+        """
+        解析 SSE 事件
+        """
+        if event.event == "error":
+            logger.error(event.data.decode("utf-8", "replace"))
+            return {}
+        return self.parse_data(event.data)
+
+    def parse_data(self, data: bytes) -> dict:
+        """
+        解析事件数据
+        注意: json.loads(bytes) 会先在 Python 层检测编码, 比直接解码再解析慢一倍, 这里先用 C 实现的 decode 解码
+        """
+        data = data.strip()
+        if not data:
+            return {}
+        if data.endswith((b"[DONE]", b"PROCESSING")):
             return {}
-        if line.endswith("[ERROR]"):
-            logger.error(line)
+        if data.endswith(b"[ERROR]"):
+            logger.error(data.decode("utf-8", "replace"))
             return {}
         try:
-            return json.loads(line)
+            return json.loads(data.decode("utf-8"))
         except Exception:
-            if "PROCESSING" in line:
+            if b"PROCESSING" in data:
                 return {}
-            logger.error(f"Json解析错误: {line}")
+            logger.error(f"Json解析错误: {data.decode('utf-8', 'replace')}")
         return {}
 
     def parse_error(self, error: dict):
@@ -344,54 +619,127 @@ class MCPClientBase:
         if not arguments.startswith("{") or not arguments.endswith("}"):
             raise json.JSONDecodeError("参数格式错误", arguments, 0)
         try:
-            try:
-                return eval(arguments, {"math": math, "random": random})
-            except Exception:
-                pass
-            return json.loads(arguments)
+            return lenient_json_loads(arguments)
         except Exception as e:
             logger.error(f"\n错误参数: {arguments}\n")
             raise e
 
+    def clear_tool_calls(self):
+        self.tool_calls.clear()
+        self.tool_call_parsers.clear()
+        self.cancel_tool_calls()
+
+    def append_tool_call(self, index: int, tool_call: dict):
+        """
+        记录工具调用的第一条数据(不含参数), 参数统一由 append_tool_arguments 拼接
+        """
+        function = {**tool_call.get("function", {}), "arguments": ""}
+        self.tool_calls[index] = {**tool_call, "function": function}
+        self.tool_call_parsers[index] = IncrementalJsonParser()
+
+    @Metrics.timed("client_tool_arguments_seconds")
+    def append_tool_arguments(self, index: int, arguments: str):
+        """
+        拼接流式输出的参数, 同时增量扫描新增的片段
+        """
+        self.tool_calls[index]["function"]["arguments"] += arguments
+        self.tool_call_parsers[index].feed(arguments)
+
     def ensure_tool_call(self, index: int):
-        tool_call = self.tool_calls[index]
-        func = tool_call.get("function", {})
-        try:
-            arguments = func.get("arguments", "").strip()
-            self.parse_arguments(arguments)
-        except Exception:
+        if not (parser := self.tool_call_parsers.get(index)):
             return False
-        return True
+        return parser.ok()
 
     async def call_tool(self, index: int):
         """调用工具"""
         # region 调用工具
         # endregion 调用工具
+        for message in await self.execute_tool_call(*self.pop_tool_call(index)):
+            self.push_message(message)
+
+    def pop_tool_call(self, index: int) -> tuple[dict, IncrementalJsonParser]:
+        """
+        取出工具调用及其参数解析器, 之后的流式数据不再拼接到该工具调用
+        """
+        return self.tool_calls.pop(index), self.tool_call_parsers.pop(index, None)
+
+    def start_tool_call(self, index: int):
+        """
+        在后台开始执行工具调用, 结果由 finish_tool_calls 按顺序写入 messages
+        """
+        task = asyncio.create_task(self.execute_tool_call(*self.pop_tool_call(index)))
+        self.tool_tasks[index] = task
+
+    async def finish_tool_calls(self):
+        """
+        强制执行剩余的工具调用, 等待所有工具调用完成后按 index 顺序写入 messages
+        """
+        for index in list(self.tool_calls):
+            # 最后强制调用一次, 如果有报错信息会写入messages
+            self.start_tool_call(index)
+        indexes = sorted(self.tool_tasks)
+        try:
+            results = await asyncio.gather(*(self.tool_tasks[index] for index in indexes))
+        finally:
+            self.cancel_tool_calls()
+        for messages in results:
+            for message in messages:
+                self.push_message(message)
 
-        tool_call = self.tool_calls[index]
+    def cancel_tool_calls(self):
+        for task in self.tool_tasks.values():
+            task.cancel()
+        self.tool_tasks.clear()
+
+    async def execute_tool_call(self, tool_call: dict, parser: IncrementalJsonParser = None) -> list[dict]:
+        """
+        执行工具调用(同一会话最多 max_tool_concurrency 个同时执行)
+        :return: 需要写入 messages 的消息
+        """
         func = tool_call.get("function", {})
         fn_name = func.get("name")
         arguments = func.get("arguments", "").strip() or "{}"
         logger.info(f"尝试工具: {fn_name} 参数: {arguments}")
-        results = await self.call_tool_ex(fn_name, arguments)
-        self.tool_calls.pop(index)
-        self.push_message({"role": "assistant", "content": "", "tool_calls": [tool_call]})
+        # 增量解析器已经解析过的参数直接使用, 否则(强制调用)按完整字符串解析
+        if parser and parser.ok():
+            arguments = parser.result()
+        if self.tool_semaphore is None:
+            self.tool_semaphore = asyncio.Semaphore(self.max_tool_concurrency)
+        async with self.tool_semaphore:
+            results = await self.call_tool_ex(fn_name, arguments)
+        messages = [{"role": "assistant", "content": "", "tool_calls": [tool_call]}]
         for rtype, result in results:
+            if rtype in {"text", "error"}:
+                result = self.limit_tool_result(result)
             final_result = f"Selected tool: {fn_name}\nResult: {result}"
             tool_call_result = {"role": "tool", "content": final_result, "tool_call_id": tool_call["id"], "name": fn_name}
-            self.push_message(tool_call_result)
+            messages.append(tool_call_result)
+        return messages
+
+    def limit_tool_result(self, result: str) -> str:
+        """
+        限制反馈给模型的工具结果长度, 超出部分可以由模型通过 read_tool_result 分页读取(如果服务器支持)
+        """
+        limit = self.tool_result_max_chars
+        if not limit or not isinstance(result, str) or len(result) <= limit:
+            return result
+        return result[:limit] + f"\n...[结果已截断, 原长度 {len(result)} 字符]"
 
     async def call_tool_ex(self, fn_name: str, arguments: str | dict) -> tuple[str, str]:
         try:
-            arguments = self.parse_arguments(arguments)
+            if isinstance(arguments, str):
+                arguments = self.parse_arguments(arguments)
         except Exception as e:
             logger.error(f"参数解析错误:\n{arguments}\n{e}")
             return [("error", f"Argument parsing error: {e}")]
         try:
-            res = await self.session.call_tool(fn_name, arguments)
+            with Metrics.timer("client_call_tool_seconds", tool=fn_name):
+                res = await self.session.call_tool(fn_name, arguments)
         except Exception as e:
+            Metrics.inc("client_tool_calls_total", tool=fn_name, status="error")
             logger.error(f"调用工具失败: {e}")
             return [("error", f"Tool call failed: {e}")]
+        Metrics.inc("client_tool_calls_total", tool=fn_name, status="error" if res.isError else "ok")
         results = []
         for res_content in res.content:
             result = ""
@@ -418,43 +766,130 @@ class MCPClientBase:
         """
         # region 主函数
         # endregion 主函数
+        self.loop = asyncio.get_running_loop()
+        self.http_pool.acquire()
+        if self.metrics_port:
+            # 进程内只启动一个采集接口(与服务器在同一进程时共用)
+            try:
+                MetricsExporter.start("localhost", self.metrics_port)
+            except OSError as e:
+                logger.warning(f"指标采集接口启动失败(端口 {self.metrics_port}): {e}")
         try:
             logger.info("尝试连接到服务器...")
             await self.connect_to_server()
             logger.info("服务器已连接!")
+            self.command_lock = asyncio.Lock()
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            tasks: dict[asyncio.Task, Command] = {}
+            command_event = asyncio.Event()
+            self.command_queue.waker = partial(self.loop.call_soon_threadsafe, command_event.set)
             while True:
+                if self.should_stop:
+                    break
+                try:
+                    command = self.command_queue.get_nowait()
+                except queue.Empty:
+                    await command_event.wait()
+                    command_event.clear()
+                    continue
+                # 命令格式: query, (conversation_id, query) 或 Command
+                if isinstance(command, tuple):
+                    command = Command(command[1], command[0])
+                elif not isinstance(command, Command):
+                    command = Command(command)
+                conversation = self.get_conversation(command.conversation_id)
+                task = asyncio.create_task(conversation.run_command(command.query, semaphore, command.future))
+                tasks[task] = command
+                task.add_done_callback(partial(tasks.pop))
+            unfinished = list(tasks.values())
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # 开始执行前就被取消的任务不会运行 run_command, 需要单独取消对应的 Future
+            self.cancel_pending_commands(unfinished)
+        except Exception as e:
+            logger.error(f"连接失败: {e}")
+            logger.error("请检查网络连接或服务器地址是否正确。")
+        finally:
+            self.cancel_pending_commands()
+            await self.cleanup()
+
+    async def run_command(self, query: str, semaphore: asyncio.Semaphore, future: concurrent.futures.Future = None):
+        """
+        处理一条命令, 同一会话的命令按顺序处理, 不同会话并发处理(受 semaphore 限制)
+        :param query: 命令内容
+        :param semaphore: 并发数限制
+        :param future: 用于返回结果的 Future(可选)
+        """
+        if future and not future.set_running_or_notify_cancel():
+            return
+        response = None
+        error = None
+        try:
+            async with self.command_lock, semaphore:
                 try:
-                    self.command_processing = False
                     self.update()
-                    if self.should_stop:
-                        break
-                    try:
-                        query = self.command_queue.get_nowait()
-                    except queue.Empty:
-                        await asyncio.sleep(0.2)
-                        continue
                     logger.info(f"当前命令: {query}")
                     self.skip_current_command = False
                     self.command_processing = True
-                    response = await self.process_query(query)
+                    self.query_task = asyncio.create_task(self.process_query(query))
+                    try:
+                        response = await self.query_task
+                    except asyncio.CancelledError:
+                        # 仅取消了当前命令, 主循环继续运行
+                        if not self.skip_current_command:
+                            raise
+                    finally:
+                        self.query_task = None
                     print()
                     if self.skip_current_command:
                         logger.info(f"跳过命令: {query}")
-                        continue
+                        return
                     logger.info(f"处理完成: {query}")
-                except requests.exceptions.HTTPError as e:
+                except httpx.HTTPStatusError as e:
+                    error = e
                     logger.warning(f"HTTP错误(请检查api_key, 模型使用情况或额度): {e}")
-                except Exception:
+                except Exception as e:
+                    error = e
                     import traceback
 
                     traceback.print_exc()
-        except Exception as e:
-            logger.error(f"连接失败: {e}")
-            logger.error("请检查网络连接或服务器地址是否正确。")
+                finally:
+                    self.command_processing = False
+                    self.cancel_tool_calls()
+        except asyncio.CancelledError as e:
+            # 包括等待会话锁/并发名额时被取消
+            error = e
+            raise
         finally:
-            await self.cleanup()
+            if future and not future.done():
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(response or "")
+
+    def cancel_pending_commands(self, commands: list = None):
+        """
+        取消未完成的命令, 保证调用方不会一直等待 submit 返回的 Future
+        :param commands: 已取出但未处理完的命令, 队列中剩余的命令也会被取消
+        """
+        commands = list(commands or [])
+        while True:
+            try:
+                commands.append(self.command_queue.get_nowait())
+            except queue.Empty:
+                break
+        for command in commands:
+            if not isinstance(command, Command) or not (future := command.future) or future.done():
+                continue
+            # 未开始的命令可以直接取消, 已开始(running)的命令设置为取消异常
+            if not future.cancel():
+                future.set_exception(asyncio.CancelledError())
 
     async def cleanup(self):
         """清理资源"""
         self.command_processing = False
-        await self.exit_stack.aclose()
\ No newline at end of file
+        self.command_queue.waker = None
+        await self.exit_stack.aclose()
+        # 连接池在进程内共享, 只有当前事件循环中没有其它使用者时才关闭
+        await self.http_pool.release()
\ No newline at end of file
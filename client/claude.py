@@ -1,5 +1,3 @@
-import requests
-
 from .openai import MCPClientOpenAI, logger
 
 
@@ -20,8 +18,8 @@ class MCPClientClaude(MCPClientOpenAI):
             "model": "claude-3-5-haiku-20241022",
         }
 
-    def __init__(self, base_url="https://api.anthropic.com", api_key="", model="", stream=True):
-        super().__init__(base_url, api_key, model, stream)
+    def __init__(self, base_url="https://api.anthropic.com", api_key="", model="", stream=True, **kwargs):
+        super().__init__(base_url, api_key, model, stream, **kwargs)
 
     def get_chat_url(self):
         return f"{self.base_url}/v1/chat/completions"
@@ -39,14 +37,14 @@ class MCPClientClaude(MCPClientOpenAI):
             logger.error("API密钥不能为空")
             return []
         try:
-            response = requests.get(model_url, headers=headers)
+            response = self.get_http_client().get(model_url, headers=headers, timeout=self.timeout)
             json_data = response.json()
             error = json_data.get("error", {})
             if error:
                 raise Exception(error.get("message", "Unknown error"))
 
             models = response.json().get("data", [])
-            self.models = [model["id"] for model in models]
+            return [model["id"] for model in models]
         except Exception as e:
             logger.error(f"获取模型列表失败, 请检查大模型服务商, API密钥及base url是否正确: {e}")
-        return self.models
+        return []
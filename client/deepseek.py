@@ -1,4 +1,3 @@
-import requests
 from .base import logger
 from .openai import MCPClientOpenAI
 
@@ -20,5 +19,5 @@ class MCPClientDeepSeek(MCPClientOpenAI):
             "model": "deepseek-chat",
         }
 
-    def __init__(self, base_url="https://api.deepseek.com", api_key="", model="", stream=True):
-        super().__init__(base_url, api_key, model, stream)
+    def __init__(self, base_url="https://api.deepseek.com", api_key="", model="", stream=True, **kwargs):
+        super().__init__(base_url, api_key, model, stream, **kwargs)
@@ -0,0 +1,188 @@
+import json
+
+from logger import getLogger
+from .message import Message
+
+logger = getLogger("History")
+
+# 摘要消息的开头, 再次压缩时据此合并之前的摘要
+SUMMARY_PREFIX = "以下是之前已省略的对话中用户提出的问题:\n"
+
+
+def estimate_text_tokens(text: str) -> int:
+    """
+    估算文本的 token 数: ASCII 字符约 4 个一个 token, 其他字符(中文等)约 1 个一个 token
+    """
+    if not text:
+        return 0
+    ascii_size = len(text.encode("ascii", "ignore"))
+    return ascii_size // 4 + (len(text) - ascii_size) + 1
+
+
+class HistoryManager:
+    """
+    历史消息压缩, 保证每次请求发送的 messages 不超过 token 预算
+    依次执行, 直到满足预算:
+    1. 旧对话中较长的工具结果折叠为简短引用
+    2. 从最早的对话开始整轮删除(一轮 = 一条 user 消息及其后的所有消息), 并生成摘要(摘要也计入预算)
+    3. 当前对话中除最近几条以外的工具结果也折叠, 仍超出预算时最近的工具结果也折叠
+    删除和折叠都不会拆开 tool_calls 与对应的 tool 消息
+    params: max_tokens: int = 32000 token 预算(估算值), 为 0 时不压缩
+    params: keep_turns: int = 2 最近几轮对话保持原样
+    params: tool_result_chars: int = 1000 超过该长度的旧工具结果会被折叠
+    params: preview_chars: int = 200 折叠后保留的结果预览长度
+    params: keep_tool_results: int = 4 当前对话中最近几条工具结果保持原样
+    params: summary_chars: int = 2000 被删除对话的摘要最大长度
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 32000,
+        keep_turns: int = 2,
+        tool_result_chars: int = 1000,
+        preview_chars: int = 200,
+        keep_tool_results: int = 4,
+        summary_chars: int = 2000,
+    ):
+        self.max_tokens = max_tokens
+        self.keep_turns = keep_turns
+        self.tool_result_chars = tool_result_chars
+        self.preview_chars = preview_chars
+        self.keep_tool_results = keep_tool_results
+        self.summary_chars = summary_chars
+
+    def estimate_tokens(self, message: dict) -> int:
+        """
+        估算单条消息的 token 数(包含工具调用参数)
+        """
+        tokens = 4
+        content = message.get("content")
+        if isinstance(content, str):
+            tokens += estimate_text_tokens(content)
+        elif content:
+            tokens += estimate_text_tokens(json.dumps(content, ensure_ascii=False, default=str))
+        for tool_call in message.get("tool_calls") or ():
+            function = tool_call.get("function", {})
+            tokens += estimate_text_tokens(function.get("name", "")) + estimate_text_tokens(function.get("arguments", ""))
+        return tokens
+
+    def total_tokens(self, messages: list) -> int:
+        return sum(map(self.estimate_tokens, messages))
+
+    def split_turns(self, messages: list) -> tuple[list, list[list]]:
+        """
+        拆分为开头的系统消息和按 user 消息划分的多轮对话
+        """
+        head = []
+        turns = []
+        for message in messages:
+            if message.get("role") == "user":
+                turns.append([message])
+            elif turns:
+                turns[-1].append(message)
+            else:
+                head.append(message)
+        return head, turns
+
+    def collapse_tool_result(self, message: dict) -> dict:
+        """
+        将较长的工具结果折叠为简短引用
+        """
+        content = message.get("content")
+        if message.get("role") != "tool" or not isinstance(content, str) or len(content) <= self.tool_result_chars:
+            return message
+        preview = content[:self.preview_chars]
+        collapsed = f"{preview}\n...[工具 {message.get('name', '')} 的结果已折叠, 原长度 {len(content)} 字符]"
+        return Message({**message, "content": collapsed})
+
+    def summarize(self, turns: list[list], previous: str = "") -> str:
+        """
+        生成被删除对话的摘要(默认只保留用户的问题), 可以在子类中改为调用大模型生成
+        :param turns: 被删除的对话
+        :param previous: 之前压缩时生成的摘要(不含 SUMMARY_PREFIX)
+        :return: 摘要, 为空时不插入摘要消息
+        """
+        queries = [previous] if previous else []
+        for turn in turns:
+            content = turn[0].get("content")
+            if turn[0].get("role") == "user" and isinstance(content, str):
+                queries.append(f"- {content[:self.preview_chars]}")
+        if not queries:
+            return ""
+        summary = "\n".join(queries)
+        if len(summary) > self.summary_chars:
+            summary = "...\n" + summary[-self.summary_chars:]
+        return SUMMARY_PREFIX + summary
+
+    def compact(self, messages: list) -> list:
+        """
+        压缩历史消息
+        :param messages: 原始消息列表(不会被修改)
+        :return: 满足预算的消息列表, 不需要压缩时返回原列表
+        """
+        if not self.max_tokens:
+            return messages
+        total = self.total_tokens(messages)
+        if total <= self.max_tokens:
+            return messages
+        head, turns = self.split_turns(messages)
+        previous = ""
+        summary_tokens = 0
+        for message in head:
+            if message.get("role") == "system" and str(message.get("content", "")).startswith(SUMMARY_PREFIX):
+                previous = message["content"][len(SUMMARY_PREFIX):]
+                summary_tokens += self.estimate_tokens(message)
+        keep = max(self.keep_turns, 1)
+        # 1. 折叠旧对话的工具结果
+        for turn in turns[:-keep]:
+            turn[:] = [self.collapse_tool_result(message) for message in turn]
+        total = self.total_tokens(head) + sum(self.total_tokens(turn) for turn in turns)
+        # 2. 整轮删除最早的对话(至少保留当前对话), 新的摘要替换之前的摘要
+        dropped = []
+        summary = ""
+        while total > self.max_tokens and len(turns) > 1:
+            turn = turns.pop(0)
+            dropped.append(turn)
+            summary = self.summarize(dropped, previous)
+            tokens = self.estimate_tokens({"content": summary}) if summary else 0
+            total += tokens - summary_tokens - self.total_tokens(turn)
+            summary_tokens = tokens
+        # 3. 折叠当前对话中较早的工具结果, 仍超出预算时从最早的开始继续折叠最近的工具结果
+        if total > self.max_tokens and turns:
+            current = turns[-1]
+            tool_indexes = [i for i, message in enumerate(current) if message.get("role") == "tool"]
+            recent = len(tool_indexes) - self.keep_tool_results
+            for n, i in enumerate(tool_indexes):
+                if n >= recent and total <= self.max_tokens:
+                    break
+                tokens = self.estimate_tokens(current[i])
+                current[i] = self.collapse_tool_result(current[i])
+                total += self.estimate_tokens(current[i]) - tokens
+        result = list(head)
+        if summary:
+            if previous:
+                result = [message for message in head if not str(message.get("content", "")).startswith(SUMMARY_PREFIX)]
+            result.append(Message({"role": "system", "content": summary}))
+        for turn in turns:
+            result.extend(turn)
+        result = self.repair_tool_pairs(result)
+        logger.debug(f"历史消息压缩: {len(messages)} -> {len(result)} 条, 约 {self.total_tokens(result)} tokens")
+        return result
+
+    @staticmethod
+    def repair_tool_pairs(messages: list) -> list:
+        """
+        删除没有对应 tool_calls 的 tool 消息, 以及没有任何结果的 tool_calls 消息
+        """
+        result_ids = {message.get("tool_call_id") for message in messages if message.get("role") == "tool"}
+        repaired = []
+        call_ids = set()
+        for message in messages:
+            if tool_calls := message.get("tool_calls"):
+                if not all(tool_call.get("id") in result_ids for tool_call in tool_calls):
+                    continue
+                call_ids.update(tool_call.get("id") for tool_call in tool_calls)
+            if message.get("role") == "tool" and message.get("tool_call_id") not in call_ids:
+                continue
+            repaired.append(message)
+        return repaired
@@ -0,0 +1,167 @@
+import asyncio
+import importlib.util
+import threading
+import time
+from urllib.parse import urlsplit
+from weakref import WeakKeyDictionary
+
+import httpx
+
+from logger import getLogger
+from metrics import Metrics
+
+logger = getLogger("HttpPool")
+
+
+class HttpPool:
+    """
+    HTTP连接池, 进程内所有客户端共享, 按 host 复用 keep-alive 连接
+    同步客户端(fetch_models 等)全进程共享; 异步客户端绑定到事件循环, 每个事件循环一份
+    param: max_connections: int = 20 每个 host 的最大连接数
+    param: max_keepalive_connections: int = 10 每个 host 保持的空闲连接数
+    param: keepalive_expiry: float = 60 空闲连接的保活时间(秒)
+    param: http2: bool = False 是否启用HTTP/2(需要安装 h2)
+    """
+    max_connections = 20
+    max_keepalive_connections = 10
+    keepalive_expiry = 60
+    http2 = False
+
+    _lock = threading.Lock()
+    _clients: dict[str, httpx.Client] = {}
+    _async_clients: WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, httpx.AsyncClient]] = WeakKeyDictionary()
+    # 每个事件循环中正在使用异步客户端的客户端实例数量
+    _async_users: WeakKeyDictionary[asyncio.AbstractEventLoop, int] = WeakKeyDictionary()
+
+    @classmethod
+    def configure(
+        cls,
+        max_connections: int = None,
+        max_keepalive_connections: int = None,
+        keepalive_expiry: float = None,
+        http2: bool = None,
+    ):
+        """
+        修改连接池配置, 已创建的同步客户端会被关闭, 之后按新配置重新创建
+        """
+        if max_connections is not None:
+            cls.max_connections = max_connections
+        if max_keepalive_connections is not None:
+            cls.max_keepalive_connections = max_keepalive_connections
+        if keepalive_expiry is not None:
+            cls.keepalive_expiry = keepalive_expiry
+        if http2 is not None:
+            cls.http2 = http2
+        cls.close()
+
+    @classmethod
+    def limits(cls) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=cls.max_connections,
+            max_keepalive_connections=cls.max_keepalive_connections,
+            keepalive_expiry=cls.keepalive_expiry,
+        )
+
+    @classmethod
+    def use_http2(cls) -> bool:
+        if not cls.http2:
+            return False
+        if importlib.util.find_spec("h2") is None:
+            logger.warning("未安装 h2, 无法启用HTTP/2, 将使用HTTP/1.1 (pip install httpx[http2])")
+            cls.http2 = False
+        return cls.http2
+
+    @staticmethod
+    def origin(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    @classmethod
+    def get_client(cls, url: str) -> httpx.Client:
+        """
+        获取 url 所在 host 的同步客户端
+        """
+        origin = cls.origin(url)
+        with cls._lock:
+            if not (client := cls._clients.get(origin)):
+                client = httpx.Client(limits=cls.limits(), http2=cls.use_http2())
+                cls._clients[origin] = client
+        return client
+
+    @classmethod
+    def get_async_client(cls, url: str) -> httpx.AsyncClient:
+        """
+        获取 url 所在 host 在当前事件循环中的异步客户端
+        """
+        loop = asyncio.get_running_loop()
+        origin = cls.origin(url)
+        with cls._lock:
+            clients = cls._async_clients.setdefault(loop, {})
+            if not (client := clients.get(origin)):
+                client = httpx.AsyncClient(limits=cls.limits(), http2=cls.use_http2())
+                clients[origin] = client
+        return client
+
+    @staticmethod
+    def connect_tracer():
+        """
+        返回 httpx 的 trace 回调(extensions={"trace": ...}), 记录新建连接的 TCP/TLS 耗时
+        复用 keep-alive 连接时不会触发连接事件
+        """
+        started = {}
+
+        async def trace(event: str, info: dict):
+            if event.endswith(".started"):
+                started[event[:-8]] = time.perf_counter()
+            elif event.endswith(".complete") and (start := started.pop(event[:-9], None)) is not None:
+                if event.startswith("connection.connect_tcp"):
+                    Metrics.observe("http_connect_seconds", time.perf_counter() - start, stage="tcp")
+                elif event.startswith("connection.start_tls"):
+                    Metrics.observe("http_connect_seconds", time.perf_counter() - start, stage="tls")
+
+        return trace
+
+    @classmethod
+    def acquire(cls):
+        """
+        登记当前事件循环中的一个使用者(客户端实例启动时调用)
+        """
+        loop = asyncio.get_running_loop()
+        with cls._lock:
+            cls._async_users[loop] = cls._async_users.get(loop, 0) + 1
+
+    @classmethod
+    async def release(cls):
+        """
+        注销使用者, 当前事件循环中没有其它使用者时才关闭异步客户端
+        (同一事件循环中的其它实例, 会话和路由客户端的后端共享这些连接)
+        """
+        loop = asyncio.get_running_loop()
+        with cls._lock:
+            users = cls._async_users.get(loop, 0) - 1
+            if users > 0:
+                cls._async_users[loop] = users
+                return
+            cls._async_users.pop(loop, None)
+        await cls.aclose()
+
+    @classmethod
+    async def aclose(cls):
+        """
+        关闭当前事件循环中的所有异步客户端
+        """
+        with cls._lock:
+            clients = cls._async_clients.pop(asyncio.get_running_loop(), {})
+        for client in clients.values():
+            await client.aclose()
+
+    @classmethod
+    def close(cls):
+        """
+        关闭所有同步客户端
+        """
+        with cls._lock:
+            clients = list(cls._clients.values())
+            cls._clients.clear()
+        for client in clients:
+            client.close()
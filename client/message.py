@@ -0,0 +1,58 @@
+class FrozenDict(dict):
+    """
+    只读字典, 创建后不能修改, 因此可以在多处共享而不需要复制
+    继承 dict, json.dumps 可以直接序列化
+    """
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError(f"{type(self).__name__} is read-only")
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+    __ior__ = _readonly
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+
+class Message(FrozenDict):
+    """
+    写入 messages 的消息, 内容字符串(工具结果, 图片 base64 等)只保存一份引用
+    修改消息需要创建新的消息: Message({**message, "content": ...})
+    """
+    __slots__ = ()
+
+
+def freeze(obj):
+    """
+    将消息转换为只读结构: dict -> FrozenDict, list -> tuple
+    只复制容器本身(与嵌套层数成正比), 字符串等不可变对象直接共享, 不会被复制
+    :param obj: 要转换的对象
+    :return: 只读对象, 已经是只读结构时直接返回
+    """
+    t = type(obj)
+    if t is str or t is int or t is float or t is bool or obj is None:
+        return obj
+    if isinstance(obj, FrozenDict):
+        return obj
+    if isinstance(obj, dict):
+        return FrozenDict({key: freeze(value) for key, value in obj.items()})
+    if isinstance(obj, (list, tuple)):
+        return tuple(freeze(value) for value in obj)
+    return obj
+
+
+def make_message(message: dict) -> Message:
+    """
+    创建只读消息, 已经是 Message 时直接返回(O(1))
+    """
+    if type(message) is Message:
+        return message
+    return Message({key: freeze(value) for key, value in message.items()})
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable
+
+from logger import getLogger
+
+logger = getLogger("ModelCache")
+
+CACHE_DIR = Path(__file__).parent.parent.joinpath("cache", "models")
+
+
+class ModelCache:
+    """
+    模型列表缓存(内存 + 磁盘), 进程内所有客户端实例共享, 重启后仍然有效
+    按 (服务商, base_url, API密钥摘要) 区分, 不保存密钥本身
+    - 未过期: 直接返回
+    - 已过期但未超过 max_stale: 立即返回旧列表, 同时在后台刷新(stale-while-revalidate)
+    - 没有缓存或超过 max_stale: 同步获取
+    获取失败(空列表)时不覆盖已有缓存
+    params: ttl: float = 3600 缓存有效期(秒)
+    params: max_stale: float = 7 * 86400 过期后仍可以先返回旧列表的时间(秒)
+    params: cache_dir: Path 缓存目录, 为空时只使用内存缓存
+    """
+    ttl = 3600
+    max_stale = 7 * 86400
+    cache_dir: Path = CACHE_DIR
+
+    _lock = threading.Lock()
+    # {key: (获取时间, 模型列表)}
+    _entries: dict[str, tuple[float, list]] = {}
+    # 正在后台刷新的 {key: Future}
+    _refreshing: dict[str, Future] = {}
+
+    @staticmethod
+    def make_key(provider: str, base_url: str, api_key: str) -> str:
+        key_hash = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+        return hashlib.sha256(f"{provider}|{base_url}|{key_hash}".encode("utf-8")).hexdigest()[:32]
+
+    @classmethod
+    def path(cls, key: str) -> Path:
+        return cls.cache_dir.joinpath(f"{key}.json")
+
+    @classmethod
+    def load(cls, key: str) -> tuple[float, list]:
+        """
+        读取缓存, 内存中没有时从磁盘读取
+        :return: (获取时间, 模型列表), 没有时返回 None
+        """
+        with cls._lock:
+            if entry := cls._entries.get(key):
+                return entry
+        if not cls.cache_dir:
+            return None
+        try:
+            data = json.loads(cls.path(key).read_text(encoding="utf-8"))
+            entry = (float(data["fetched_at"]), list(data["models"]))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        with cls._lock:
+            cls._entries.setdefault(key, entry)
+        return entry
+
+    @classmethod
+    def save(cls, key: str, models: list, provider: str = "", base_url: str = ""):
+        entry = (time.time(), list(models))
+        with cls._lock:
+            cls._entries[key] = entry
+        if not cls.cache_dir:
+            return
+        data = {"provider": provider, "base_url": base_url, "fetched_at": entry[0], "models": entry[1]}
+        path = cls.path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # 先写临时文件再替换, 避免其它进程读到不完整的文件
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"写入模型列表缓存失败: {e}")
+
+    @classmethod
+    def get(cls, key: str, fetch: Callable[[], list], force: bool = False, on_refresh: Callable[[list], None] = None, **meta) -> list:
+        """
+        获取模型列表
+        :param key: make_key 生成的缓存键
+        :param fetch: 获取模型列表的函数(同步, 可能较慢)
+        :param force: 是否忽略缓存
+        :param on_refresh: 后台刷新完成后的回调 on_refresh(models)
+        :param meta: 写入磁盘的附加信息(provider, base_url)
+        """
+        if not force and (entry := cls.load(key)):
+            age = time.time() - entry[0]
+            if age < cls.ttl:
+                return entry[1]
+            if age < cls.ttl + cls.max_stale:
+                future = cls.refresh(key, fetch, **meta)
+                if on_refresh:
+                    future.add_done_callback(lambda f: f.exception() or on_refresh(f.result()))
+                return entry[1]
+        return cls.fetch(key, fetch, **meta)
+
+    @classmethod
+    def fetch(cls, key: str, fetch: Callable[[], list], **meta) -> list:
+        """
+        同步获取并写入缓存, 获取失败时返回旧列表(如果有)
+        """
+        models = sorted(fetch() or [])
+        if models:
+            cls.save(key, models, **meta)
+            return models
+        entry = cls.load(key)
+        return entry[1] if entry else []
+
+    @classmethod
+    def refresh(cls, key: str, fetch: Callable[[], list], **meta) -> Future:
+        """
+        在后台线程刷新, 同一个缓存键同时只有一个刷新任务
+        :return: Future, 结果为刷新后的模型列表
+        """
+        with cls._lock:
+            if future := cls._refreshing.get(key):
+                return future
+            future = Future()
+            cls._refreshing[key] = future
+
+        def run():
+            try:
+                future.set_result(cls.fetch(key, fetch, **meta))
+            except Exception as e:
+                logger.warning(f"后台刷新模型列表失败: {e}")
+                future.set_exception(e)
+            finally:
+                with cls._lock:
+                    cls._refreshing.pop(key, None)
+
+        threading.Thread(target=run, name="ModelCacheRefresh", daemon=True).start()
+        return future
+
+    @classmethod
+    def clear(cls, disk: bool = False):
+        """
+        清除内存缓存
+        :param disk: 是否同时删除磁盘缓存
+        """
+        with cls._lock:
+            cls._entries.clear()
+        if disk and cls.cache_dir and cls.cache_dir.exists():
+            for path in cls.cache_dir.glob("*.json"):
+                path.unlink(missing_ok=True)
@@ -1,4 +1,4 @@
-import requests
+import httpx
 import json
 from copy import deepcopy
 from .openai import MCPClientOpenAI, logger
@@ -32,7 +32,7 @@ class MCPClientLocalOllama(MCPClientOpenAI):
             "model": "llama3.2:3b",
         }
 
-    def __init__(self, base_url="http://localhost:11434", api_key="ollama", model="", stream=True):
+    def __init__(self, base_url="http://localhost:11434", api_key="ollama", model="", stream=True, **kwargs):
         """
         初始化本地 Ollama 客户端。 
 
@@ -41,10 +41,10 @@ class MCPClientLocalOllama(MCPClientOpenAI):
         :param model: 模型名称。
         :param stream: 是否使用流式响应。
         """
-        super().__init__(base_url, api_key=api_key, model=model, stream=stream)
+        super().__init__(base_url, api_key=api_key, model=model, stream=stream, **kwargs)
 
 
-    def response_raise_status(self, response: requests.Response):
+    def response_raise_status(self, response: httpx.Response):
         """
         检查响应状态，如果状态不为 200，则抛出异常。
         
@@ -52,7 +52,7 @@ class MCPClientLocalOllama(MCPClientOpenAI):
         """
         try:
             response.raise_for_status()
-        except requests.exceptions.HTTPError:
+        except httpx.HTTPStatusError:
             try:
                 json_data = response.json()
                 error = json_data.get("error", "")
@@ -1,9 +1,15 @@
 import json
-import requests
+import asyncio
+import httpx
 import re
+import time
 from copy import deepcopy
+from contextlib import aclosing
 
 from .base import MCPClientBase, logger
+from .sse import SSEParser
+from .ratelimit import RateLimiter, parse_retry_after
+from metrics import Metrics
 
 
 class MCPClientOpenAI(MCPClientBase):
@@ -23,8 +29,11 @@ class MCPClientOpenAI(MCPClientBase):
             "model": "gpt-4o-mini",
         }
 
-    def __init__(self, base_url="https://api.openai.com", api_key="", model="", stream=True):
-        super().__init__(base_url, api_key, model, stream)
+    def __init__(self, base_url="https://api.openai.com", api_key="", model="", stream=True, **kwargs):
+        super().__init__(base_url, api_key, model, stream, **kwargs)
+        self.tools_cache: list[dict] = None
+        self.tools_cache_json = ""
+        self.tools_cache_key = None
 
     def get_chat_url(self):
         return f"{self.base_url}/v1/chat/completions"
@@ -41,60 +50,80 @@ class MCPClientOpenAI(MCPClientBase):
 
         model_url = f"{self.base_url}/v1/models"
         try:
-            response = requests.get(model_url, headers=headers)
+            response = self.get_http_client().get(model_url, headers=headers, timeout=self.timeout)
             models = response.json().get("data", [])
-            self.models = [model["id"] for model in models]
+            return [model["id"] for model in models]
         except Exception:
             logger.error("获取模型列表失败, 请检查大模型服务商, API密钥及base url是否正确")
-        return self.models
+        return []
 
     async def prepare_tools(self):
         """
-        准备工具列表
-        """
-        response = await self.session.list_tools()
-        tools = []
-        for tool in response.tools:
-            tool_info = {
-                "type": "function",
-                "function": {
-                    "name": tool.name,
-                    "description": tool.description,
-                    # "parameters": {
-                    #     "type": "object",
-                    #     "properties": {
-                    #         "city": {
-                    #             "type": "string",
-                    #             "description": "The name of the city",
-                    #         },
-                    #     },
-                    #     "required": ["city"],
-                    # },
-                },
-            }
-            parameters = deepcopy(tool.inputSchema)
-            tool_info["function"]["parameters"] = parameters
-            description = tool.description
-            description = description.replace("Args:", "")
-            for name, info in parameters.get("properties", {}).items():
-                find_description = re.search(f"- {name}: (.*)\n", description)
-                if not find_description:
-                    continue
-                description = description.replace(find_description.group(0), "")
-            description = description.replace("\n", "").strip()
-            while "  " in description:
-                description = description.replace("  ", " ")
-            tool_info["function"]["description"] = description
-            tools.append(tool_info)
+        准备工具列表, 服务器工具列表不变时直接返回缓存
+        """
+        server_tools = await self.list_server_tools()
+        root = self.root()
+        if root.tools_cache is not None and root.tools_cache_key is server_tools:
+            return root.tools_cache
+        tools = [self.build_tool(tool) for tool in server_tools]
+        root.tools_cache = tools
+        root.tools_cache_json = json.dumps(tools, ensure_ascii=False, separators=(",", ":"))
+        root.tools_cache_key = server_tools
         return tools
 
-    def response_raise_status(self, response: requests.Response):
+    def build_tool(self, tool) -> dict:
+        """
+        将MCP工具转换为OpenAI工具格式
+        """
+        tool_info = {
+            "type": "function",
+            "function": {
+                "name": tool.name,
+                "description": tool.description,
+                # "parameters": {
+                #     "type": "object",
+                #     "properties": {
+                #         "city": {
+                #             "type": "string",
+                #             "description": "The name of the city",
+                #         },
+                #     },
+                #     "required": ["city"],
+                # },
+            },
+        }
+        parameters = deepcopy(tool.inputSchema)
+        tool_info["function"]["parameters"] = parameters
+        description = tool.description
+        description = description.replace("Args:", "")
+        for name, info in parameters.get("properties", {}).items():
+            find_description = re.search(f"- {name}: (.*)\n", description)
+            if not find_description:
+                continue
+            description = description.replace(find_description.group(0), "")
+        description = description.replace("\n", "").strip()
+        while "  " in description:
+            description = description.replace("  ", " ")
+        tool_info["function"]["description"] = description
+        return tool_info
+
+    def encode_request(self, data: dict) -> bytes:
+        """
+        序列化请求体, 缓存的工具列表直接拼接已序列化的JSON, 不再重复序列化
+        """
+        root = self.root()
+        if not data.get("tools") or data["tools"] is not root.tools_cache:
+            return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        body = json.dumps({k: v for k, v in data.items() if k != "tools"}, ensure_ascii=False, separators=(",", ":"))
+        return f'{body[:-1]},"tools":{root.tools_cache_json}}}'.encode("utf-8")
+
+    def response_raise_status(self, response: httpx.Response):
         """
         检查响应状态码, 如果不是200则抛出异常
         """
         try:
             response.raise_for_status()
-        except requests.exceptions.HTTPError:
+        except httpx.HTTPStatusError:
             try:
                 json_data = response.json()
                 error = json_data.get("error", {})
@@ -109,16 +138,104 @@ class MCPClientOpenAI(MCPClientBase):
             except json.JSONDecodeError:
                 ...
 
-    async def process_query(self, query: str) -> list:
+    @staticmethod
+    def status_error(response: httpx.Response) -> httpx.HTTPStatusError:
         """
-        处理查询, 发送请求并返回结果
+        根据错误响应生成异常, 尽量使用服务商返回的错误信息
         """
-        headers = {
+        message = ""
+        try:
+            json_data = response.json()
+            error = json_data.get("error") if isinstance(json_data, dict) else None
+            if isinstance(error, dict):
+                message = error.get("message") or error.get("code") or ""
+            elif isinstance(json_data, dict):
+                message = error or json_data.get("message") or ""
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            message = response.text[:500]
+        message = message or response.reason_phrase
+        return httpx.HTTPStatusError(
+            f"{response.status_code} {message} ({response.request.url})",
+            request=response.request,
+            response=response,
+        )
+
+    def get_headers(self) -> dict:
+        return {
             "Content-Type": "application/json",
             "Accept": "application/json",
             "Authorization": f"Bearer {self.api_key}",
         }
 
+    async def request_stream(self, client: httpx.AsyncClient, data: dict, endpoint: "MCPClientOpenAI" = None):
+        """
+        发送请求, 异步逐个返回 SSE 事件(不阻塞事件循环)
+        :param client: 异步HTTP客户端
+        :param data: 请求体
+        :param endpoint: 提供地址/请求头/错误处理的客户端, 默认为自身(路由客户端使用各个服务商的客户端)
+        """
+        endpoint = endpoint or self
+        provider = type(endpoint).__name__
+        limiter = RateLimiter.get(endpoint.get_chat_url())
+        body = self.encode_request(data)
+        # 按请求体字节数粗略估算 token 数(只用于限流)
+        tokens = len(body) // 4
+        start = time.perf_counter()
+        first_chunk = True
+        status = "error"
+        attempt = 0
+        try:
+            while True:
+                delay = None
+                async with limiter.slot(tokens), client.stream(
+                    "POST",
+                    endpoint.get_chat_url(),
+                    content=body,
+                    headers=endpoint.get_headers(),
+                    timeout=endpoint.timeout,
+                    extensions={"trace": self.http_pool.connect_tracer()},
+                ) as response:
+                    if not response.is_success:
+                        # 流式响应需要先读取完整内容才能解析错误信息
+                        await response.aread()
+                        if response.status_code in limiter.retry_status and attempt < limiter.max_retries:
+                            retry_after = parse_retry_after(response.headers)
+                            delay = limiter.on_error(response.status_code, attempt, retry_after)
+                        else:
+                            endpoint.response_raise_status(response)
+                            # 服务商的检查没有抛出异常时(错误信息格式不同等), 同样按请求失败处理, 不把错误内容当作流数据
+                            raise self.status_error(response)
+                    if delay is None:
+                        # 只有 2xx 响应才会执行到这里
+                        limiter.on_success()
+                        parser = SSEParser()
+                        async for chunk in response.aiter_bytes():
+                            if first_chunk:
+                                first_chunk = False
+                                Metrics.observe("llm_first_chunk_seconds", time.perf_counter() - start, provider=provider)
+                            for event in parser.feed(chunk):
+                                yield event
+                        for event in parser.close():
+                            yield event
+                if delay is None:
+                    break
+                attempt += 1
+                logger.warning(f"请求被限流或服务端错误({response.status_code}), {delay:.2f}秒后第{attempt}次重试")
+                await asyncio.sleep(delay)
+            status = "ok"
+        except GeneratorExit:
+            # 调用方提前结束读取(中断/出错)
+            status = "closed"
+            raise
+        finally:
+            Metrics.observe("llm_request_seconds", time.perf_counter() - start, provider=provider)
+            Metrics.inc("llm_requests_total", provider=provider, status=status)
+
+    async def process_query(self, query: str) -> str:
+        """
+        处理查询, 发送请求并返回结果
+        :return: 模型最后一轮的文本回复
+        """
         data = {
             "model": self.model,
             "messages": self.messages,
@@ -130,25 +247,23 @@ class MCPClientOpenAI(MCPClientBase):
         # messages.append({"role": "system", "content": self.system_prompt()})
         self.push_message({"role": "user", "content": query})
         data["tools"] = await self.prepare_tools()
-        with requests.Session() as session:
-            session.headers.update(headers)
-            session.stream = self.stream
-            while not self.should_skip():
-                last_call_index = -1
-                self.tool_calls.clear()
-                response = session.post(self.get_chat_url(), json=data)
-                self.response_raise_status(response)
-                response.encoding = "utf-8"
-                # print("---------------------------------------START---------------------------------------")
-
-                for line in response.iter_lines():
-                    if not line:
-                        continue
+        client = self.get_async_http_client()
+        output = self.output
+        text = []
+        while not self.should_skip():
+            last_call_index = -1
+            self.clear_tool_calls()
+            # 每轮请求前压缩历史消息, 避免请求体随对话长度线性增长
+            self.compact_history()
+            text = []
+            # print("---------------------------------------START---------------------------------------")
+
+            async with aclosing(self.request_stream(client, data)) as events:
+                async for event in events:
                     if self.should_skip():
                         break
-                    print("原始数据:", line)
-                    if not (json_data := self.parse_line(line)):
-                        print("无法解析原始数据:", line)
+                    output.raw(event.data)
+                    if not (json_data := self.parse_event(event)):
                         continue
                     choice = json_data.get("choices", [{}])[0]
                     delta = choice.get("delta", {})
@@ -162,14 +277,16 @@ class MCPClientOpenAI(MCPClientBase):
                         logger.error(error)
                         break
                     if not delta:
-                        logger.warning(f"delta数据缺失: {line}")
+                        logger.warning(f"delta数据缺失: {event.data!r}")
                         continue
                     # print("delta原始数据:", delta)
                     # ---------------------------1.文本输出---------------------------
                     # 原始数据 {"choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}}]}
                     if (content := delta.get("content")) or (content := delta.get("reasoning_content")):
+                        if delta.get("content"):
+                            text.append(content)
                         self.push_stream_message({"role": "streaming", "content": content})
-                        print(content, end="", flush=True)
+                        output.content(content)
 
                     # ---------------------------2.工具调用---------------------------
                     # 原始数据 {"choices": [{"index": 0, "delta": {"role": "assistant", "tool_calls": [{"index": 0, "id": "XXX", "type": "function", "function": {"name": "get_scene_info", "arguments": ""}}]}}]}
@@ -180,25 +297,25 @@ class MCPClientOpenAI(MCPClientBase):
                     # 工具调用的第一条数据
                     if fn_name and index not in self.tool_calls:
                         last_call_index = index
-                        self.tool_calls[index] = tool_call
-                        print(f"\n选择工具: {fn_name} 参数: ", end="", flush=True)
+                        self.append_tool_call(index, tool_call)
+                        output.tool_call(fn_name)
                     # 过滤无效的tool_call(小模型生成的多余arguments)
                     if index not in self.tool_calls:
                         continue
                     # 流式输出拼接arguments
                     if arguments := tool_call.get("function", {}).get("arguments", ""):
-                        self.tool_calls[index]["function"]["arguments"] += arguments
-                        print(arguments, end="", flush=True)
-                    # 每轮只允许一个工具调用( 当存在连续调用时, 每当tryjson 成功时就调用)
+                        self.append_tool_arguments(index, arguments)
+                        output.tool_arguments(arguments)
+                    # 参数完整后立即在后台调用工具, 与后续的流式输出和其他工具调用并发执行
                     if self.ensure_tool_call(index):
-                        await self.call_tool(index)
-                # print("----------------------------------------END-----------------------------------------")
-                if self.should_skip():
-                    break
-                if last_call_index == -1:
-                    break
-                # 保证执行最后一个工具调用
-                for index in list(self.tool_calls):
-                    # 最后强制调用一次, 如果有报错信息会写入messages
-                    await self.call_tool(index)
-        return ""
+                        self.start_tool_call(index)
+            output.end()
+            # print("----------------------------------------END-----------------------------------------")
+            if self.should_skip():
+                break
+            if last_call_index == -1:
+                break
+            # 保证执行最后一个工具调用, 并按顺序写入所有工具调用结果
+            await self.finish_tool_calls()
+        self.cancel_tool_calls()
+        return "".join(text)
@@ -18,5 +18,5 @@ class MCPClientOpenRouter(MCPClientOpenAI):
             "model": "anthropic/claude-3.5-haiku",
         }
 
-    def __init__(self, base_url="https://openrouter.ai/api", api_key="", model="", stream=True):
-        super().__init__(base_url, api_key, model, stream)
+    def __init__(self, base_url="https://openrouter.ai/api", api_key="", model="", stream=True, **kwargs):
+        super().__init__(base_url, api_key, model, stream, **kwargs)
@@ -0,0 +1,74 @@
+import sys
+import time
+
+
+class OutputSink:
+    """
+    流式输出的接收端, 默认丢弃所有输出
+    可以替换为界面/日志/网络推送等实现: client.output = MySink()
+    """
+
+    def raw(self, data: bytes):
+        """
+        原始事件数据(调试用)
+        """
+
+    def content(self, text: str):
+        """
+        模型输出的文本(包含思考内容)
+        """
+
+    def tool_call(self, name: str):
+        """
+        模型开始调用工具
+        """
+
+    def tool_arguments(self, arguments: str):
+        """
+        工具参数分片
+        """
+
+    def end(self):
+        """
+        一轮流式输出结束
+        """
+
+
+class ConsoleSink(OutputSink):
+    """
+    输出到控制台, 按时间间隔批量刷新, 不再每个分片都 flush
+    params: stream: 输出流, 默认 sys.stdout
+    params: flush_interval: float = 0.05 两次刷新的最小间隔(秒)
+    params: show_raw: bool = False 是否输出原始事件数据
+    """
+
+    def __init__(self, stream=None, flush_interval: float = 0.05, show_raw: bool = False):
+        self.stream = stream
+        self.flush_interval = flush_interval
+        self.show_raw = show_raw
+        self.last_flush = 0.0
+
+    def write(self, text: str):
+        stream = self.stream or sys.stdout
+        stream.write(text)
+        now = time.monotonic()
+        if now - self.last_flush >= self.flush_interval:
+            self.last_flush = now
+            stream.flush()
+
+    def raw(self, data: bytes):
+        if self.show_raw:
+            self.write(f"原始数据: {data.decode('utf-8', 'replace')}\n")
+
+    def content(self, text: str):
+        self.write(text)
+
+    def tool_call(self, name: str):
+        self.write(f"\n选择工具: {name} 参数: ")
+
+    def tool_arguments(self, arguments: str):
+        self.write(arguments)
+
+    def end(self):
+        (self.stream or sys.stdout).flush()
+        self.last_flush = time.monotonic()
@@ -0,0 +1,312 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from logger import getLogger
+from metrics import Metrics
+from .http_pool import HttpPool
+
+logger = getLogger("RateLimiter")
+
+Metrics.describe("llm_retries_total", "counter", "大模型请求因限流/服务端错误重试的次数(status=状态码)")
+Metrics.describe("llm_rate_limit_wait_seconds", "histogram", "请求发送前在客户端限流中等待的时间")
+
+
+def parse_retry_after(headers: httpx.Headers) -> float:
+    """
+    解析 Retry-After(秒数或HTTP日期), 以及部分服务商使用的 retry-after-ms / x-ratelimit-reset-*
+    :return: 需要等待的秒数, 没有时返回 None
+    """
+    if value := headers.get("retry-after-ms"):
+        try:
+            return max(float(value) / 1000, 0)
+        except ValueError:
+            pass
+    if value := headers.get("retry-after"):
+        try:
+            return max(float(value), 0)
+        except ValueError:
+            pass
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+        except (TypeError, ValueError, IndexError, OverflowError):
+            pass
+    for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        if value := headers.get(name):
+            # OpenAI 格式: "1s", "6m0s", "20ms"
+            try:
+                return parse_duration(value)
+            except ValueError:
+                pass
+    return None
+
+
+def parse_duration(text: str) -> float:
+    """
+    解析 "1h2m3.5s" / "20ms" 格式的时长(秒)
+    """
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    total = 0.0
+    number = ""
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if char.isdigit() or char == ".":
+            number += char
+            index += 1
+            continue
+        unit = "ms" if text.startswith("ms", index) else char
+        if unit not in units or not number:
+            raise ValueError(text)
+        total += float(number) * units[unit]
+        number = ""
+        index += len(unit)
+    if number:
+        total += float(number)
+    return total
+
+
+class TokenBucket:
+    """
+    令牌桶(线程安全), 按每分钟速率补充
+    采用预留方式: 令牌不足时允许透支, 调用方按返回的时间等待, 先到的请求先获得令牌
+    params: per_minute: float 每分钟补充的令牌数, 为 0 时不限制
+    params: capacity: float 桶容量(允许的突发量), 默认为一分钟的量
+    """
+
+    def __init__(self, per_minute: float, capacity: float = None):
+        self.per_minute = per_minute
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, amount: float = 1) -> float:
+        """
+        预留令牌
+        :param amount: 令牌数, 超过桶容量时按容量计算
+        :return: 需要等待的时间(秒)
+        """
+        if not self.per_minute:
+            return 0
+        with self.lock:
+            now = time.monotonic()
+            rate = self.per_minute / 60
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * rate)
+            self.updated = now
+            self.tokens -= min(amount, self.capacity)
+            return 0 if self.tokens >= 0 else -self.tokens / rate
+
+    def refund(self, amount: float):
+        """
+        归还多预留的令牌
+        """
+        if not self.per_minute:
+            return
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class AdaptiveConcurrency:
+    """
+    自适应并发上限(AIMD, 线程安全, 可以在多个事件循环中使用)
+    请求成功时上限缓慢增加(每个上限窗口 +1), 被限流时减半
+    params: limit: float 当前上限
+    params: min_limit: int 最小上限
+    params: max_limit: int 最大上限
+    params: in_flight: int 正在进行的请求数
+    """
+
+    def __init__(self, limit: int, min_limit: int = 1, max_limit: int = None):
+        self.min_limit = min_limit
+        self.max_limit = max_limit or limit
+        self.limit = float(limit)
+        self.in_flight = 0
+        self.last_decrease = 0.0
+        self.lock = threading.Lock()
+        self.waiters: deque[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+
+    async def acquire(self):
+        with self.lock:
+            if not self.waiters and self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return
+            loop = asyncio.get_running_loop()
+            waiter = (loop, loop.create_future())
+            self.waiters.append(waiter)
+        future = waiter[1]
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self.lock:
+                if waiter in self.waiters:
+                    self.waiters.remove(waiter)
+                    raise
+            # 已经分配到名额: 结果已设置时在这里归还, 否则由 grant 归还
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+            self.wakeup()
+
+    def wakeup(self):
+        """
+        按顺序唤醒等待者(需要持有锁)
+        """
+        while self.waiters and self.in_flight < int(self.limit):
+            loop, future = self.waiters.popleft()
+            self.in_flight += 1
+            try:
+                loop.call_soon_threadsafe(self.grant, future)
+            except RuntimeError:
+                # 事件循环已关闭
+                self.in_flight -= 1
+
+    def grant(self, future: asyncio.Future):
+        if future.done():
+            # 等待者已取消
+            self.release()
+        else:
+            future.set_result(None)
+
+    def increase(self):
+        with self.lock:
+            if self.limit < self.max_limit:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                self.wakeup()
+
+    def decrease(self, interval: float = 1.0):
+        """
+        上限减半, interval 秒内的多次限流只减少一次(同一批并发请求通常会一起被限流)
+        """
+        with self.lock:
+            now = time.monotonic()
+            if now - self.last_decrease < interval:
+                return
+            self.last_decrease = now
+            self.limit = max(self.min_limit, self.limit / 2)
+
+
+class RateLimiter:
+    """
+    按服务商(请求地址的 host)共享的客户端限流, 所有会话/客户端实例共用
+    - 请求数和 token 数两个令牌桶(每分钟), token 数按请求体大小估算
+    - 自适应并发上限: 被限流(429/503)时减半, 成功时缓慢恢复
+    - 被限流后按 Retry-After 暂停该服务商的所有请求, 没有 Retry-After 时按指数退避(带随机抖动)
+    params: rpm: int = 0 每分钟请求数上限, 为 0 时不限制
+    params: tpm: int = 0 每分钟 token 数上限, 为 0 时不限制
+    params: max_concurrency: int = 16 并发请求数上限
+    params: min_concurrency: int = 1 被限流时并发上限的最小值
+    params: max_retries: int = 3 限流/服务端错误时的最大重试次数
+    params: backoff_base: float = 0.5 退避的基础时间(秒)
+    params: backoff_max: float = 30 单次退避的最长时间(秒)
+    params: retry_status: set[int] 需要重试的状态码
+    params: throttle_status: set[int] 表示服务商过载, 需要降低并发的状态码
+    """
+    rpm = 0
+    tpm = 0
+    max_concurrency = 16
+    min_concurrency = 1
+    max_retries = 3
+    backoff_base = 0.5
+    backoff_max = 30
+    retry_status = {408, 409, 429, 500, 502, 503, 504}
+    throttle_status = {429, 503}
+
+    _lock = threading.Lock()
+    _limiters: dict[str, "RateLimiter"] = {}
+    _options: dict[str, dict] = {}
+
+    def __init__(self, name: str, **options):
+        self.name = name
+        for key, value in options.items():
+            if not hasattr(RateLimiter, key):
+                raise ValueError(f"Unknown rate limit option: {key}")
+            setattr(self, key, value)
+        self.requests = TokenBucket(self.rpm)
+        self.tokens = TokenBucket(self.tpm)
+        self.concurrency = AdaptiveConcurrency(self.max_concurrency, self.min_concurrency)
+        self.blocked_until = 0.0
+
+    @classmethod
+    def get(cls, url: str) -> "RateLimiter":
+        """
+        获取 url 所在 host 的限流器
+        """
+        origin = HttpPool.origin(url)
+        with cls._lock:
+            if not (limiter := cls._limiters.get(origin)):
+                limiter = cls(origin, **cls._options.get(origin, {}))
+                cls._limiters[origin] = limiter
+        return limiter
+
+    @classmethod
+    def configure(cls, url: str, **options):
+        """
+        设置某个服务商的限流参数(同名类属性), 之后的请求使用新的限流器
+        例: RateLimiter.configure("https://api.deepseek.com", rpm=60, tpm=100000)
+        """
+        origin = HttpPool.origin(url)
+        with cls._lock:
+            cls._options[origin] = {**cls._options.get(origin, {}), **options}
+            cls._limiters.pop(origin, None)
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._limiters.clear()
+
+    @asynccontextmanager
+    async def slot(self, tokens: int = 0):
+        """
+        获取发送请求的名额, 请求(包括读取流式响应)结束后归还
+        :param tokens: 估算的 token 数
+        """
+        start = time.perf_counter()
+        await self.concurrency.acquire()
+        try:
+            delay = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+            delay = max(delay, self.blocked_until - time.monotonic())
+            if delay > 0:
+                await asyncio.sleep(delay)
+            Metrics.observe("llm_rate_limit_wait_seconds", time.perf_counter() - start, provider=self.name)
+            yield
+        finally:
+            self.concurrency.release()
+
+    def on_success(self):
+        self.concurrency.increase()
+
+    def on_error(self, status: int, attempt: int, retry_after: float = None) -> float:
+        """
+        记录失败的请求
+        :param status: 状态码
+        :param attempt: 第几次重试(从 0 开始)
+        :param retry_after: 服务商要求的等待时间
+        :return: 重试前需要等待的时间(秒)
+        """
+        Metrics.inc("llm_retries_total", provider=self.name, status=str(status))
+        if status in self.throttle_status:
+            self.concurrency.decrease()
+        if retry_after is not None:
+            delay = min(retry_after, self.backoff_max)
+            if status in self.throttle_status:
+                # 同一服务商的其它请求也暂停到 Retry-After 之后
+                self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+            return delay
+        return self.backoff(attempt)
+
+    def backoff(self, attempt: int) -> float:
+        """
+        指数退避, 使用完全随机抖动避免并发请求同时重试
+        """
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
@@ -0,0 +1,29 @@
+import importlib
+
+# 客户端类名 -> 所在模块(相对于 client 包), 使用时才导入
+CLIENT_MODULES = {
+    "MCPClientOpenAI": ".openai",
+    "MCPClientDeepSeek": ".deepseek",
+    "MCPClientSiliconflow": ".siliconflow",
+    "MCPClientLocalOllama": ".ollama",
+    "MCPClientClaude": ".claude",
+    "MCPClientOpenRouter": ".openrouter",
+    "MCPClientRouter": ".router",
+}
+
+
+def load_client(name: str):
+    """
+    导入并返回客户端类, 只导入该客户端所在的模块
+    :param name: 客户端类名
+    """
+    module = importlib.import_module(CLIENT_MODULES[name], __package__)
+    return getattr(module, name)
+
+
+def load_all_clients():
+    """
+    导入所有已注册的客户端(列出全部客户端时使用)
+    """
+    for name in CLIENT_MODULES:
+        load_client(name)
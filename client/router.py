@@ -0,0 +1,187 @@
+import asyncio
+import time
+from dataclasses import dataclass, fields
+
+import httpx
+
+from .base import MCPClientBase, logger
+from .openai import MCPClientOpenAI
+
+
+@dataclass
+class ProviderConfig:
+    """
+    路由客户端的一个服务商配置
+    params: client: str = "MCPClientOpenAI" 客户端类名, 见 MCPClientBase.get_client_by_name
+    params: base_url: str = "" 为空时使用客户端的默认配置
+    params: api_key: str = ""
+    params: model: str = "" 为空时使用客户端的默认配置
+    params: timeout: float = None 请求超时时间(秒), 为空时使用客户端的默认值
+    """
+    client: str = "MCPClientOpenAI"
+    base_url: str = ""
+    api_key: str = ""
+    model: str = ""
+    timeout: float = None
+
+
+class ProviderUnavailable(Exception):
+    """
+    所有服务商都请求失败
+    """
+
+
+class MCPClientRouter(MCPClientOpenAI):
+    """
+    在多个服务商之间路由的客户端(服务商需要兼容 OpenAI 的流式接口)
+    - 故障转移: 按顺序尝试, HTTP错误/超时/空响应时切换到下一个服务商,
+      失败的服务商在 cooldown 秒内排到最后
+    - 对冲请求: 设置 hedge_delay 后, 首个事件在 hedge_delay 秒内没有到达时同时请求下一个服务商,
+      先返回首个事件的一方胜出, 另一方的请求被取消
+    已经开始输出后出错不会切换服务商(无法撤回已经输出的内容和工具调用)
+    param: providers: list[ProviderConfig] 服务商配置(按优先级排序)
+    param: hedge_delay: float = None 对冲请求的等待时间(秒), 为空时只做故障转移
+    param: cooldown: float = 30 服务商失败后的降级时间(秒)
+    """
+
+    @classmethod
+    def info(cls):
+        return {
+            "name": "Router",
+            "description": "Routes requests across several providers with failover and hedging.",
+            "version": "0.0.1",
+        }
+
+    def __init__(self, providers: list = None, hedge_delay: float = None, cooldown: float = 30, **kwargs):
+        super().__init__(**kwargs)
+        self.hedge_delay = hedge_delay
+        self.cooldown = cooldown
+        self.endpoints: list[MCPClientOpenAI] = []
+        self.failed_at: dict[int, float] = {}
+        self.set_providers(providers or [])
+
+    def set_providers(self, providers: list):
+        """
+        设置服务商
+        :param providers: ProviderConfig 或同名字段的字典
+        """
+        names = {f.name for f in fields(ProviderConfig)}
+        self.endpoints = []
+        for config in providers:
+            if isinstance(config, dict):
+                config = ProviderConfig(**{k: v for k, v in config.items() if k in names})
+            client_cls = MCPClientBase.get_client_by_name(config.client)
+            # 只作为配置对象使用, 不注册到客户端池
+            endpoint = client_cls(register=False)
+            defaults = client_cls.default_config()
+            endpoint.base_url = config.base_url or defaults.get("base_url", "")
+            endpoint.api_key = config.api_key or defaults.get("api_key", "")
+            endpoint.model = config.model or defaults.get("model", "")
+            if config.timeout:
+                endpoint.timeout = httpx.Timeout(config.timeout, connect=min(config.timeout, 10))
+            self.endpoints.append(endpoint)
+        self.failed_at.clear()
+        if self.endpoints:
+            # 获取模型列表等仍然使用第一个服务商
+            self.base_url = self.endpoints[0].base_url
+            self.api_key = self.endpoints[0].api_key
+            self.model = self.endpoints[0].model
+
+    def reset_config(self):
+        super().reset_config()
+        if getattr(self, "endpoints", None):
+            self.base_url = self.endpoints[0].base_url
+            self.api_key = self.endpoints[0].api_key
+            self.model = self.endpoints[0].model
+
+    def ordered_endpoints(self) -> list[int]:
+        """
+        按优先级排序的服务商, 降级中的服务商排到最后
+        """
+        now = time.monotonic()
+        healthy = []
+        degraded = []
+        for index in range(len(self.endpoints)):
+            failed_at = self.failed_at.get(index)
+            if failed_at is not None and now - failed_at < self.cooldown:
+                degraded.append(index)
+            else:
+                healthy.append(index)
+        return healthy + degraded
+
+    def open_endpoint(self, index: int, data: dict):
+        """
+        打开一个服务商的流式请求
+        """
+        endpoint = self.endpoints[index]
+        client = self.http_pool.get_async_client(endpoint.base_url)
+        return super().request_stream(client, {**data, "model": endpoint.model}, endpoint)
+
+    async def close_stream(self, stream, task: asyncio.Task = None):
+        """
+        取消等待中的首个事件并关闭流(释放连接)
+        """
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except BaseException:
+                pass
+        try:
+            await stream.aclose()
+        except Exception:
+            pass
+
+    def mark_failed(self, index: int, error: BaseException):
+        self.failed_at[index] = time.monotonic()
+        endpoint = self.endpoints[index]
+        logger.warning(f"服务商 {type(endpoint).__name__}({endpoint.base_url}) 请求失败, 切换服务商: {error!r}")
+
+    async def request_stream(self, client: httpx.AsyncClient, data: dict, endpoint: MCPClientOpenAI = None):
+        """
+        按路由策略请求, 首个事件到达后固定使用该服务商
+        """
+        if endpoint is not None or not self.endpoints:
+            async for event in super().request_stream(client, data, endpoint):
+                yield event
+            return
+        pending = self.ordered_endpoints()
+        # 正在等待首个事件的请求 {task: (index, stream)}
+        racing: dict[asyncio.Task, tuple[int, object]] = {}
+        last_error: BaseException = None
+        winner = None
+        try:
+            while winner is None and (pending or racing):
+                if not racing or (self.hedge_delay is not None and pending):
+                    index = pending.pop(0)
+                    stream = self.open_endpoint(index, data)
+                    racing[asyncio.ensure_future(stream.__anext__())] = (index, stream)
+                # 只剩正在进行的请求或未启用对冲时一直等待, 否则最多等待 hedge_delay 秒
+                timeout = self.hedge_delay if self.hedge_delay is not None and pending else None
+                done, _ = await asyncio.wait(racing, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index, stream = racing.pop(task)
+                    error = task.exception()
+                    if error is None and winner is None:
+                        winner = (index, stream, task.result())
+                        continue
+                    if isinstance(error, StopAsyncIteration):
+                        error = ProviderUnavailable("empty response")
+                    if error is not None:
+                        last_error = error
+                        self.mark_failed(index, error)
+                    await self.close_stream(stream)
+        finally:
+            # 取消落后的请求
+            for task, (_, stream) in racing.items():
+                await self.close_stream(stream, task)
+        if winner is None:
+            raise ProviderUnavailable(f"All providers failed: {last_error!r}") from last_error
+        index, stream, first = winner
+        self.failed_at.pop(index, None)
+        try:
+            yield first
+            async for event in stream:
+                yield event
+        finally:
+            await stream.aclose()
@@ -1,5 +1,5 @@
 import json
-import requests
+import httpx
 from .openai import MCPClientOpenAI, logger
 
 
@@ -20,13 +20,13 @@ class MCPClientSiliconflow(MCPClientOpenAI):
             "model": "Qwen/Qwen2.5-7B-Instruct",
         }
 
-    def __init__(self, base_url="https://api.siliconflow.cn", api_key="", model="", stream=True):
-        super().__init__(base_url, api_key, model, stream)
+    def __init__(self, base_url="https://api.siliconflow.cn", api_key="", model="", stream=True, **kwargs):
+        super().__init__(base_url, api_key, model, stream, **kwargs)
 
     def response_raise_status(self, response):
         try:
             response.raise_for_status()
-        except requests.exceptions.HTTPError:
+        except httpx.HTTPStatusError:
             try:
                 json_data = response.json()
                 if message := json_data.get("message"):
@@ -0,0 +1,115 @@
+import re
+
+# 行结束符: \r\n, \n 或 \r
+LINE_END = re.compile(rb"\r\n|\n|\r")
+
+
+class SSEEvent:
+    """
+    一个 SSE 事件
+    params: data: bytes 所有 data 字段用 \n 连接后的内容
+    params: event: str 事件类型, 默认 "message"
+    params: id: str 事件ID
+    params: retry: int 重连间隔(毫秒)
+    """
+    __slots__ = ("data", "event", "id", "retry")
+
+    def __init__(self, data: bytes = b"", event: str = "message", id: str = None, retry: int = None):
+        self.data = data
+        self.event = event
+        self.id = id
+        self.retry = retry
+
+    def __repr__(self):
+        return f"SSEEvent(event={self.event!r}, data={self.data[:80]!r})"
+
+
+class SSEParser:
+    """
+    基于字节的 SSE 解析器(按 WHATWG 规范分帧)
+    - 支持 event/id/retry 字段和多行 data, 只去掉字段名和冒号后的一个空格
+    - 跨网络分片缓存不完整的行, 不对完整内容做解码
+    - 兼容不使用 SSE 格式的流(每行一个JSON, 例如 Ollama 原生接口): 以 { 开头的行直接作为一个事件
+    """
+
+    def __init__(self):
+        self.buffer = b""
+        self.data: list[bytes] = []
+        self.event = ""
+        self.id = None
+        self.retry = None
+
+    def feed(self, chunk: bytes) -> list[SSEEvent]:
+        """
+        输入网络分片
+        :param chunk: 原始字节
+        :return: 分片中完整的事件
+        """
+        if self.buffer:
+            chunk = self.buffer + chunk
+        # 以 \r 结尾时可能是被拆开的 \r\n, 留到下一个分片再判断
+        tail = b""
+        if chunk.endswith(b"\r"):
+            chunk, tail = chunk[:-1], b"\r"
+        # 大多数服务只使用 \n 换行, 此时用 bytes.split 比正则更快
+        lines = LINE_END.split(chunk) if b"\r" in chunk else chunk.split(b"\n")
+        # 最后一段是不完整的行
+        self.buffer = lines.pop() + tail
+        events = []
+        data = self.data
+        for line in lines:
+            # 最常见的两种行(data 字段和空行)直接处理, 减少函数调用
+            if line[:6] == b"data: ":
+                data.append(line[6:])
+            elif not line and data and not self.event:
+                events.append(SSEEvent(data[0] if len(data) == 1 else b"\n".join(data), "message", self.id, self.retry))
+                data.clear()
+            elif (event := self.process_line(line)) is not None:
+                events.append(event)
+                data = self.data
+        return events
+
+    def close(self) -> list[SSEEvent]:
+        """
+        流结束时处理剩余的内容
+        """
+        events = []
+        if self.buffer.rstrip(b"\r"):
+            if (event := self.process_line(self.buffer.rstrip(b"\r"))) is not None:
+                events.append(event)
+        self.buffer = b""
+        if (event := self.dispatch()) is not None:
+            events.append(event)
+        return events
+
+    def process_line(self, line: bytes) -> SSEEvent:
+        if not line:
+            return self.dispatch()
+        if line[0] == 0x3A:  # ":" 注释
+            return None
+        if line[0] == 0x7B and not self.data:  # "{" 非 SSE 格式的JSON行
+            return SSEEvent(line)
+        field, sep, value = line.partition(b":")
+        if sep and value[:1] == b" ":
+            value = value[1:]
+        if field == b"data":
+            self.data.append(value)
+        elif field == b"event":
+            self.event = value.decode("utf-8", "replace")
+        elif field == b"id":
+            if b"\0" not in value:
+                self.id = value.decode("utf-8", "replace")
+        elif field == b"retry":
+            if value.isdigit():
+                self.retry = int(value)
+        return None
+
+    def dispatch(self) -> SSEEvent:
+        if not self.data:
+            self.event = ""
+            return None
+        data = self.data[0] if len(self.data) == 1 else b"\n".join(self.data)
+        event = SSEEvent(data, self.event or "message", self.id, self.retry)
+        self.data = []
+        self.event = ""
+        return event
@@ -0,0 +1,144 @@
+import ast
+import json
+import re
+
+# 字符串外需要关注的字符: 括号和引号
+OUTSIDE_STRING = re.compile(r'[{}\[\]"]')
+# 字符串内需要关注的字符: 引号和转义符
+INSIDE_STRING = re.compile(r'["\\]')
+# 对象/数组末尾多余的逗号
+TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+def lenient_json_loads(text: str):
+    """
+    宽松的JSON解析(不执行任何代码), 依次尝试:
+    1. 标准JSON
+    2. Python字面量(单引号, True/False/None), 通过 ast.literal_eval 安全解析
+    3. 去掉对象/数组末尾多余的逗号后再按JSON解析
+    :param text: 要解析的字符串
+    :return: 解析结果
+    """
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError as e:
+        error = e
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        pass
+    fixed = TRAILING_COMMA.sub(r"\1", text)
+    if fixed != text:
+        try:
+            return json.loads(fixed)
+        except json.JSONDecodeError:
+            pass
+    raise error
+
+
+class IncrementalJsonParser:
+    """
+    增量JSON扫描器, 用于流式拼接的工具调用参数
+    跨分片记录括号深度/字符串/转义状态, 每次 feed 只扫描新增的分片,
+    对象闭合时才完整解析一次, 避免每个分片都重新解析全部参数
+    """
+
+    def __init__(self):
+        self.chunks: list[str] = []
+        self.size = 0
+        self.end = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.started = False
+        self.complete = False
+        self.error: Exception = None
+        self._result = None
+        self._parsed = False
+
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+    def feed(self, chunk: str) -> bool:
+        """
+        输入新的分片
+        :param chunk: 新增的参数片段
+        :return: 顶层对象是否已经闭合
+        """
+        offset = self.size
+        self.chunks.append(chunk)
+        self.size += len(chunk)
+        if self.complete:
+            return True
+        pos = 0
+        size = len(chunk)
+        if self.escape:
+            # 上一分片以转义符结尾, 跳过被转义的字符
+            self.escape = False
+            pos = 1
+        while pos < size:
+            if self.in_string:
+                if not (match := INSIDE_STRING.search(chunk, pos)):
+                    break
+                i = match.start()
+                if chunk[i] == "\\":
+                    if i + 1 == size:
+                        self.escape = True
+                    pos = i + 2
+                    continue
+                self.in_string = False
+                pos = i + 1
+                continue
+            if not self.started:
+                # 参数必须以 { 开头
+                stripped = chunk[pos:].lstrip()
+                if not stripped:
+                    break
+                if stripped[0] != "{":
+                    self.complete = True
+                    self.error = json.JSONDecodeError("参数格式错误", self.text(), 0)
+                    return True
+                self.started = True
+            if not (match := OUTSIDE_STRING.search(chunk, pos)):
+                break
+            i = match.start()
+            c = chunk[i]
+            pos = i + 1
+            if c == '"':
+                self.in_string = True
+            elif c in "{[":
+                self.depth += 1
+            else:
+                self.depth -= 1
+                if self.depth <= 0:
+                    self.complete = True
+                    self.end = offset + pos
+                    break
+        return self.complete
+
+    def result(self):
+        """
+        解析完整的参数(只解析一次), 格式错误时抛出异常
+        """
+        if not self._parsed:
+            self._parsed = True
+            if self.error is None:
+                try:
+                    self._result = lenient_json_loads(self.text()[:self.end].strip())
+                except Exception as e:
+                    self.error = e
+        if self.error is not None:
+            raise self.error
+        return self._result
+
+    def ok(self) -> bool:
+        """
+        参数是否完整且可以解析
+        """
+        if not self.complete:
+            return False
+        try:
+            self.result()
+        except Exception:
+            return False
+        return True
@@ -1,4 +1,7 @@
+import atexit
 import logging
+import queue
+import threading
 from logging import handlers
 from pathlib import Path
 
@@ -6,6 +9,10 @@ NAME = "MCP_Client"
 
 DEBUG = True
 LOGFILE = Path(__file__).parent.joinpath("logs", "runtime.log")
+# 队列模式: 调用方只负责入队, 由后台线程统一格式化/写入/批量刷新
+USE_QUEUE = True
+# 后台线程每批最多处理的日志数量
+BATCH_SIZE = 256
 
 L = logging.WARNING
 if DEBUG:
@@ -21,7 +28,22 @@ FMTDICT = {
 }
 
 
-class KcHandler(logging.StreamHandler):
+class BatchFlushMixin:
+    """
+    批量刷新: deferred 为 True 时 emit 不再逐条 flush, 由队列线程每批调用一次 flush_now
+    """
+    deferred = False
+
+    def flush(self):
+        if self.deferred:
+            return
+        super().flush()
+
+    def flush_now(self):
+        super().flush()
+
+
+class KcHandler(BatchFlushMixin, logging.StreamHandler):
     with_same_line = False
 
     def emit(self, record):
@@ -47,6 +69,11 @@ class KcHandler(logging.StreamHandler):
             self.handleError(record)
 
 
+class KcFileHandler(BatchFlushMixin, handlers.TimedRotatingFileHandler):
+    # 所有 logger 共享, 单个 logger 关闭时不关闭
+    shared = True
+
+
 class KcFilter(logging.Filter):
     def __init__(self, **kwargs) -> None:
         super().__init__(**kwargs)
@@ -56,12 +83,134 @@ class KcFilter(logging.Filter):
         return f'\033{color_code}{msg}\033[0m'
 
     def filter(self, record: logging.LogRecord) -> bool:
+        # 颜色在 KcFormatter 格式化时才添加, 被 handler 丢弃的日志不做任何处理
+        return True
+
+
+class KcFormatter(logging.Formatter):
+    """
+    带颜色的格式化器, 只在真正输出时添加颜色, 不修改 record(其他 handler 仍能拿到原始内容)
+    """
+
+    def __init__(self, fmt=None, datefmt=None, kc_filter: KcFilter = None):
+        super().__init__(fmt, datefmt)
+        self.kc_filter = kc_filter or KcFilter()
+
+    def format(self, record: logging.LogRecord) -> str:
         # 颜色map
         color_code, level_shortname = FMTDICT.get(record.levelname, ["[37m", "UN"])
-        record.msg = self.translate_func(record.msg)
-        record.msg = self.fill_color(color_code, record.msg)
-        record.levelname = self.fill_color(color_code, level_shortname)
-        return True
+        msg, levelname = record.msg, record.levelname
+        record.msg = self.kc_filter.fill_color(color_code, self.kc_filter.translate_func(msg))
+        record.levelname = self.kc_filter.fill_color(color_code, level_shortname)
+        try:
+            return super().format(record)
+        finally:
+            record.msg, record.levelname = msg, levelname
+
+
+class KcQueueHandler(handlers.QueueHandler):
+    """
+    将日志交给后台线程处理, targets 为该 logger 实际输出的 handler
+    """
+
+    def __init__(self, log_queue, targets: list[logging.Handler]):
+        super().__init__(log_queue)
+        self.targets = targets
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 不在调用方线程格式化, 由后台线程按需格式化
+        record.kc_targets = self.targets
+        return record
+
+
+class KcQueueListener(handlers.QueueListener):
+    """
+    后台写日志线程: 每次取出一批日志, 分发给各自的 handler, 整批处理完后每个 handler 只 flush 一次
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue, respect_handler_level=True)
+
+    def handle(self, record: logging.LogRecord):
+        for handler in record.kc_targets:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def _monitor(self):
+        q = self.queue
+        has_task_done = hasattr(q, "task_done")
+        stop = False
+        while not stop:
+            batch = [q.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            touched = set()
+            for record in batch:
+                if record is self._sentinel:
+                    stop = True
+                else:
+                    self.handle(record)
+                    touched.update(record.kc_targets)
+                if has_task_done:
+                    q.task_done()
+            for handler in touched:
+                try:
+                    handler.flush_now()
+                except Exception:
+                    ...
+
+
+_lock = threading.Lock()
+_loggers: dict[str, "KcLogger"] = {}
+_file_handler: KcFileHandler = None
+_queue: queue.SimpleQueue = None
+_listener: KcQueueListener = None
+
+
+def get_file_handler() -> KcFileHandler:
+    """
+    获取共享的文件handler(所有 logger 写同一个文件, 只打开一次)
+    """
+    global _file_handler
+    if _file_handler is None:
+        fmter = logging.Formatter('[%(levelname)s]:%(filename)s>%(lineno)s: %(message)s')
+        # 按 D/H/M 天时分 保存日志, backupcount 为保留数量
+        if not LOGFILE.exists():
+            LOGFILE.parent.mkdir(parents=True, exist_ok=True)
+            LOGFILE.touch()
+        dfh = KcFileHandler(filename=LOGFILE, when='D', backupCount=2, encoding='utf-8')  # 添加 encoding='utf-8'
+        dfh.setLevel(logging.DEBUG)
+        dfh.setFormatter(fmter)
+        dfh.deferred = USE_QUEUE
+        _file_handler = dfh
+    return _file_handler
+
+
+def get_log_queue() -> queue.SimpleQueue:
+    """
+    获取日志队列, 首次调用时启动后台写日志线程
+    """
+    global _queue, _listener
+    if _queue is None:
+        _queue = queue.SimpleQueue()
+        _listener = KcQueueListener(_queue)
+        _listener.start()
+        atexit.register(stop_listener)
+    return _queue
+
+
+def stop_listener():
+    """
+    停止后台写日志线程(会先写完队列中剩余的日志)
+    """
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
 
 
 class KcLogger(logging.Logger):
@@ -71,16 +220,20 @@ class KcLogger(logging.Logger):
 
     def set_translate(self, translate_func):
         for handler in self.handlers:
-            for filter in handler.filters:
-                if not isinstance(filter, KcFilter):
-                    continue
-                filter.translate_func = translate_func
+            for target in getattr(handler, "targets", [handler]):
+                for filter in target.filters:
+                    if not isinstance(filter, KcFilter):
+                        continue
+                    filter.translate_func = translate_func
 
     def close(self):
         if self.closed:
             return
         self.closed = True
         for h in reversed(self.handlers[:]):
+            if getattr(h, "shared", False):
+                # 共享的handler由其他 logger 继续使用
+                continue
             try:
                 try:
                     h.acquire()
@@ -98,29 +251,28 @@ class KcLogger(logging.Logger):
 
 
 def getLogger(name="CLOG", level=logging.INFO, fmt='[%(name)s-%(levelname)s]: %(message)s', fmt_date="%H:%M:%S") -> KcLogger:
-    fmter = logging.Formatter('[%(levelname)s]:%(filename)s>%(lineno)s: %(message)s')
-    # 按 D/H/M 天时分 保存日志, backupcount 为保留数量
-    if not LOGFILE.exists():
-        LOGFILE.parent.mkdir(parents=True, exist_ok=True)
-        LOGFILE.touch()
-    dfh = handlers.TimedRotatingFileHandler(filename=LOGFILE, when='D', backupCount=2, encoding='utf-8')  # 添加 encoding='utf-8'
-    dfh.setLevel(logging.DEBUG)
-    dfh.setFormatter(fmter)
-
-    filter = KcFilter()
-    fmter = logging.Formatter(fmt, fmt_date)
-    ch = KcHandler()
-    ch.setLevel(level)
-    ch.setFormatter(fmter)
-    ch.addFilter(filter)
-
-    l = KcLogger(name)
-    l.setLevel(level)
-    # 防止卸载模块后重新加载导致 重复打印
-    if not l.hasHandlers():
-        # 注意添加顺序, ch有filter, 如果fh后添加 则会默认带上ch的filter
-        l.addHandler(dfh)
-        l.addHandler(ch)
+    with _lock:
+        # 同名 logger 只创建一次, 防止卸载模块后重新加载导致 重复打印
+        if l := _loggers.get(name):
+            return l
+        dfh = get_file_handler()
+
+        filter = KcFilter()
+        fmter = KcFormatter(fmt, fmt_date, filter)
+        ch = KcHandler()
+        ch.setLevel(level)
+        ch.setFormatter(fmter)
+        ch.addFilter(filter)
+        ch.deferred = USE_QUEUE
+
+        l = KcLogger(name)
+        l.setLevel(level)
+        if USE_QUEUE:
+            l.addHandler(KcQueueHandler(get_log_queue(), [dfh, ch]))
+        else:
+            l.addHandler(dfh)
+            l.addHandler(ch)
+        _loggers[name] = l
     return l
 
 logger = getLogger(NAME, L)
\ No newline at end of file
@@ -0,0 +1,292 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from inspect import iscoroutinefunction
+from time import perf_counter
+
+from logger import getLogger
+
+logger = getLogger("Metrics")
+
+# 默认的直方图分桶(秒), 覆盖从单个分片解析(微秒级)到工具执行(秒级)
+DEFAULT_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+def format_labels(labels: tuple, extra: str = "") -> str:
+    items = [f'{key}="{escape_label(value)}"' for key, value in labels]
+    if extra:
+        items.append(extra)
+    return "{" + ",".join(items) + "}" if items else ""
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsBackend:
+    """
+    指标后端接口, 可以替换为 StatsD/OpenTelemetry 等实现
+    所有方法都可能在多个线程中调用, 实现需要保证线程安全
+    """
+
+    def describe(self, name: str, kind: str, description: str):
+        """
+        声明指标
+        :param name: 指标名
+        :param kind: "counter" 或 "histogram"
+        :param description: 指标说明
+        """
+
+    def inc(self, name: str, value: float, labels: tuple):
+        """
+        计数器增加 value
+        :param labels: 排序后的 ((key, value), ...)
+        """
+
+    def observe(self, name: str, value: float, labels: tuple):
+        """
+        直方图记录一次观测值
+        """
+
+    def render(self) -> str:
+        """
+        以 Prometheus 文本格式导出所有指标
+        """
+        return ""
+
+
+class NullBackend(MetricsBackend):
+    """
+    不记录任何指标
+    """
+
+
+class PrometheusBackend(MetricsBackend):
+    """
+    进程内存储的指标, 以 Prometheus 文本格式导出
+    params: buckets: tuple[float] 直方图分桶上限(秒)
+    """
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.lock = threading.Lock()
+        self.descriptions: dict[str, tuple[str, str]] = {}
+        self.counters: dict[str, dict[tuple, float]] = {}
+        # {name: {labels: [各分桶计数..., 总和, 总数]}}
+        self.histograms: dict[str, dict[tuple, list]] = {}
+
+    def describe(self, name: str, kind: str, description: str):
+        self.descriptions[name] = (kind, description)
+
+    def inc(self, name: str, value: float, labels: tuple):
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[labels] = series.get(labels, 0) + value
+
+    def observe(self, name: str, value: float, labels: tuple):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            if (data := series.get(labels)) is None:
+                data = series[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            data[index] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def render(self) -> str:
+        with self.lock:
+            counters = {name: dict(series) for name, series in self.counters.items()}
+            histograms = {name: {k: list(v) for k, v in series.items()} for name, series in self.histograms.items()}
+        lines = []
+        for name, series in sorted(counters.items()):
+            self.render_header(lines, name, "counter")
+            for labels, value in series.items():
+                lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+        bounds = self.buckets + (float("inf"),)
+        for name, series in sorted(histograms.items()):
+            self.render_header(lines, name, "histogram")
+            for labels, data in series.items():
+                # Prometheus 的分桶计数是累计值
+                total = 0
+                for bound, count in zip(bounds, data):
+                    total += count
+                    le = 'le="%s"' % format_value(bound)
+                    lines.append(f"{name}_bucket{format_labels(labels, le)} {total}")
+                lines.append(f"{name}_sum{format_labels(labels)} {format_value(data[-2])}")
+                lines.append(f"{name}_count{format_labels(labels)} {data[-1]}")
+        return "\n".join(lines) + "\n"
+
+    def render_header(self, lines: list, name: str, kind: str):
+        _, description = self.descriptions.get(name, (kind, ""))
+        if description:
+            lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+
+
+class Metrics:
+    """
+    进程内的指标入口, 客户端和服务器的热点路径通过它记录计数和耗时
+    params: backend: MetricsBackend 指标后端, 可通过 set_backend 替换
+    params: enabled: bool = True 为 False 时 timer/timed 不再计时
+    """
+    backend: MetricsBackend = PrometheusBackend()
+    enabled = True
+    descriptions: dict[str, tuple[str, str]] = {}
+
+    @classmethod
+    def set_backend(cls, backend: MetricsBackend):
+        """
+        替换指标后端, 已声明的指标会同步到新后端
+        """
+        cls.backend = backend
+        for name, (kind, description) in cls.descriptions.items():
+            backend.describe(name, kind, description)
+
+    @classmethod
+    def describe(cls, name: str, kind: str, description: str):
+        cls.descriptions[name] = (kind, description)
+        cls.backend.describe(name, kind, description)
+
+    @classmethod
+    def inc(cls, name: str, value: float = 1, **labels):
+        """
+        计数器增加 value
+        """
+        cls.backend.inc(name, value, tuple(sorted(labels.items())))
+
+    @classmethod
+    def observe(cls, name: str, value: float, **labels):
+        """
+        直方图记录一次观测值(秒)
+        """
+        cls.backend.observe(name, value, tuple(sorted(labels.items())))
+
+    @classmethod
+    @contextmanager
+    def timer(cls, name: str, **labels):
+        """
+        记录代码块耗时(秒), 代码块抛出异常时同样记录
+        """
+        if not cls.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            cls.observe(name, time.perf_counter() - start, **labels)
+
+    @classmethod
+    def timed(cls, name: str, **labels):
+        """
+        装饰器, 记录函数(同步或异步)每次调用的耗时
+        """
+        # 标签在装饰时只处理一次, 热点函数每次调用只多两次计时和一次 observe
+        key = tuple(sorted(labels.items()))
+
+        def decorator(func):
+            if iscoroutinefunction(func):
+                @wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    if not cls.enabled:
+                        return await func(*args, **kwargs)
+                    start = perf_counter()
+                    try:
+                        return await func(*args, **kwargs)
+                    finally:
+                        cls.backend.observe(name, perf_counter() - start, key)
+                return async_wrapper
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not cls.enabled:
+                    return func(*args, **kwargs)
+                start = perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    cls.backend.observe(name, perf_counter() - start, key)
+            return wrapper
+
+        return decorator
+
+    @classmethod
+    def render(cls) -> str:
+        return cls.backend.render()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in {"/metrics", "/"}:
+            self.send_error(404)
+            return
+        body = Metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 采集请求很频繁, 不写入日志
+        pass
+
+
+class MetricsExporter:
+    """
+    在后台线程中提供 Prometheus 采集接口: http://host:port/metrics
+    """
+    server: ThreadingHTTPServer = None
+    thread: threading.Thread = None
+
+    @classmethod
+    def start(cls, host: str = "localhost", port: int = 45678):
+        if cls.server:
+            return cls.server
+        cls.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        cls.server.daemon_threads = True
+        cls.thread = threading.Thread(target=cls.server.serve_forever, name="MetricsExporter", daemon=True)
+        cls.thread.start()
+        logger.info(f"指标采集地址: http://{host}:{cls.server.server_address[1]}/metrics")
+        return cls.server
+
+    @classmethod
+    def stop(cls):
+        if not cls.server:
+            return
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.server = None
+        cls.thread = None
+
+
+# region 指标声明
+Metrics.describe("http_connect_seconds", "histogram", "建立HTTP连接的耗时(stage=tcp/tls)")
+Metrics.describe("llm_first_chunk_seconds", "histogram", "从发送请求到收到第一个流式分片的耗时")
+Metrics.describe("llm_request_seconds", "histogram", "单次大模型流式请求的总耗时")
+Metrics.describe("llm_requests_total", "counter", "大模型请求次数")
+Metrics.describe("client_parse_line_seconds", "histogram", "解析单个流式事件(SSE event)的耗时")
+Metrics.describe("client_tool_arguments_seconds", "histogram", "拼接并增量扫描单个工具参数分片的耗时")
+Metrics.describe("client_call_tool_seconds", "histogram", "session.call_tool 的往返耗时")
+Metrics.describe("client_tool_calls_total", "counter", "客户端发起的工具调用次数")
+Metrics.describe("server_execute_function_seconds", "histogram", "服务器执行工具函数的耗时")
+Metrics.describe("server_tool_executions_total", "counter", "服务器执行工具函数的次数")
+Metrics.describe("server_serialize_seconds", "histogram", "rounding_dumps 序列化工具结果的耗时")
+# endregion 指标声明
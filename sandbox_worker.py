@@ -0,0 +1,121 @@
+import contextlib
+import importlib
+import io
+import json
+import math
+import sys
+import traceback
+import types
+from multiprocessing.connection import Client
+
+# 沙箱工作进程, 由 server.sandbox.SandboxPool 以脚本方式启动: python sandbox_worker.py <地址>, 选项从 stdin 读取
+# 只能依赖标准库(不能放在 server 包中, 否则工作进程会导入 mcp 等整个服务器)
+
+try:
+    import resource
+except ImportError:
+    # Windows 不支持 rlimit, 只保留超时限制
+    resource = None
+
+
+def json_safe(value, limit: int = 2000):
+    """
+    转换为JSON兼容的值, 无法序列化的对象转换为(截断的) repr
+    """
+    try:
+        json.dumps(value)
+        return value
+    except (TypeError, ValueError, OverflowError):
+        text = repr(value)
+        return text if len(text) <= limit else text[:limit] + "..."
+
+
+def cpu_time() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def set_limits(cpu_seconds: int, memory_mb: int, max_uses: int):
+    """
+    在工作进程中设置内存(地址空间)上限和整个进程生命周期的 CPU 时间硬上限
+    每次执行的 CPU 时间由 reset_cpu_limit 通过软上限限制
+    """
+    if resource is None:
+        return
+    if cpu_seconds:
+        # 硬上限不能再调高: 按最多执行次数计算, 同时防止执行的代码自行调高软上限
+        hard = math.ceil(cpu_time()) + cpu_seconds * (max_uses + 1) + 1
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+    if memory_mb:
+        size = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (size, size))
+
+
+def reset_cpu_limit(cpu_seconds: int):
+    """
+    每次执行前把 CPU 时间软上限设置为 已使用的时间 + 单次预算, 超出时进程收到 SIGXCPU 被结束
+    """
+    if resource is None or not cpu_seconds:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = math.ceil(cpu_time()) + cpu_seconds
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def worker_main(conn, preload: tuple, cpu_seconds: int, memory_mb: int, max_output: int, max_uses: int):
+    """
+    工作进程: 预先导入常用模块, 循环接收代码并执行
+    每次执行使用新的命名空间, 只返回JSON兼容的结果
+    """
+    for name in preload:
+        with contextlib.suppress(ImportError):
+            importlib.import_module(name)
+    set_limits(cpu_seconds, memory_mb, max_uses)
+    while True:
+        try:
+            code = conn.recv()
+        except (EOFError, OSError):
+            break
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        namespace = {"__name__": "__sandbox__"}
+        response = {"executed": True}
+        reset_cpu_limit(cpu_seconds)
+        try:
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                exec(code, namespace)
+        except MemoryError:
+            response = {"executed": False, "error": "MemoryError: memory limit exceeded"}
+        except BaseException as e:
+            response = {"executed": False, "error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc(limit=5)}
+        # result 是代码的返回值, 即使是模块/函数/类也要返回(无法序列化时为 repr)
+        if "result" in namespace:
+            response["result"] = json_safe(namespace.pop("result"))
+        variables = {}
+        for key, value in namespace.items():
+            if key.startswith("_") or isinstance(value, (types.ModuleType, types.FunctionType, type)):
+                continue
+            variables[key] = json_safe(value)
+        response["variables"] = variables
+        response["stdout"] = stdout.getvalue()[:max_output]
+        response["stderr"] = stderr.getvalue()[:max_output]
+        try:
+            conn.send(response)
+        except (EOFError, OSError):
+            break
+
+
+def main():
+    options = json.loads(sys.stdin.read())
+    authkey = bytes.fromhex(options.pop("authkey"))
+    conn = Client(sys.argv[1], authkey=authkey)
+    try:
+        worker_main(conn, tuple(options.pop("preload")), **options)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from logger import getLogger
+from metrics import Metrics
+
+logger = getLogger("ToolCache")
+
+Metrics.describe("server_tool_cache_total", "counter", "工具结果缓存的查询次数(result=hit/miss/stale)")
+
+
+def canonical_key(name: str, params: dict) -> tuple[str, str]:
+    """
+    规范化工具参数作为缓存键: 键排序, 紧凑分隔符, 较长的参数使用摘要
+    """
+    text = json.dumps(params or {}, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=repr)
+    if len(text) > 256:
+        text = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return name, text
+
+
+def file_mtime(*param_names: str) -> Callable[[dict], tuple]:
+    """
+    失效检查: 参数中的路径(字符串或路径列表)的修改时间/大小变化时缓存失效
+    例: @tool_options(cacheable=True, cache_invalidator=file_mtime("file_path"))
+    :param param_names: 路径参数名
+    """
+    def stat_path(path):
+        try:
+            st = os.stat(path)
+            return st.st_mtime_ns, st.st_size
+        except (OSError, TypeError, ValueError):
+            return None
+
+    def invalidator(params: dict) -> tuple:
+        token = []
+        for name in param_names:
+            value = params.get(name)
+            if isinstance(value, (list, tuple)):
+                token.append(tuple(stat_path(path) for path in value))
+            else:
+                token.append(stat_path(value))
+        return tuple(token)
+
+    return invalidator
+
+
+class ToolCache:
+    """
+    幂等工具的结果缓存(进程内, 所有工具共享), 按最近使用淘汰
+    缓存的是序列化后的完整结果, 工具报错(异常或返回 {"error": ...})时不缓存
+    params: max_size: int = 512 最多缓存的结果数量
+    params: ttl: float = 60 默认的缓存时间(秒)
+    params: max_entry_chars: int = 1_000_000 超过该长度的结果不缓存
+    params: hits/misses: int 命中/未命中次数
+    """
+    max_size = 512
+    ttl = 60
+    max_entry_chars = 1_000_000
+    hits = 0
+    misses = 0
+
+    _lock = threading.Lock()
+    # {key: (过期时间, 失效检查值, 结果)}
+    _entries: OrderedDict[tuple, tuple[float, object, str]] = OrderedDict()
+
+    @classmethod
+    def lookup(cls, name: str, params: dict, invalidator: Callable = None) -> tuple[tuple, object, str]:
+        """
+        查询缓存
+        :param name: 工具名
+        :param params: 工具参数
+        :param invalidator: 失效检查函数 invalidator(params) -> 值, 与缓存时的值不同则失效
+        :return: (缓存键, 当前的失效检查值, 结果), 未命中时结果为 None
+        """
+        key = canonical_key(name, params)
+        # 在执行工具之前计算失效检查值, 避免执行期间文件变化导致缓存旧结果
+        token = invalidator(params) if invalidator else None
+        now = time.monotonic()
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry and entry[0] > now and entry[1] == token:
+                cls._entries.move_to_end(key)
+                cls.hits += 1
+                Metrics.inc("server_tool_cache_total", tool=name, result="hit")
+                return key, token, entry[2]
+            cls.misses += 1
+            if entry:
+                cls._entries.pop(key)
+        Metrics.inc("server_tool_cache_total", tool=name, result="stale" if entry else "miss")
+        return key, token, None
+
+    @classmethod
+    def store(cls, key: tuple, token, result: str, ttl: float = None):
+        """
+        保存结果
+        :param key: lookup 返回的缓存键
+        :param token: lookup 返回的失效检查值
+        :param ttl: 该工具的缓存时间, 为空时使用默认值
+        """
+        if not isinstance(result, str) or len(result) > cls.max_entry_chars:
+            return
+        expires = time.monotonic() + (cls.ttl if ttl is None else ttl)
+        with cls._lock:
+            cls._entries[key] = (expires, token, result)
+            cls._entries.move_to_end(key)
+            while len(cls._entries) > cls.max_size:
+                cls._entries.popitem(last=False)
+
+    @classmethod
+    def invalidate(cls, name: str = None):
+        """
+        清除缓存
+        :param name: 工具名, 为空时清除全部
+        """
+        with cls._lock:
+            if name is None:
+                cls._entries.clear()
+                return
+            for key in [key for key in cls._entries if key[0] == name]:
+                cls._entries.pop(key)
+
+    @classmethod
+    def stats(cls) -> dict:
+        with cls._lock:
+            return {"size": len(cls._entries), "hits": cls.hits, "misses": cls.misses}
@@ -1,17 +1,41 @@
+import asyncio
 import functools
 import logging
 import json
+import multiprocessing
+import os
+from concurrent.futures import Executor as PoolExecutor, ProcessPoolExecutor, ThreadPoolExecutor
+from .cache import ToolCache
+from .result_store import ResultStore
 from .utils import rounding_dumps
 from logger import getLogger
+from metrics import Metrics
 
 logger = getLogger("Executor")
 
 
+def run_function(func, params):
+    """
+    在线程池/进程池中执行函数(模块级函数, 以便进程池序列化)
+    """
+    return func(**params)
+
+
 class Executor:
     """
     Executor类, 用于执行函数调用
+    工具可以在注册时声明执行方式(backend):
+    - None: 在服务器事件循环中直接执行(默认)
+    - "thread": 在线程池中执行, 不阻塞其他客户端
+    - "process": 在进程池中执行, 适合CPU密集型工具(函数和返回值需要可序列化)
+    params: max_workers: dict[str, int] 每种执行方式的最大工作线程/进程数
+    params: pools: dict[str, PoolExecutor] 已创建的线程池/进程池
+    params: print_limit: int 控制台打印执行结果的最大字符数
     """
     instance = None
+    print_limit = 2000
+    max_workers = {"thread": 8, "process": os.cpu_count() or 2}
+    pools: dict[str, PoolExecutor] = {}
 
     @classmethod
     def get(cls) -> "Executor":
@@ -33,11 +57,12 @@ class Executor:
             cls.instance = super().__new__(cls)
         return cls.instance
 
-    def send_function_call(self, func, params):
+    def send_function_call(self, func, params, cache: dict = None):
         """
         发送函数调用请求, 并返回结果
         :param func: 要调用的函数
         :param params: 函数参数, 可以是字典或列表
+        :param cache: 缓存选项 {"ttl": 缓存时间, "invalidator": 失效检查函数}, 为空时不缓存
         :return: 函数执行结果
         """
         # if not func:
@@ -48,10 +73,64 @@ class Executor:
         #     raise ValueError("params must be a dict or list")
         
         name = func.__name__
+        cache_entry = self.lookup_cache(name, params, cache)
+        if cache_entry and cache_entry[2] is not None:
+            return ResultStore.paginate(name, cache_entry[2])
         command = {"func": func, "name": name, "params": params or {}}
 
         logger.info(f"Received command: {name} with parameters: {params}")
         response = self.execute_function(command)
+        return self.build_result(name, response, cache_entry, cache)
+
+    async def send_function_call_async(self, func, params, backend: str = None, timeout: float = None, cache: dict = None):
+        """
+        发送函数调用请求, 在线程池/进程池中执行, 不阻塞事件循环
+        :param func: 要调用的函数
+        :param params: 函数参数
+        :param backend: 执行方式, "thread" 或 "process", 为空时直接执行
+        :param timeout: 超时时间(秒), 为空时不限制
+        :param cache: 缓存选项, 见 send_function_call
+        :return: 函数执行结果
+        """
+        name = func.__name__
+        loop = asyncio.get_running_loop()
+        if backend and cache and cache.get("invalidator"):
+            # 失效检查可能有文件I/O(stat 等), 与工具一样放到线程池中执行, 不阻塞事件循环
+            cache_entry = await loop.run_in_executor(self.get_pool("thread"), self.lookup_cache, name, params, cache)
+        else:
+            cache_entry = self.lookup_cache(name, params, cache)
+        if cache_entry and cache_entry[2] is not None:
+            return ResultStore.paginate(name, cache_entry[2])
+        command = {"func": func, "name": name, "params": params or {}}
+
+        logger.info(f"Received command: {name} with parameters: {params} ({backend or 'inline'})")
+        response = await self.execute_function_async(command, backend, timeout)
+        if not backend:
+            return self.build_result(name, response, cache_entry, cache)
+        # 序列化和打印大结果同样耗时, 在线程池中执行, 不阻塞其他客户端
+        return await loop.run_in_executor(self.get_pool("thread"), self.build_result, name, response, cache_entry, cache)
+
+    def lookup_cache(self, name, params, cache: dict = None):
+        """
+        查询工具结果缓存
+        :return: ToolCache.lookup 的返回值, 不缓存时返回 None
+        """
+        if cache is None:
+            return None
+        cache_entry = ToolCache.lookup(name, params or {}, cache.get("invalidator"))
+        if cache_entry[2] is not None:
+            logger.info(f"Cache hit: {name} with parameters: {params}")
+        return cache_entry
+
+    def build_result(self, name, response, cache_entry: tuple = None, cache: dict = None):
+        """
+        检查执行状态并序列化执行结果
+        :param name: 函数名
+        :param response: execute_function 的返回值
+        :param cache_entry: lookup_cache 的返回值, 不为空时缓存结果
+        :param cache: 缓存选项
+        :return: 序列化后的执行结果
+        """
         logger.info(f"Execution status: {response.get('status', 'unknown')}")
 
         if response.get("status") == "error":
@@ -60,9 +139,14 @@ class Executor:
         result_str = rounding_dumps(response.get("result", {}), ensure_ascii=False)
         print("\n--------------------------------", flush=True)
         print(f"\tSelected function: {name}")
-        print(f"\tExecution result: {result_str}")
+        print(f"\tExecution result: {result_str[:self.print_limit]}")
         print("--------------------------------\n", flush=True)
-        return result_str
+        result = response.get("result")
+        # 工具自身返回的错误信息不缓存
+        if cache_entry and not (isinstance(result, dict) and "error" in result):
+            ToolCache.store(cache_entry[0], cache_entry[1], result_str, cache.get("ttl"))
+        # 超过一页的结果只返回第一页, 其余内容通过 read_tool_result 分页读取
+        return ResultStore.paginate(name, result_str)
 
     def execute_function(self, command):
         """
@@ -81,11 +165,88 @@ class Executor:
         
         func = command.get("func")
         name = command.get("name") or func.__name__
+        status = "error"
         try:
-            params = command.get("params", {})
-            logger.info(f"Executing function: {name} with parameters: {params}")
-            result = func(**params)
+            with Metrics.timer("server_execute_function_seconds", tool=name, backend="inline"):
+                params = command.get("params", {})
+                logger.info(f"Executing function: {name} with parameters: {params}")
+                result = func(**params)
+            status = "success"
             return {"status": "success", "result": result}
         except Exception as e:
             logger.error(f"Error executing {name}: {str(e)}")
-            return {"status": "error", "message": str(e)}
\ No newline at end of file
+            return {"status": "error", "message": str(e)}
+        finally:
+            Metrics.inc("server_tool_executions_total", tool=name, backend="inline", status=status)
+
+    async def execute_function_async(self, command, backend: str = None, timeout: float = None):
+        """
+        在线程池/进程池中执行函数调用, 超时或被取消时放弃等待结果
+        注意: 已经开始执行的线程无法被强制终止, 超时只会让调用方不再等待
+        :param command: 函数调用命令, 包含函数和参数
+        :param backend: 执行方式, "thread" 或 "process", 为空时直接执行
+        :param timeout: 超时时间(秒)
+        :return: 函数执行结果
+        """
+        if not backend:
+            return self.execute_function(command)
+        func = command.get("func")
+        name = command.get("name") or func.__name__
+        params = command.get("params", {})
+        status = "error"
+        try:
+            with Metrics.timer("server_execute_function_seconds", tool=name, backend=backend):
+                logger.info(f"Executing function: {name} with parameters: {params}")
+                loop = asyncio.get_running_loop()
+                job = loop.run_in_executor(self.get_pool(backend), run_function, func, params)
+                result = await asyncio.wait_for(job, timeout)
+            status = "success"
+            return {"status": "success", "result": result}
+        except asyncio.TimeoutError:
+            status = "timeout"
+            logger.error(f"Timeout executing {name}: {timeout}s")
+            return {"status": "error", "message": f"Execution timed out after {timeout}s"}
+        except Exception as e:
+            logger.error(f"Error executing {name}: {str(e)}")
+            return {"status": "error", "message": str(e)}
+        finally:
+            Metrics.inc("server_tool_executions_total", tool=name, backend=backend, status=status)
+
+    @classmethod
+    def get_pool(cls, backend: str) -> PoolExecutor:
+        """
+        获取(必要时创建)线程池/进程池
+        :param backend: "thread" 或 "process"
+        """
+        if pool := cls.pools.get(backend):
+            return pool
+        workers = cls.max_workers.get(backend)
+        if backend == "thread":
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="MCPTool")
+        elif backend == "process":
+            # 服务器运行在多线程环境中, 使用 spawn 避免 fork 带来的锁状态问题
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        else:
+            raise ValueError(f"Unknown executor backend: {backend}")
+        cls.pools[backend] = pool
+        return pool
+
+    @classmethod
+    def configure(cls, thread_workers: int = None, process_workers: int = None):
+        """
+        配置线程池/进程池大小, 已创建的池会被关闭并在下次使用时重新创建
+        """
+        if thread_workers:
+            cls.max_workers["thread"] = thread_workers
+        if process_workers:
+            cls.max_workers["process"] = process_workers
+        cls.shutdown()
+
+    @classmethod
+    def shutdown(cls, wait=False):
+        """
+        关闭所有线程池/进程池
+        """
+        for pool in cls.pools.values():
+            pool.shutdown(wait=wait, cancel_futures=True)
+        cls.pools.clear()
\ No newline at end of file
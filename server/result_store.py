@@ -0,0 +1,129 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from logger import getLogger
+
+logger = getLogger("ResultStore")
+
+
+class ResultStore:
+    """
+    大结果分页: 超过 page_size 的工具结果只返回第一页, 完整结果暂存在服务器,
+    模型(或客户端)通过 read_tool_result 工具按偏移读取后续内容
+    params: page_size: int = 16000 每页字符数, 为 0 时不分页
+    params: max_results: int = 64 最多暂存的结果数量
+    params: max_total_chars: int = 32_000_000 暂存结果的总字符数上限, 超出时淘汰最早的结果
+    params: ttl: float = 600 结果的保存时间(秒)
+    """
+    page_size = 16000
+    max_results = 64
+    max_total_chars = 32_000_000
+    ttl = 600
+
+    _lock = threading.Lock()
+    _results: OrderedDict[str, tuple[float, str, str]] = OrderedDict()
+    _total_chars = 0
+
+    @classmethod
+    def configure(cls, page_size: int = None, max_results: int = None, max_total_chars: int = None, ttl: float = None):
+        if page_size is not None:
+            cls.page_size = page_size
+        if max_results is not None:
+            cls.max_results = max_results
+        if max_total_chars is not None:
+            cls.max_total_chars = max_total_chars
+        if ttl is not None:
+            cls.ttl = ttl
+
+    @classmethod
+    def paginate(cls, name: str, result: str) -> str:
+        """
+        结果超过一页时暂存完整结果, 返回第一页和读取后续内容的说明
+        :param name: 工具名
+        :param result: 序列化后的完整结果
+        :return: 不超过一页的结果
+        """
+        if not cls.page_size or len(result) <= cls.page_size:
+            return result
+        if len(result) > cls.max_total_chars:
+            logger.warning(f"{name} 的结果过大({len(result)} 字符), 只保留前 {cls.max_total_chars} 字符")
+            result = result[:cls.max_total_chars]
+        result_id = uuid.uuid4().hex[:12]
+        with cls._lock:
+            cls._evict(len(result))
+            cls._results[result_id] = (time.monotonic(), name, result)
+            cls._total_chars += len(result)
+        return cls.page(result_id, result, 0, cls.page_size)
+
+    @classmethod
+    def read(cls, result_id: str, offset: int = 0, limit: int = None) -> str:
+        """
+        读取暂存结果的一页
+        :param result_id: paginate 返回的结果ID
+        :param offset: 起始字符偏移
+        :param limit: 读取的字符数, 默认一页
+        """
+        if offset is None or offset < 0:
+            raise ValueError(f"offset must be >= 0, got {offset}")
+        if limit is not None and limit < 0:
+            raise ValueError(f"limit must be >= 0, got {limit}")
+        with cls._lock:
+            cls._evict(0)
+            if not (item := cls._results.get(result_id)):
+                raise KeyError(f"Result not found or expired: {result_id}")
+            # 读取时刷新保存时间, 保证 _results 按时间排序
+            cls._results[result_id] = (time.monotonic(), item[1], item[2])
+            cls._results.move_to_end(result_id)
+        if offset > len(item[2]):
+            raise ValueError(f"offset {offset} is beyond the end of result {result_id} ({len(item[2])} characters)")
+        limit = min(limit or cls.page_size, cls.page_size)
+        return cls.page(result_id, item[2], offset, limit)
+
+    @staticmethod
+    def page(result_id: str, result: str, offset: int, limit: int) -> str:
+        end = min(offset + limit, len(result))
+        content = result[offset:end]
+        if end >= len(result):
+            return content + f"\n[结果 {result_id} 共 {len(result)} 字符, 已读取到末尾]"
+        return content + (
+            f"\n[结果 {result_id} 共 {len(result)} 字符, 当前 {offset}-{end}, "
+            f'继续读取请调用 read_tool_result(result_id="{result_id}", offset={end})]'
+        )
+
+    @classmethod
+    def _evict(cls, incoming: int):
+        """
+        淘汰过期结果, 并为新结果腾出空间(调用方持有锁)
+        """
+        deadline = time.monotonic() - cls.ttl
+        while cls._results:
+            result_id, (created, _, result) = next(iter(cls._results.items()))
+            full = len(cls._results) >= cls.max_results or cls._total_chars + incoming > cls.max_total_chars
+            if created > deadline and not (incoming and full):
+                break
+            cls._results.pop(result_id)
+            cls._total_chars -= len(result)
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._results.clear()
+            cls._total_chars = 0
+
+
+def read_tool_result(result_id: str, offset: int = 0, limit: int = 0) -> str:
+    """
+    cn: 读取被分页的工具结果
+    en: Read the next page of a large tool result that was split into pages.
+
+    Args:
+    - result_id: The result id shown at the end of the previous page
+    - offset: Character offset to start reading from
+    - limit: Number of characters to read (0 for one page)
+    """
+    try:
+        return ResultStore.read(result_id, offset, limit or None)
+    except (KeyError, ValueError) as e:
+        return f"Error: {e.args[0]}"
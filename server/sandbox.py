@@ -0,0 +1,182 @@
+import atexit
+import contextlib
+import json
+import os
+import queue
+import subprocess
+import threading
+import time
+from multiprocessing import spawn
+from multiprocessing.connection import Client, Listener
+
+import sandbox_worker
+from logger import getLogger
+
+logger = getLogger("Sandbox")
+
+
+class SandboxWorker:
+    """
+    一个预先启动的工作进程
+    以脚本方式运行只依赖标准库的 sandbox_worker.py, 工作进程不会导入服务器的 __main__ 和 server 包(mcp 等),
+    启动后通过 multiprocessing.connection 连接回服务器(POSIX 为 Unix socket, Windows 为命名管道)
+    """
+
+    def __init__(self, options: dict):
+        authkey = os.urandom(32)
+        connected = threading.Event()
+        with Listener(authkey=authkey) as listener:
+            self.process = subprocess.Popen(
+                [spawn.get_executable(), sandbox_worker.__file__, str(listener.address)],
+                stdin=subprocess.PIPE,
+            )
+            self.process.stdin.write(json.dumps({**options, "authkey": authkey.hex()}).encode("utf-8"))
+            self.process.stdin.close()
+
+            def unblock():
+                # 工作进程在连接前退出时, 主动连接一次使 accept 返回
+                self.process.wait()
+                if not connected.is_set():
+                    with contextlib.suppress(Exception):
+                        Client(listener.address, authkey=authkey).close()
+
+            threading.Thread(target=unblock, name="SandboxWatch", daemon=True).start()
+            self.conn = listener.accept()
+            connected.set()
+        if self.process.poll() is not None:
+            self.conn.close()
+            raise RuntimeError(f"Sandbox worker exited during startup (exit code {self.process.returncode})")
+        self.used = 0
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def exitcode(self) -> int:
+        return self.process.poll()
+
+    def kill(self):
+        with contextlib.suppress(Exception):
+            self.process.kill()
+            self.process.wait(1)
+        self.conn.close()
+
+
+class SandboxPool:
+    """
+    执行 Python 代码的沙箱进程池
+    工作进程预先启动并导入常用模块, 每次执行不需要重新启动解释器;
+    代码崩溃/超时/超出资源限制时只影响工作进程, 该进程被结束并立即在后台补充新的进程
+    params: size: int = 2 工作进程数量
+    params: timeout: float = 30 单次执行的最长时间(秒), 超时后结束工作进程
+    params: cpu_seconds: int = 30 单次执行的CPU时间上限(秒, 仅POSIX), 每次执行前重新计算
+    params: memory_mb: int = 512 单个工作进程的内存上限(MB, 仅POSIX)
+    params: max_output: int = 100000 返回的 stdout/stderr 最大字符数
+    params: max_uses: int = 100 工作进程执行多少次后重启, 避免状态(已导入的模块等)累积
+    params: preload: tuple[str] 预先导入的模块
+    """
+    size = 2
+    timeout = 30
+    cpu_seconds = 30
+    memory_mb = 512
+    max_output = 100000
+    max_uses = 100
+    preload = ("json", "math", "re", "datetime", "collections", "itertools", "functools", "statistics")
+
+    _lock = threading.Lock()
+    _idle: queue.Queue = None
+    _started = False
+
+    @classmethod
+    def options(cls) -> dict:
+        return {
+            "preload": cls.preload,
+            "cpu_seconds": cls.cpu_seconds,
+            "memory_mb": cls.memory_mb,
+            "max_output": cls.max_output,
+            "max_uses": cls.max_uses,
+        }
+
+    @classmethod
+    def start(cls):
+        """
+        启动所有工作进程(首次执行代码时自动调用)
+        """
+        with cls._lock:
+            if cls._started:
+                return
+            cls._idle = queue.Queue()
+            for _ in range(cls.size):
+                cls._idle.put(cls.spawn())
+            cls._started = True
+        atexit.register(cls.shutdown)
+
+    @classmethod
+    def spawn(cls) -> SandboxWorker:
+        # 启动新的解释器(不使用 fork), 避免继承多线程服务器的锁状态
+        return SandboxWorker(cls.options())
+
+    @classmethod
+    def replace(cls, worker: SandboxWorker):
+        """
+        结束工作进程, 并在后台启动新的进程补充到池中
+        """
+        worker.kill()
+        if (idle := cls._idle) is None:
+            return
+
+        def refill():
+            try:
+                idle.put(cls.spawn())
+            except (OSError, RuntimeError) as e:
+                logger.error(f"启动沙箱工作进程失败: {e}")
+
+        threading.Thread(target=refill, name="SandboxSpawn", daemon=True).start()
+
+    @classmethod
+    def execute(cls, code: str, timeout: float = None) -> dict:
+        """
+        在工作进程中执行代码
+        :param code: Python 代码, 可以把返回值赋给 result 变量
+        :param timeout: 超时时间(秒), 默认 SandboxPool.timeout
+        :return: {"executed", "result", "variables", "stdout", "stderr", "error"}
+        """
+        cls.start()
+        timeout = timeout or cls.timeout
+        deadline = time.monotonic() + timeout
+        try:
+            worker = cls._idle.get(timeout=timeout)
+        except queue.Empty:
+            return {"executed": False, "error": "No sandbox worker available"}
+        if not worker.alive():
+            cls.replace(worker)
+            return cls.execute(code, max(deadline - time.monotonic(), 0.1))
+        try:
+            worker.conn.send(code)
+            if not worker.conn.poll(max(deadline - time.monotonic(), 0)):
+                logger.warning(f"代码执行超时({timeout}s), 结束工作进程")
+                cls.replace(worker)
+                return {"executed": False, "error": f"Execution timed out after {timeout}s"}
+            response = worker.conn.recv()
+        except (EOFError, OSError):
+            cls.replace(worker)
+            exitcode = worker.exitcode()
+            return {"executed": False, "error": f"Sandbox worker crashed (exit code {exitcode}), possibly exceeding resource limits"}
+        worker.used += 1
+        if worker.used >= cls.max_uses:
+            cls.replace(worker)
+        else:
+            cls._idle.put(worker)
+        return response
+
+    @classmethod
+    def shutdown(cls):
+        with cls._lock:
+            if not cls._started:
+                return
+            cls._started = False
+            idle, cls._idle = cls._idle, None
+        while True:
+            try:
+                idle.get_nowait().kill()
+            except queue.Empty:
+                break
@@ -1,29 +1,59 @@
 import re
-import asyncio
 
-from functools import update_wrapper
+from functools import update_wrapper, wraps
 from typing import Callable
 from threading import Thread
 
 from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp.tools import Tool
 from .executor import Executor
+from .result_store import read_tool_result
 from logger import getLogger
+from metrics import MetricsExporter
 
 logger = getLogger("MCPServer")
 
+# 工具描述中的参数描述: - name: description.....\n
+PARAM_DESCRIPTION = re.compile(r"- (\w+): (.*)\n")
+
 
 class MakeTool:
     """
     装饰器, 用于将函数转换为工具
+    params: backend: str = None 执行方式, "thread"/"process" 时在线程池/进程池中执行
+    params: timeout: float = None 执行超时时间(秒), 仅在线程池/进程池中执行时有效
+    params: cacheable: bool = False 是否缓存结果(仅用于幂等工具), 相同参数在缓存时间内直接返回缓存
+    params: cache_ttl: float = None 缓存时间(秒), 为空时使用 ToolCache.ttl
+    params: cache_invalidator: Callable = None 失效检查函数, 例如 file_mtime("file_path")
     """
-    def __init__(self, func):
+    def __init__(
+        self,
+        func,
+        backend: str = None,
+        timeout: float = None,
+        cacheable: bool = False,
+        cache_ttl: float = None,
+        cache_invalidator: Callable = None,
+    ):
         self.executor = Executor.get()
         update_wrapper(self, func)
         self.func = func
+        self.backend = backend
+        self.timeout = timeout
+        self.cache = {"ttl": cache_ttl, "invalidator": cache_invalidator} if cacheable else None
 
     def __call__(self, *args, **kwargs):
-        return self.executor.send_function_call(self.func, kwargs)
+        return self.executor.send_function_call(self.func, kwargs, self.cache)
+
+    def as_async(self):
+        """
+        返回异步版本的工具函数, FastMCP 会在事件循环中等待其结果, 不阻塞其他客户端
+        """
+        @wraps(self.func)
+        async def wrapper(**kwargs):
+            return await self.executor.send_function_call_async(self.func, kwargs, self.backend, self.timeout, self.cache)
 
+        return wrapper
 
 class MCPServer(FastMCP):
     """
@@ -33,28 +63,50 @@ class MCPServer(FastMCP):
         super().__init__(*args, **settings)
         self.make_tool = MakeTool
 
-    def add_tool(self, *arg, **kwargs):
+    def add_tool(self, fn, name: str = None, description: str = None):
         """
         添加工具, 该方法会自动添加工具的描述信息
         """
-        
-        res = super().add_tool(*arg, **kwargs)
-        # self.list_tools 是异步方法
-        tool = asyncio.run(self.list_tools())[-1]
+        res = super().add_tool(fn, name=name, description=description)
+        # 直接修改新添加的工具, 不再每次列出全部工具(O(n))
+        if tool := self._tool_manager.get_tool(name or fn.__name__):
+            self.patch_tool_schema(tool)
+        return res
+
+    def add_tools(self, fns: list[Callable]) -> list[Tool]:
+        """
+        批量添加工具: 一次构建所有工具(包括参数描述), 再一次性写入工具表
+        已存在的同名工具保持不变
+        """
+        tools = {}
+        for fn in fns:
+            tool = Tool.from_function(fn)
+            if tool.name in tools or self._tool_manager.get_tool(tool.name):
+                logger.warning(f"Tool already exists: {tool.name}")
+                continue
+            self.patch_tool_schema(tool)
+            tools[tool.name] = tool
+        self._tool_manager._tools.update(tools)
+        return list(tools.values())
+
+    @staticmethod
+    def patch_tool_schema(tool):
+        """
+        从工具描述中获取参数描述, 写入参数的 JSON Schema
+        描述格式: - name: description.....\n
+        """
         try:
-            properties = tool.inputSchema["properties"]
-            description = tool.description
+            properties = tool.parameters["properties"]
+            descriptions = {}
+            for name, description in PARAM_DESCRIPTION.findall(tool.description):
+                descriptions.setdefault(name, description)
             for name, info in properties.items():
-                # - name: description.....\n
-                find_description = re.search(f"- {name}: (.*)\n", description)
-                if not find_description:
+                if name not in descriptions:
                     continue
-                info["description"] = find_description.group(1)
+                info["description"] = descriptions[name]
                 logger.debug(f"添加描述 - {name}: {info['description']}")
-                # 从description中获取属性描述
         except Exception as e:
             logger.warning(f"Build property description failed: {e}")
-        return res
 
 
 class Server:
@@ -67,6 +119,7 @@ class Server:
     params: tools: dict[Callable, None] = {}
     params: make_tool = MakeTool
     params: tool_wraper: None
+    params: metrics_port: int = None Prometheus 指标采集端口, 为空时不提供采集接口
     """
 
     @classmethod
@@ -74,7 +127,8 @@ class Server:
         self, 
         name: str = "MCPServer", 
         host: str = "localhost", 
-        port: int = 45677
+        port: int = 45677,
+        metrics_port: int = None,
         ):
         """
         初始化MCPServer, 创建MCPServer实例
@@ -82,6 +136,7 @@ class Server:
         self.name = name
         self.host = host
         self.port = port
+        self.metrics_port = metrics_port
         self.server = None
         self.tools = {}
         self.make_tool = MakeTool
@@ -95,25 +150,41 @@ class Server:
         """
         cls.server = MCPServer(name=cls.name, host=cls.host, port=cls.port)
         cls.tool_wraper = cls.server.tool()
+        # 内置工具: 分页读取超过一页的工具结果(直接返回文本, 不经过 Executor 再次序列化)
+        cls.server.add_tool(read_tool_result)
 
     @classmethod
-    def register_tool(cls, tool: Callable) -> None:
+    def register_tool(cls, tool: Callable, **options) -> None:
         """
         注册工具, 如果工具已经注册, 则不再注册
+        :param tool: 工具函数
+        :param options: 工具选项(覆盖 tool_options 装饰器声明的选项)
+            - backend: "thread"/"process" 在线程池/进程池中执行
+            - timeout: 执行超时时间(秒)
+            - cacheable/cache_ttl/cache_invalidator: 结果缓存, 见 MakeTool
         """
         if tool in cls.tools:
             return
-        t = cls.make_tool(tool)
+        options = {**getattr(tool, "__tool_options__", {}), **options}
+        t = cls.make_tool(tool, **options)
         cls.tools[tool] = t
-        cls.tool_wraper(t)
+        cls.tool_wraper(t.as_async() if t.backend else t)
 
     @classmethod
     def register_tools(cls, tools: list[Callable]) -> None:
         """
         （多个）注册工具, 如果工具已经注册, 则不再注册
+        所有工具的 Schema 一次构建完成后批量写入(MCPServer.add_tools)
         """
+        made = []
         for tool in tools:
-            cls.register_tool(tool)
+            if tool in cls.tools:
+                continue
+            options = getattr(tool, "__tool_options__", {})
+            t = cls.make_tool(tool, **options)
+            cls.tools[tool] = t
+            made.append(t.as_async() if t.backend else t)
+        cls.server.add_tools(made)
 
     @classmethod
     def unregister_tool(cls, tool: Callable) -> None:
@@ -140,6 +211,8 @@ class Server:
     def main(cls):
         if not cls.server:
             cls.init()
+        if getattr(cls, "metrics_port", None):
+            MetricsExporter.start(cls.host, cls.metrics_port)
         logger.info(f"MCPServer实例: {cls.name}正在运转...")
         cls.server.run(transport="sse")
 
@@ -1,4 +1,4 @@
-from .common import ToolsPackageBase
+from .common import ToolsPackageBase, tool_options
 from .common_tools import CommonTools
 # from .modifier_tools import ModifierTools
 
@@ -1,3 +1,16 @@
+def tool_options(**options):
+    """
+    声明工具的注册选项, 注册时由 Server.register_tool 读取
+    例: @tool_options(backend="thread", timeout=30)
+    :param options: 工具选项, 见 Server.register_tool
+    """
+    def decorator(func):
+        func.__tool_options__ = {**getattr(func, "__tool_options__", {}), **options}
+        return func
+
+    return decorator
+
+
 class ToolsPackageBase:
     """
     工具包基类，所有工具包都需要继承这个类
@@ -1,5 +1,181 @@
+import fnmatch
+import os
+import re
+import stat
+import threading
+import time
 import traceback
-from .common import ToolsPackageBase
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from ..cache import file_mtime
+from .common import ToolsPackageBase, tool_options
+
+# get_files_info 返回的列
+FILE_INFO_COLUMNS = ("file_path", "size", "is_directory", "is_file", "last_modified")
+
+
+def _stat_path(path: str) -> tuple[tuple, str]:
+    """
+    对单个路径执行一次 stat
+    :return: ((size, is_directory, is_file, last_modified), 错误信息)
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return (None, None, None, None), "File not found"
+    except OSError as e:
+        return (None, None, None, None), e.strerror or str(e)
+    return (st.st_size, stat.S_ISDIR(st.st_mode), stat.S_ISREG(st.st_mode), st.st_mtime), ""
+
+
+class _DirectoryScan:
+    """
+    一次目录扫描的状态: 基于 os.scandir 的生成器, 分页时从上次的位置继续, 不重新列目录
+    """
+
+    def __init__(self, root: str, pattern: str, max_depth: int, include_stat: bool):
+        self.id = uuid.uuid4().hex[:12]
+        self.lock = threading.Lock()
+        self.used = time.monotonic()
+        self.closed = False
+        self.position = 0
+        # 上一页的结果, 用同一个游标重试时直接返回
+        self.last_cursor = ""
+        self.last_page: dict = None
+        self.match = re.compile(fnmatch.translate(pattern)).match if pattern and pattern != "*" else None
+        self.include_stat = include_stat
+        self.entries = self.walk(root, max_depth)
+
+    def walk(self, root: str, max_depth: int):
+        """
+        深度优先遍历, 同时打开的 scandir 句柄数量不超过 max_depth + 1
+        """
+        stack = [(os.scandir(root), "", 0)]
+        try:
+            while stack:
+                iterator, prefix, depth = stack[-1]
+                entry = next(iterator, None)
+                if entry is None:
+                    iterator.close()
+                    stack.pop()
+                    continue
+                name = prefix + entry.name
+                # is_dir/is_symlink 使用 scandir 返回的类型信息, 不额外调用 stat
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if self.match is None or self.match(entry.name):
+                    yield self.describe(entry, name, is_dir)
+                if is_dir and depth < max_depth:
+                    try:
+                        stack.append((os.scandir(entry.path), name + "/", depth + 1))
+                    except OSError:
+                        # 无权限等, 跳过该子目录
+                        pass
+        finally:
+            for iterator, _, _ in stack:
+                iterator.close()
+
+    def describe(self, entry: os.DirEntry, name: str, is_dir: bool) -> dict:
+        if is_dir:
+            kind = "dir"
+        elif entry.is_symlink():
+            kind = "link"
+        else:
+            kind = "file"
+        info = {"name": name, "type": kind}
+        if self.include_stat:
+            try:
+                # Windows 上由 scandir 直接提供; Linux/macOS 上每个条目需要一次额外的 lstat, 因此默认不返回
+                st = entry.stat(follow_symlinks=False)
+                info["size"] = st.st_size
+                info["mtime"] = st.st_mtime
+            except OSError:
+                pass
+        return info
+
+    def next_page(self, cursor: str, limit: int) -> dict:
+        with self.lock:
+            if self.closed:
+                raise ValueError(f"Cursor expired: {cursor}, restart the listing without a cursor")
+            self.used = time.monotonic()
+            if cursor and cursor == self.last_cursor and self.last_page is not None:
+                return self.last_page
+            if cursor and cursor != self.cursor():
+                raise ValueError(f"Invalid cursor: {cursor}")
+            entries = []
+            for entry in self.entries:
+                entries.append(entry)
+                if len(entries) >= limit:
+                    break
+            self.last_cursor = cursor
+            self.position += len(entries)
+            done = len(entries) < limit
+            self.last_page = {
+                "entries": entries,
+                "offset": self.position - len(entries),
+                "next_cursor": None if done else self.cursor(),
+            }
+            return self.last_page
+
+    def cursor(self) -> str:
+        return f"{self.id}:{self.position}"
+
+    def close(self):
+        # 持有锁关闭, 避免与其它线程正在执行的 next_page 同时操作生成器
+        with self.lock:
+            self.closed = True
+            self.entries.close()
+
+
+class _DirectoryScans:
+    """
+    保存进行中的目录扫描, 超时或数量超出时关闭最早的扫描
+    """
+    max_scans = 32
+    ttl = 300
+
+    _lock = threading.Lock()
+    _scans: OrderedDict[str, _DirectoryScan] = OrderedDict()
+
+    @classmethod
+    def start(cls, root: str, pattern: str, max_depth: int, include_stat: bool) -> _DirectoryScan:
+        scan = _DirectoryScan(root, pattern, max_depth, include_stat)
+        with cls._lock:
+            evicted = cls._evict(1)
+            cls._scans[scan.id] = scan
+        cls._close(evicted)
+        return scan
+
+    @classmethod
+    def get(cls, cursor: str) -> _DirectoryScan:
+        scan_id = cursor.split(":", 1)[0]
+        with cls._lock:
+            evicted = cls._evict(0)
+            scan = cls._scans.get(scan_id)
+            if scan:
+                cls._scans.move_to_end(scan_id)
+        cls._close(evicted)
+        if not scan:
+            raise ValueError(f"Cursor expired: {cursor}, restart the listing without a cursor")
+        return scan
+
+    @classmethod
+    def _evict(cls, incoming: int) -> list[_DirectoryScan]:
+        """
+        从列表中移除过期/超出数量的扫描(调用方持有锁), 返回的扫描由调用方在释放锁后关闭
+        """
+        deadline = time.monotonic() - cls.ttl
+        evicted = []
+        for scan_id, scan in list(cls._scans.items()):
+            if scan.used > deadline and len(cls._scans) + incoming <= cls.max_scans:
+                break
+            evicted.append(cls._scans.pop(scan_id))
+        return evicted
+
+    @staticmethod
+    def _close(scans: list[_DirectoryScan]):
+        for scan in scans:
+            scan.close()
 
 
 class CommonTools(ToolsPackageBase):
@@ -7,6 +183,7 @@ class CommonTools(ToolsPackageBase):
     (备注) 常用工具包
     """
 
+    @tool_options(cacheable=True, cache_ttl=300)
     def get_system_info() -> dict:
         """
         cn: 获取系统信息
@@ -23,53 +200,85 @@ class CommonTools(ToolsPackageBase):
             "current_directory": os.getcwd(),
         }
 
+    # 只有一次 stat, 缓存的失效检查同样需要 stat, 因此不缓存
+    @tool_options(backend="thread")
     def get_file_info(file_path: str) -> dict:
         """
         cn: 获取文件信息
         en: Get file information
         """
-        import os
-
         try:
-            if not os.path.exists(file_path):
-                raise FileNotFoundError(f"File not found: {file_path}")
-
+            # 一次 stat 获取全部信息
+            st = os.stat(file_path)
             file_info = {
                 "file_path": file_path,
-                "size": os.path.getsize(file_path),
-                "is_directory": os.path.isdir(file_path),
-                "is_file": os.path.isfile(file_path),
-                "last_modified": os.path.getmtime(file_path),
+                "size": st.st_size,
+                "is_directory": stat.S_ISDIR(st.st_mode),
+                "is_file": stat.S_ISREG(st.st_mode),
+                "last_modified": st.st_mtime,
             }
             return file_info
+        except FileNotFoundError:
+            return {"error": f"File not found: {file_path}"}
         except Exception as e:
             print(f"Error in get_file_info: {str(e)}")
             traceback.print_exc()
             return {"error": str(e)}
 
+    @tool_options(backend="thread")
+    def get_files_info(file_paths: list[str], workers: int = 0) -> dict:
+        """
+        cn: 批量获取文件信息(按列返回)
+        en: Get information about many files at once. Results are returned column by column, one row per path.
+
+        Args:
+        - file_paths: The list of file paths
+        - workers: Number of threads used to stat files (useful on network filesystems, 0 = sequential)
+        """
+        try:
+            workers = min(max(int(workers), 0), 32)
+            if workers > 1 and len(file_paths) > 1:
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="FileInfo") as pool:
+                    results = list(pool.map(_stat_path, file_paths))
+            else:
+                results = [_stat_path(path) for path in file_paths]
+            columns = {name: [] for name in FILE_INFO_COLUMNS}
+            errors = {}
+            for path, (info, error) in zip(file_paths, results):
+                columns["file_path"].append(path)
+                for name, value in zip(FILE_INFO_COLUMNS[1:], info):
+                    columns[name].append(value)
+                if error:
+                    errors[path] = error
+            return {"count": len(file_paths), "columns": columns, "errors": errors}
+        except Exception as e:
+            print(f"Error in get_files_info: {str(e)}")
+            return {"error": str(e)}
+
+    @tool_options(backend="thread", timeout=60)
     def execute_python_code(code: str) -> dict:
         """
         cn: 执行Python代码
-        en:Execute arbitrary Python code.
+        en:Execute arbitrary Python code in a sandboxed worker process. Assign the return value to `result`; stdout/stderr are captured.
 
         Args:
         - code: The Python code to execute
         """
-        # This is powerful but potentially dangerous - use with caution
+        # 在沙箱工作进程中执行(资源/时间受限), 崩溃或死循环不会影响服务器
+        from ..sandbox import SandboxPool
+
         try:
-            # Create a local namespace for execution
-            namespace = {}
-            exec(code, namespace)
-            return {"executed": True, "namespace": namespace}
+            return SandboxPool.execute(code)
         except Exception as e:
             print(f"Error in execute_python_code: {str(e)}")
             traceback.print_exc()
             return {"error": str(e)}
 
+    @tool_options(backend="thread", cacheable=True, cache_invalidator=file_mtime("directory_path"))
     def list_directory_contents(directory_path: str) -> dict:
         """
-        cn: 列出目录内容
-        en: List the contents of a directory.
+        cn: 列出目录内容(大目录请使用 scan_directory 分页读取)
+        en: List the contents of a directory. Use scan_directory for large directories.
 
         Args:
         - directory_path: The path of the directory to list
@@ -85,4 +294,34 @@ class CommonTools(ToolsPackageBase):
         except Exception as e:
             print(f"Error in list_directory_contents: {str(e)}")
             traceback.print_exc()
-            return {"error": str(e)}
\ No newline at end of file
+            return {"error": str(e)}
+
+    @tool_options(backend="thread")
+    def scan_directory(
+        directory_path: str, pattern: str = "*", max_depth: int = 0, cursor: str = "", limit: int = 200, include_stat: bool = False
+    ) -> dict:
+        """
+        cn: 分页列出目录内容(支持通配符过滤和递归)
+        en: List a directory page by page, with optional glob filter and depth-limited recursion.
+
+        Args:
+        - directory_path: The path of the directory to list
+        - pattern: Glob pattern matched against entry names, e.g. *.py
+        - max_depth: How many levels of subdirectories to recurse into (0 = only this directory)
+        - cursor: The next_cursor returned by the previous page, empty for the first page
+        - limit: Maximum number of entries per page (1-1000)
+        - include_stat: Include size and mtime for each entry (costs one extra stat call per entry on Linux/macOS, off by default)
+        """
+        try:
+            limit = min(max(int(limit), 1), 1000)
+            if cursor:
+                scan = _DirectoryScans.get(cursor)
+            else:
+                if not os.path.isdir(directory_path):
+                    raise FileNotFoundError(f"Directory not found: {directory_path}")
+                scan = _DirectoryScans.start(directory_path, pattern, max(int(max_depth), 0), include_stat)
+            page = scan.next_page(cursor, limit)
+            return {"directory": directory_path, **page}
+        except Exception as e:
+            print(f"Error in scan_directory: {str(e)}")
+            return {"error": str(e)}
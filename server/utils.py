@@ -1,18 +1,74 @@
 import json
 
-def rounding_dumps(obj, *args, precision=2, **kwargs):
+from metrics import Metrics
+
+
+def json_default(obj):
+    """
+    备注: 将无法直接序列化的对象转换为JSON兼容的对象
+    :param obj: 要转换的对象
+    :return: 转换后的对象
+    """
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, (bytes, bytearray)):
+        return obj.decode("utf-8", errors="replace")
+    # numpy 数组/标量等
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    return str(obj)
+
+
+def round_floats(obj, precision=2, default=json_default):
+    """
+    备注: 遍历对象(只遍历一次), 将浮点数四舍五入到指定精度, 并将非JSON类型交给 default 转换
+    :param obj: 要处理的对象
+    :param precision: 浮点数精度, 默认2位小数
+    :param default: 非JSON类型的转换函数, 为空时遇到非JSON类型抛出 TypeError
+    :return: 只包含JSON类型的新对象
+    """
+    markers = set()
+
+    def walk(o):
+        t = type(o)
+        if t is float:
+            return round(o, precision)
+        if t is str or t is int or t is bool or o is None:
+            return o
+        if isinstance(o, (list, tuple, dict)):
+            marker = id(o)
+            if marker in markers:
+                raise ValueError("Circular reference detected")
+            markers.add(marker)
+            # 浮点数直接在推导式中处理, 减少大数组的函数调用
+            if isinstance(o, dict):
+                result = {k: round(v, precision) if type(v) is float else walk(v) for k, v in o.items()}
+            else:
+                result = [round(v, precision) if type(v) is float else walk(v) for v in o]
+            markers.discard(marker)
+            return result
+        if isinstance(o, float):
+            return round(float(o), precision)
+        if isinstance(o, (str, int)):
+            return o
+        if default is None:
+            raise TypeError(f"Object of type {t.__name__} is not JSON serializable")
+        return walk(default(o))
+
+    return walk(obj)
+
+
+@Metrics.timed("server_serialize_seconds")
+def rounding_dumps(obj, *args, precision=2, default=json_default, **kwargs):
     """
     备注: 将对象序列化为JSON字符串, 并将浮点数四舍五入到指定精度
     :param obj: 要序列化的对象
     :param args: 其他参数
     :param precision: 浮点数精度, 默认2位小数
+    :param default: 非JSON类型的转换函数, 默认转换为字符串等JSON兼容的对象
     :param kwargs: 其他参数
     :return: 序列化后的JSON字符串
     """
-    # 先将对象序列化为JSON字符串, 然后再将字符串反序列化为对象, 最后再将对象序列化为JSON字符串
-    # 这样可以避免浮点数精度丢失的问题
-    # 但是会导致字符串中的浮点数精度丢失, 所以需要将字符串中的浮点数四舍五入到指定精度
-
-    d1 = json.dumps(obj, *args, **kwargs)
-    l1 = json.loads(d1, parse_float=lambda x: round(float(x), precision))
-    return json.dumps(l1, *args, **kwargs)
\ No newline at end of file
+    # 先遍历一次对象完成四舍五入和类型转换, 再交给 json 的C实现序列化
+    # 避免 序列化 -> 反序列化 -> 再序列化 的三次完整处理
+    return json.dumps(round_floats(obj, precision, default), *args, **kwargs)
@@ -3,6 +3,8 @@ from client.siliconflow import MCPClientSiliconflow
 LLM_QUESTION_URL_CONFIG = "https://api.siliconflow.cn"
 MODEL_NAME = "Qwen/Qwen2.5-7B-Instruct"
 API_KEY = "sk-"
+# 客户端指标(首包时间, 请求耗时等)的采集端口, 服务器使用 45678
+METRICS_PORT = 45679
 
 def create_client_instance(mcp_url: str, llm_api_url: str, llm_api_key: str, llm_model: str, llm_stream: bool) -> MCPClientSiliconflow:
     """
@@ -16,6 +18,7 @@ def create_client_instance(mcp_url: str, llm_api_url: str, llm_api_key: str, llm
     client.model = llm_model  # LLM的模型名称
     client.stream = llm_stream  # 是否启用流式传输
     client.mcp_url = mcp_url  # MCP服务器的URL
+    client.metrics_port = METRICS_PORT  # Prometheus 指标采集端口
     return client
 
 def main():
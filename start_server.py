@@ -7,7 +7,7 @@ logger = getLogger("MCPServer_1111")
 
 if __name__ == "__main__":
     # 创建 Server 实例
-    server = Server(name="MCPServer_11111", host="localhost", port=45677)
+    server = Server(name="MCPServer_11111", host="localhost", port=45677, metrics_port=45678)
 
     # 获取 CommonTools 中的所有工具
     tools = CommonTools.get_all_tools()
@@ -0,0 +1,226 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+
+# 将上一级目录加入到 Python 搜索路径中
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from client.openai import MCPClientOpenAI
+from client.output import OutputSink
+from mock_llm_server import DEFAULT_CONFIG, run as run_mock_llm
+
+# 端到端基准测试: 本地模拟大模型服务 + 本地 MCP 服务器(CommonTools) + MCPClientOpenAI
+# 统计首包时间, 每轮工具调用耗时, 吞吐量(查询/秒) 及每个查询的CPU时间
+
+
+def run_mcp_server(port: int):
+    from server.server import Server
+    from server.tools.common_tools import CommonTools
+
+    Server(name="MCPServer_Benchmark", host="127.0.0.1", port=port)
+    Server.register_tools(CommonTools.get_all_tools())
+    with contextlib.redirect_stdout(io.StringIO()):
+        Server.run(block=True)
+
+
+def wait_port(port: int, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with socket.socket() as s:
+            if s.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise TimeoutError(f"Port {port} not ready")
+
+
+def process_cpu_time(pid: int) -> float:
+    """
+    读取子进程的CPU时间(仅Linux, 其他平台返回0)
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError):
+        return 0.0
+
+
+class BenchmarkClient(MCPClientOpenAI):
+    """
+    记录首包时间和工具调用耗时的客户端
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.query_start = 0.0
+        self.first_token = None
+        self.ttft: list[float] = []
+        self.tool_latency: list[float] = []
+
+    def fork(self):
+        conversation = super().fork()
+        conversation.first_token = None
+        return conversation
+
+    def mark_first_token(self):
+        if self.first_token is None:
+            self.first_token = time.perf_counter()
+            self.root().ttft.append(self.first_token - self.query_start)
+
+    def push_stream_message(self, message):
+        self.mark_first_token()
+
+    def append_tool_call(self, index, tool_call):
+        self.mark_first_token()
+        super().append_tool_call(index, tool_call)
+
+    async def process_query(self, query):
+        self.query_start = time.perf_counter()
+        self.first_token = None
+        return await super().process_query(query)
+
+    async def execute_tool_call(self, tool_call, parser=None):
+        start = time.perf_counter()
+        try:
+            return await super().execute_tool_call(tool_call, parser)
+        finally:
+            self.root().tool_latency.append(time.perf_counter() - start)
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def summary(values: list[float]) -> dict:
+    return {
+        "count": len(values),
+        "mean_ms": round(statistics.mean(values) * 1000, 2) if values else 0.0,
+        "p50_ms": round(percentile(values, 0.5) * 1000, 2),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+    }
+
+
+def run_benchmark(queries: int, concurrency: int, llm_port: int, mcp_port: int, warmup: int = 2, pids: dict = None) -> dict:
+    """
+    运行基准测试
+    :param pids: 需要统计CPU时间的子进程 {名称: pid}
+    """
+    pids = pids or {}
+    client = BenchmarkClient()
+    client.base_url = f"http://127.0.0.1:{llm_port}"
+    client.api_key = "mock"
+    client.model = "mock"
+    client.mcp_url = f"http://127.0.0.1:{mcp_port}/sse"
+    client.max_concurrency = concurrency
+    # 不输出流式内容, 只统计客户端本身的开销
+    client.output = OutputSink()
+    BenchmarkClient.try_start_client()
+    # 丢弃客户端的其他打印
+    with contextlib.redirect_stdout(io.StringIO()):
+        for future in [client.submit("warmup", f"warmup-{i}") for i in range(warmup)]:
+            future.result(60)
+        client.ttft.clear()
+        client.tool_latency.clear()
+        latency = []
+        # 闭环提交: 同时最多 concurrency 个查询在执行, 延迟从实际提交开始计算, 不包含排队时间
+        in_flight = threading.Semaphore(concurrency)
+
+        def done(start):
+            def callback(_):
+                latency.append(time.perf_counter() - start)
+                in_flight.release()
+            return callback
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        pid_cpu_start = {name: process_cpu_time(pid) for name, pid in pids.items()}
+        futures = []
+        for i in range(queries):
+            in_flight.acquire()
+            future = client.submit(f"benchmark query {i}", f"conversation-{i % concurrency}")
+            future.add_done_callback(done(time.perf_counter()))
+            futures.append(future)
+        for future in futures:
+            future.result(600)
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        pid_cpu = {name: process_cpu_time(pid) - pid_cpu_start[name] for name, pid in pids.items()}
+    BenchmarkClient.stop_client()
+    result = {
+        "queries": queries,
+        "concurrency": concurrency,
+        "wall_s": round(wall, 3),
+        "throughput_qps": round(queries / wall, 2),
+        "client_cpu_ms_per_query": round(cpu / queries * 1000, 2),
+        "query_latency": summary(latency),
+        "time_to_first_token": summary(client.ttft),
+        "tool_round_latency": summary(client.tool_latency),
+    }
+    for name, value in pid_cpu.items():
+        result[f"{name}_cpu_ms_per_query"] = round(value / queries * 1000, 2)
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="MCP 客户端端到端基准测试")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--llm-port", type=int, default=45980)
+    parser.add_argument("--mcp-port", type=int, default=45981)
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出结果")
+    for key, value in DEFAULT_CONFIG.items():
+        if isinstance(value, list):
+            parser.add_argument(f"--{key.replace('_', '-')}", nargs="*", default=value)
+        else:
+            parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), default=value)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = {key: getattr(args, key) for key in DEFAULT_CONFIG}
+    ctx = multiprocessing.get_context("spawn")
+    mock = ctx.Process(target=run_mock_llm, args=("127.0.0.1", args.llm_port, config), daemon=True)
+    server = ctx.Process(target=run_mcp_server, args=(args.mcp_port,), daemon=True)
+    mock.start()
+    server.start()
+    try:
+        wait_port(args.llm_port)
+        wait_port(args.mcp_port)
+        pids = {"server": server.pid, "mock_llm": mock.pid}
+        result = run_benchmark(args.queries, args.concurrency, args.llm_port, args.mcp_port, pids=pids)
+        result["config"] = config
+    finally:
+        for process in (mock, server):
+            # uvicorn 会等待未关闭的 SSE 连接, 超时后强制结束
+            process.terminate()
+            process.join(5)
+            if process.is_alive():
+                process.kill()
+    try:
+        if args.json:
+            print(json.dumps(result, ensure_ascii=False, indent=2))
+        else:
+            for key, value in result.items():
+                print(f"{key:>28}: {value}")
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # 输出被管道截断(例如 | head), 避免退出时再次写入失败
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    return result
+
+
+if __name__ == '__main__':
+    main()
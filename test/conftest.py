@@ -0,0 +1,70 @@
+import os
+import socket
+import sys
+import threading
+import time
+
+import pytest
+
+# 将上一级目录加入到 Python 搜索路径中
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn
+from mock_llm_server import create_app
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class MockLLM:
+    """
+    在后台线程中运行的 mock_llm_server
+    params: url: str 服务地址(作为客户端的 base_url)
+    """
+
+    def __init__(self, config: dict = None):
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.server = uvicorn.Server(uvicorn.Config(create_app(config), host="127.0.0.1", port=self.port, log_level="error"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        deadline = time.monotonic() + 10
+        while not self.server.started:
+            if time.monotonic() > deadline:
+                raise TimeoutError("mock llm server did not start")
+            time.sleep(0.02)
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(5)
+
+
+@pytest.fixture
+def mock_llm():
+    """
+    启动 mock 服务的工厂: mock_llm(config) -> MockLLM, 测试结束后自动关闭
+    """
+    servers = []
+
+    def start(config: dict = None) -> MockLLM:
+        server = MockLLM(config).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def unused_url() -> str:
+    """
+    没有服务监听的地址(连接失败)
+    """
+    return f"http://127.0.0.1:{free_port()}"
@@ -0,0 +1,61 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 导入耗时基准测试: 每个场景在新的解释器中执行, 统计导入耗时的中位数和最大值
+# 可以配合 python -X importtime -c "import client" 查看各模块的耗时
+
+SCENARIOS = {
+    "import client": "import client",
+    "get_client_by_name": "import client; client.MCPClientBase.get_client_by_name('MCPClientDeepSeek')",
+    "get_enum_items": "import client; client.MCPClientBase.get_enum_items()",
+    "import mcp": "import mcp",
+    "import httpx": "import httpx",
+}
+
+TEMPLATE = """
+import sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+print(elapsed, "mcp" in sys.modules, sum(name.startswith("client.") for name in sys.modules))
+"""
+
+
+def measure(code: str) -> tuple[float, bool, int]:
+    """
+    在新的解释器中执行代码
+    :return: (耗时, 是否导入了 mcp, 导入的 client 子模块数量)
+    """
+    output = subprocess.run(
+        [sys.executable, "-c", TEMPLATE.format(root=ROOT, code=code)],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.strip().splitlines()[-1]
+    elapsed, mcp_loaded, modules = output.split()
+    return float(elapsed), mcp_loaded == "True", int(modules)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导入耗时基准测试")
+    parser.add_argument("--repeat", type=int, default=10, help="每个场景的执行次数")
+    parser.add_argument("--scenario", nargs="*", default=list(SCENARIOS), choices=list(SCENARIOS))
+    args = parser.parse_args()
+
+    print(f"{'场景':<20}{'中位数(ms)':>12}{'最大值(ms)':>12}{'mcp':>6}{'client模块':>12}")
+    for name in args.scenario:
+        results = [measure(SCENARIOS[name]) for _ in range(args.repeat)]
+        times = [elapsed * 1000 for elapsed, _, _ in results]
+        _, mcp_loaded, modules = results[-1]
+        print(f"{name:<20}{statistics.median(times):>12.1f}{max(times):>12.1f}{str(mcp_loaded):>6}{modules:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import argparse
+import asyncio
+import json
+import time
+
+import sys
+import os
+# 将上一级目录加入到 Python 搜索路径中
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+# 本地模拟的 OpenAI 兼容流式服务, 用于基准测试(不访问真实的大模型服务商)
+DEFAULT_CONFIG = {
+    "chunk_size": 4,  # 每个 content 分片的字符数
+    "token_delay": 0.005,  # 分片之间的间隔(秒)
+    "first_token_delay": 0.05,  # 首个分片前的延迟(秒)
+    "answer_size": 200,  # 最终文本回复的字符数
+    "tool_rounds": 1,  # 每个查询的工具调用轮数
+    "tools": ["get_system_info", "get_file_info"],  # 每轮调用的工具
+    "argument_size": 0,  # execute_python_code 代码参数的额外字符数
+    "argument_chunk_size": 8,  # 工具参数分片的字符数
+    "error_status": 0,  # 不为 0 时所有对话请求返回该状态码和不含 message 的JSON错误(测试故障转移/重试)
+}
+
+
+def build_arguments(name: str, config: dict) -> str:
+    """
+    构造工具调用参数
+    """
+    if name == "get_file_info":
+        return json.dumps({"file_path": "."})
+    if name == "list_directory_contents":
+        return json.dumps({"directory_path": "."})
+    if name == "execute_python_code":
+        padding = "# " + "x" * config["argument_size"] + "\n" if config["argument_size"] else ""
+        return json.dumps({"code": padding + "result = sum(range(100))\n"})
+    return "{}"
+
+
+def chunk(delta: dict, finish_reason=None) -> str:
+    data = {
+        "id": "mock",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": "mock",
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(data)}\n\n"
+
+
+def tool_rounds_done(messages: list) -> int:
+    """
+    统计最后一条用户消息之后已经完成的工具调用轮数
+    """
+    rounds = 0
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            break
+        if message.get("role") == "assistant" and message.get("tool_calls"):
+            rounds += 1
+    return rounds
+
+
+def create_app(config: dict = None) -> Starlette:
+    """
+    创建模拟服务
+    :param config: 配置, 见 DEFAULT_CONFIG
+    """
+    config = {**DEFAULT_CONFIG, **(config or {})}
+
+    async def stream_tool_calls():
+        for index, name in enumerate(config["tools"]):
+            call = {"index": index, "id": f"call_{index}", "type": "function", "function": {"name": name, "arguments": ""}}
+            yield chunk({"role": "assistant", "content": None, "tool_calls": [call]})
+            arguments = build_arguments(name, config)
+            size = config["argument_chunk_size"]
+            for i in range(0, len(arguments), size):
+                await asyncio.sleep(config["token_delay"])
+                yield chunk({"tool_calls": [{"index": index, "function": {"arguments": arguments[i:i + size]}}]})
+        yield chunk({}, "tool_calls")
+
+    async def stream_answer():
+        answer = ("mock answer " * (config["answer_size"] // 12 + 1))[:config["answer_size"]]
+        size = config["chunk_size"]
+        yield chunk({"role": "assistant", "content": ""})
+        for i in range(0, len(answer), size):
+            await asyncio.sleep(config["token_delay"])
+            yield chunk({"content": answer[i:i + size]})
+        yield chunk({}, "stop")
+
+    async def chat_completions(request: Request):
+        if config["error_status"]:
+            return JSONResponse({"error": {"code": "mock_error", "type": "server_error"}}, status_code=config["error_status"])
+        body = await request.json()
+        # 每个工具调用对应一条 assistant 消息
+        rounds = tool_rounds_done(body.get("messages", [])) // max(len(config["tools"]), 1)
+        use_tools = body.get("tools") and config["tools"] and rounds < config["tool_rounds"]
+
+        async def generate():
+            await asyncio.sleep(config["first_token_delay"])
+            async for line in stream_tool_calls() if use_tools else stream_answer():
+                yield line
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(generate(), media_type="text/event-stream")
+
+    async def models(request: Request):
+        return JSONResponse({"object": "list", "data": [{"id": "mock", "object": "model"}]})
+
+    return Starlette(
+        routes=[
+            Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+            Route("/v1/models", models, methods=["GET"]),
+        ]
+    )
+
+
+def run(host="127.0.0.1", port=45980, config: dict = None):
+    uvicorn.run(create_app(config), host=host, port=port, log_level="warning")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="模拟的 OpenAI 兼容流式服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=45980)
+    for key, value in DEFAULT_CONFIG.items():
+        if isinstance(value, list):
+            parser.add_argument(f"--{key.replace('_', '-')}", nargs="*", default=value)
+        else:
+            parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), default=value)
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    run(args.host, args.port, {key: getattr(args, key) for key in DEFAULT_CONFIG})
@@ -0,0 +1,143 @@
+import json
+
+import pytest
+
+from client.history import SUMMARY_PREFIX, HistoryManager
+from client.message import make_message
+
+SYSTEM = {"role": "system", "content": "you are a helpful assistant"}
+
+
+def tool_turn(index: int, result_size: int = 2000, calls: int = 2) -> list:
+    """
+    一轮对话: user -> assistant(tool_calls) -> tool 结果 -> assistant 回复
+    """
+    ids = [f"call_{index}_{i}" for i in range(calls)]
+    turn = [
+        {"role": "user", "content": f"question {index}"},
+        {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [{"id": call_id, "type": "function", "function": {"name": "get_file_info", "arguments": '{"file_path": "a"}'}} for call_id in ids],
+        },
+    ]
+    turn += [{"role": "tool", "tool_call_id": call_id, "name": "get_file_info", "content": "x" * result_size} for call_id in ids]
+    turn.append({"role": "assistant", "content": f"answer {index}"})
+    return [make_message(message) for message in turn]
+
+
+def conversation(turns: int, **kwargs) -> list:
+    messages = [make_message(SYSTEM)]
+    for index in range(turns):
+        messages += tool_turn(index, **kwargs)
+    return messages
+
+
+def assert_tool_pairs(messages: list):
+    """
+    每个 tool 消息都有对应的 tool_calls, 每个 tool_calls 都有结果
+    """
+    call_ids = set()
+    for message in messages:
+        for tool_call in message.get("tool_calls") or ():
+            call_ids.add(tool_call["id"])
+        if message.get("role") == "tool":
+            assert message["tool_call_id"] in call_ids, f"orphaned tool message: {message['tool_call_id']}"
+    result_ids = {message["tool_call_id"] for message in messages if message.get("role") == "tool"}
+    assert call_ids <= result_ids, f"unanswered tool calls: {call_ids - result_ids}"
+
+
+def test_under_budget_returns_same_list():
+    history = HistoryManager(max_tokens=100000)
+    messages = conversation(3)
+    assert history.compact(messages) is messages
+    # max_tokens 为 0 时不压缩
+    messages = conversation(50)
+    assert HistoryManager(max_tokens=0).compact(messages) is messages
+
+
+@pytest.mark.parametrize("max_tokens", [300, 800, 2000, 5000])
+def test_compact_stays_under_budget(max_tokens):
+    history = HistoryManager(max_tokens=max_tokens)
+    messages = conversation(20)
+    original = json.dumps(messages)
+
+    compacted = history.compact(messages)
+
+    assert history.total_tokens(compacted) <= max_tokens
+    # 原列表不会被修改
+    assert json.dumps(messages) == original
+    assert_tool_pairs(compacted)
+
+
+def test_keeps_system_message_and_latest_turn():
+    history = HistoryManager(max_tokens=500, keep_turns=1)
+    messages = conversation(10)
+
+    compacted = history.compact(messages)
+
+    assert compacted[0] == SYSTEM
+    latest = [message for message in compacted if message.get("role") == "user"][-1]
+    assert latest["content"] == "question 9"
+    assert compacted[-1]["content"] == "answer 9"
+
+
+def test_summary_placeholder_for_dropped_turns():
+    history = HistoryManager(max_tokens=800)
+    compacted = history.compact(conversation(10))
+
+    summaries = [message for message in compacted if str(message.get("content")).startswith(SUMMARY_PREFIX)]
+    assert len(summaries) == 1
+    assert summaries[0]["role"] == "system"
+    assert "- question 0" in summaries[0]["content"]
+
+    # 再次压缩时合并之前的摘要, 不会出现多条摘要
+    messages = compacted + tool_turn(10) + tool_turn(11)
+    compacted = history.compact(messages)
+    summaries = [message for message in compacted if str(message.get("content")).startswith(SUMMARY_PREFIX)]
+    assert len(summaries) == 1
+    assert "- question 0" in summaries[0]["content"]
+    assert_tool_pairs(compacted)
+
+
+def test_old_tool_results_are_collapsed_before_dropping_turns():
+    history = HistoryManager(max_tokens=1500, keep_turns=1, tool_result_chars=100, preview_chars=10)
+    compacted = history.compact(conversation(3))
+
+    # 折叠后所有对话都能保留
+    assert [message["content"] for message in compacted if message.get("role") == "user"] == ["question 0", "question 1", "question 2"]
+    tool_contents = [message["content"] for message in compacted if message.get("role") == "tool"]
+    assert all("已折叠" in content for content in tool_contents[:-2])
+    assert tool_contents[-1] == "x" * 2000
+
+
+def test_current_turn_tool_results_are_collapsed_last():
+    history = HistoryManager(max_tokens=1500, keep_tool_results=1)
+    messages = [make_message(SYSTEM)] + tool_turn(0, result_size=3000, calls=4)
+
+    compacted = history.compact(messages)
+
+    tool_contents = [message["content"] for message in compacted if message.get("role") == "tool"]
+    assert len(tool_contents) == 4
+    assert all("已折叠" in content for content in tool_contents[:3])
+    assert tool_contents[3] == "x" * 3000
+    assert_tool_pairs(compacted)
+
+    # 最近的结果本身超出预算时也折叠
+    compacted = HistoryManager(max_tokens=600, keep_tool_results=1).compact(messages)
+    assert all("已折叠" in message["content"] for message in compacted if message.get("role") == "tool")
+    assert history.total_tokens(compacted) <= 600
+
+
+def test_repair_tool_pairs():
+    messages = conversation(1)
+    # 缺少一个结果的 tool_calls 和没有对应调用的 tool 消息都会被删除
+    broken = [message for message in messages if message.get("tool_call_id") != "call_0_1"]
+    broken.append(make_message({"role": "tool", "tool_call_id": "orphan", "content": "?"}))
+
+    repaired = HistoryManager.repair_tool_pairs(broken)
+
+    assert not any(message.get("tool_calls") for message in repaired)
+    assert not any(message.get("role") == "tool" for message in repaired)
+    assert_tool_pairs(repaired)
+    assert HistoryManager.repair_tool_pairs(messages) == messages
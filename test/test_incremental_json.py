@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from client.utils import IncrementalJsonParser, lenient_json_loads
+
+
+def feed_all(chunks: list) -> IncrementalJsonParser:
+    parser = IncrementalJsonParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser
+
+
+def split(text: str, size: int) -> list:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+ARGUMENTS = {
+    "path": "C:\\temp\\{x}.txt",
+    "code": 'print("}")\nresult = [1, {"a": 2}]',
+    "nested": {"list": [1, 2, {"deep": "]"}], "quote": '\\"'},
+}
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_complete_only_when_top_level_object_closes(size):
+    text = json.dumps(ARGUMENTS)
+    chunks = split(text, size)
+    parser = IncrementalJsonParser()
+    for chunk in chunks[:-1]:
+        assert not parser.feed(chunk)
+    assert parser.feed(chunks[-1])
+    assert parser.ok()
+    assert parser.result() == ARGUMENTS
+
+
+def test_escape_at_chunk_boundary():
+    # 转义符位于分片末尾, 被转义的引号在下一个分片开头
+    parser = feed_all(['{"a": "x\\', '"}', '"}'])
+    assert parser.complete
+    assert parser.result() == {"a": 'x"}'}
+
+
+def test_incomplete_arguments():
+    parser = feed_all(['{"a": ', '"b'])
+    assert not parser.complete
+    assert not parser.ok()
+
+
+def test_trailing_text_after_object_is_ignored():
+    parser = feed_all(['{"a": 1}', "  trailing"])
+    assert parser.result() == {"a": 1}
+
+
+def test_not_an_object():
+    parser = feed_all(["  ", "[1, 2]"])
+    assert parser.complete
+    assert not parser.ok()
+    with pytest.raises(json.JSONDecodeError):
+        parser.result()
+
+
+def test_lenient_parsing():
+    assert feed_all(["{'a': True, ", "'b': None}"]).result() == {"a": True, "b": None}
+    assert lenient_json_loads('{"a": [1, 2,],}') == {"a": [1, 2]}
+    with pytest.raises(json.JSONDecodeError):
+        lenient_json_loads("{not json")
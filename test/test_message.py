@@ -0,0 +1,94 @@
+import copy
+import json
+import pickle
+
+import pytest
+
+from client.base import MCPClientBase
+from client.message import FrozenDict, Message, freeze, make_message
+
+
+def sample() -> dict:
+    return {
+        "role": "assistant",
+        "content": "x" * 1000,
+        "tool_calls": [{"id": "call_0", "function": {"name": "f", "arguments": "{}"}}],
+    }
+
+
+@pytest.mark.parametrize("mutate", [
+    lambda m: m.__setitem__("role", "user"),
+    lambda m: m.__delitem__("role"),
+    lambda m: m.update(role="user"),
+    lambda m: m.pop("role"),
+    lambda m: m.popitem(),
+    lambda m: m.setdefault("name", "x"),
+    lambda m: m.clear(),
+    lambda m: m.__ior__({"role": "user"}),
+    lambda m: m["tool_calls"][0].__setitem__("id", "other"),
+    lambda m: m["tool_calls"][0]["function"].update(name="g"),
+])
+def test_mutation_raises(mutate):
+    message = make_message(sample())
+    with pytest.raises(TypeError):
+        mutate(message)
+    assert json.loads(json.dumps(message)) == sample()
+
+
+def test_nested_lists_become_tuples():
+    message = make_message(sample())
+    assert isinstance(message, Message)
+    assert isinstance(message["tool_calls"], tuple)
+    assert isinstance(message["tool_calls"][0], FrozenDict)
+    with pytest.raises(AttributeError):
+        message["tool_calls"].append({})
+
+
+def test_content_is_shared_not_copied():
+    original = sample()
+    message = make_message(original)
+    assert message["content"] is original["content"]
+    # 修改原字典不影响只读消息
+    original["tool_calls"].append({"id": "call_1"})
+    assert len(message["tool_calls"]) == 1
+
+
+def test_make_message_is_idempotent():
+    message = make_message(sample())
+    assert make_message(message) is message
+    assert freeze(message) is message
+
+
+def test_json_dumps_matches_plain_dict():
+    message = make_message(sample())
+    assert json.loads(json.dumps(message)) == sample()
+    assert json.dumps(message) == json.dumps(sample())
+
+
+def test_copy_and_pickle():
+    message = make_message(sample())
+    # 只读消息可以共享, 复制时直接返回自身
+    assert copy.copy(message) is message
+    assert copy.deepcopy(message) is message
+    assert copy.deepcopy({"messages": [message]})["messages"][0] is message
+    restored = pickle.loads(pickle.dumps(message))
+    assert type(restored) is Message
+    assert restored == message
+    # 修改需要创建新的消息
+    changed = Message({**message, "content": "short"})
+    assert changed["content"] == "short"
+    assert message["content"] == "x" * 1000
+
+
+def test_push_message_stores_frozen_records():
+    client = MCPClientBase(register=False)
+    original = {"role": "user", "content": "hi", "images": ["a"]}
+    client.push_message(original)
+
+    stored = client.messages[-1]
+    assert type(stored) is Message
+    assert stored == {"role": "user", "content": "hi", "images": ("a",)}
+    with pytest.raises(TypeError):
+        stored["content"] = "changed"
+    original["content"] = "changed"
+    assert stored["content"] == "hi"
@@ -0,0 +1,91 @@
+import threading
+import time
+
+import pytest
+
+from client.model_cache import ModelCache
+from client.openai import MCPClientOpenAI
+
+
+@pytest.fixture(autouse=True)
+def model_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(ModelCache, "cache_dir", tmp_path)
+    monkeypatch.setattr(ModelCache, "ttl", 3600)
+    ModelCache.clear()
+    yield ModelCache
+    ModelCache.clear()
+
+
+class Fetcher:
+    """
+    记录调用次数的获取函数, 可以阻塞到 release() 以观察后台刷新
+    """
+
+    def __init__(self, models: list, block: bool = False):
+        self.models = models
+        self.calls = 0
+        self.released = threading.Event()
+        if not block:
+            self.released.set()
+
+    def __call__(self) -> list:
+        self.calls += 1
+        self.released.wait(5)
+        return list(self.models)
+
+    def release(self):
+        self.released.set()
+
+
+def test_fresh_entry_is_served_from_cache():
+    fetch = Fetcher(["b", "a"])
+    assert ModelCache.get("key", fetch) == ["a", "b"]
+    assert ModelCache.get("key", fetch) == ["a", "b"]
+    assert fetch.calls == 1
+
+
+def test_entry_survives_restart_on_disk():
+    ModelCache.get("key", Fetcher(["a"]))
+    ModelCache.clear()
+
+    fetch = Fetcher(["b"])
+    assert ModelCache.get("key", fetch) == ["a"]
+    assert fetch.calls == 0
+
+
+def test_stale_entry_returns_old_list_and_refreshes_in_background(monkeypatch):
+    ModelCache.get("key", Fetcher(["old"]))
+    monkeypatch.setattr(ModelCache, "ttl", 0)
+
+    fetch = Fetcher(["new"], block=True)
+    refreshed = []
+    # 刷新完成前返回旧列表, 重复调用只启动一个刷新任务
+    assert ModelCache.get("key", fetch, on_refresh=refreshed.append) == ["old"]
+    assert ModelCache.get("key", fetch) == ["old"]
+    fetch.release()
+
+    deadline = time.monotonic() + 5
+    while not refreshed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert refreshed == [["new"]]
+    assert fetch.calls == 1
+
+
+def test_failed_fetch_keeps_cached_list():
+    ModelCache.get("key", Fetcher(["a"]))
+    assert ModelCache.get("key", Fetcher([]), force=True) == ["a"]
+
+
+def test_client_uses_cache_of_current_provider(mock_llm, unused_url):
+    healthy = mock_llm()
+    client = MCPClientOpenAI(register=False)
+    # 构造函数最后会执行 reset_config, 之后再设置服务商
+    client.base_url = healthy.url
+    client.api_key = "k"
+    assert client.fetch_models() == ["mock"]
+
+    # 切换到不可用的服务商后不能继续返回之前服务商的列表
+    client.base_url = unused_url
+    assert client.fetch_models() == []
+    client.base_url = healthy.url
+    assert client.fetch_models() == ["mock"]
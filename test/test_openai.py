@@ -0,0 +1,52 @@
+import asyncio
+import json
+
+import httpx
+
+from client.openai import MCPClientOpenAI
+from client.output import OutputSink
+
+
+def sse(*chunks) -> bytes:
+    lines = [f"data: {json.dumps(chunk)}\n\n" if isinstance(chunk, dict) else chunk for chunk in chunks]
+    return "".join(lines).encode("utf-8") + b"data: [DONE]\n\n"
+
+
+def make_client(body: bytes) -> MCPClientOpenAI:
+    """
+    通过 httpx.MockTransport 返回固定流式响应的客户端(不连接 MCP 服务器)
+    """
+    client = MCPClientOpenAI(register=False)
+    client.base_url = "http://mock.invalid"
+    client.api_key = "k"
+    client.output = OutputSink()
+    # 没有服务器工具, prepare_tools 不需要 MCP 会话
+    client.server_tools = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=body, headers={"content-type": "text/event-stream"})
+
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    client.get_async_http_client = lambda: http_client
+    return client
+
+
+def test_process_query_skips_chunk_without_delta():
+    body = sse(
+        {"choices": [{"delta": {"role": "assistant", "content": "Hel"}}]},
+        {"choices": [{"delta": {}, "finish_reason": None}]},
+        {"choices": [{"finish_reason": None}]},
+        {"choices": [{"delta": {"content": "lo"}}]},
+        {"choices": [{"delta": {}, "finish_reason": "stop"}]},
+    )
+    client = make_client(body)
+
+    assert asyncio.run(client.process_query("hi")) == "Hello"
+
+
+def test_process_query_accepts_json_lines():
+    # 非 SSE 格式的流(例如 Ollama 原生接口): 每行一个JSON, 不包含 delta
+    body = b'{"model": "m", "message": {"content": "x"}, "done": false}\n{"done": true}\n'
+    client = make_client(body)
+
+    assert asyncio.run(client.process_query("hi")) == ""
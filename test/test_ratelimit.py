@@ -0,0 +1,166 @@
+import asyncio
+import time
+from email.utils import formatdate
+
+import httpx
+import pytest
+
+from client.openai import MCPClientOpenAI
+from client.ratelimit import AdaptiveConcurrency, RateLimiter, TokenBucket, parse_duration, parse_retry_after
+
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"retry-after": "3"}, 3),
+    ({"retry-after": "-1"}, 0),
+    ({"retry-after-ms": "250", "retry-after": "9"}, 0.25),
+    ({"x-ratelimit-reset-requests": "6m0s"}, 360),
+    ({"x-ratelimit-reset-tokens": "20ms"}, 0.02),
+    ({"retry-after": "soon"}, None),
+    ({}, None),
+])
+def test_parse_retry_after(headers, expected):
+    assert parse_retry_after(httpx.Headers(headers)) == pytest.approx(expected)
+
+
+def test_parse_retry_after_http_date():
+    headers = httpx.Headers({"retry-after": formatdate(time.time() + 10, usegmt=True)})
+    assert 8 <= parse_retry_after(headers) <= 10
+
+
+def test_parse_duration():
+    assert parse_duration("1h2m3.5s") == pytest.approx(3723.5)
+    assert parse_duration("1.5") == 1.5
+    with pytest.raises(ValueError):
+        parse_duration("3x")
+
+
+def test_token_bucket_reserves_and_refills():
+    bucket = TokenBucket(per_minute=60, capacity=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    # 透支: 先到的请求先获得令牌, 等待时间依次增加
+    assert bucket.reserve() == pytest.approx(1, abs=0.05)
+    assert bucket.reserve() == pytest.approx(2, abs=0.05)
+
+    bucket.refund(2)
+    bucket.updated -= 60
+    assert bucket.reserve() == 0
+    assert bucket.tokens <= bucket.capacity
+
+
+def test_token_bucket_unlimited():
+    bucket = TokenBucket(per_minute=0)
+    assert all(bucket.reserve(10 ** 6) == 0 for _ in range(3))
+
+
+def test_adaptive_concurrency_limits_in_flight_requests():
+    concurrency = AdaptiveConcurrency(2)
+    active = 0
+    peak = 0
+
+    async def request():
+        nonlocal active, peak
+        await concurrency.acquire()
+        try:
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+        finally:
+            concurrency.release()
+
+    async def main():
+        await asyncio.gather(*(request() for _ in range(6)))
+
+    asyncio.run(main())
+    assert peak == 2
+    assert concurrency.in_flight == 0
+
+
+def test_adaptive_concurrency_cancelled_waiter_does_not_leak():
+    concurrency = AdaptiveConcurrency(1)
+
+    async def main():
+        await concurrency.acquire()
+        waiter = asyncio.create_task(concurrency.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        concurrency.release()
+        # 取消的等待者不占用名额
+        await asyncio.wait_for(concurrency.acquire(), 1)
+        concurrency.release()
+
+    asyncio.run(main())
+    assert concurrency.in_flight == 0
+    assert not concurrency.waiters
+
+
+def test_adaptive_concurrency_aimd():
+    concurrency = AdaptiveConcurrency(8, min_limit=2, max_limit=10)
+    concurrency.decrease()
+    assert concurrency.limit == 4
+    # 同一批限流只减少一次
+    concurrency.decrease()
+    assert concurrency.limit == 4
+    concurrency.last_decrease = 0
+    concurrency.decrease()
+    concurrency.last_decrease = 0
+    concurrency.decrease()
+    assert concurrency.limit == 2
+
+    for _ in range(100):
+        concurrency.increase()
+    assert concurrency.limit == 10
+
+
+def run_request(client: MCPClientOpenAI):
+    async def main():
+        data = {"model": "", "messages": [{"role": "user", "content": "hi"}], "stream": True}
+        return [event async for event in client.request_stream(client.get_async_http_client(), data)]
+
+    return asyncio.run(main())
+
+
+def make_client(url: str) -> MCPClientOpenAI:
+    client = MCPClientOpenAI(register=False)
+    client.base_url = url
+    client.api_key = "k"
+    return client
+
+
+@pytest.mark.parametrize("status, retries", [(503, 2), (400, 0)])
+def test_retry_on_retryable_status_then_raise(mock_llm, status, retries):
+    server = mock_llm({"error_status": status})
+    RateLimiter.configure(server.url, max_retries=2, backoff_base=0.01)
+    client = make_client(server.url)
+    limiter = RateLimiter.get(client.get_chat_url())
+    errors = []
+    on_error = limiter.on_error
+    limiter.on_error = lambda *args: errors.append(args[0]) or on_error(*args)
+    on_success = []
+    limiter.on_success = lambda: on_success.append(True)
+
+    with pytest.raises(httpx.HTTPStatusError) as info:
+        run_request(client)
+
+    assert info.value.response.status_code == status
+    assert errors == [status] * retries
+    # 错误响应不算成功, 名额全部归还
+    assert not on_success
+    assert limiter.concurrency.in_flight == 0
+
+
+def test_success_counts_once(mock_llm):
+    server = mock_llm()
+    client = make_client(server.url)
+    limiter = RateLimiter.get(client.get_chat_url())
+    limit = limiter.concurrency.limit
+    limiter.concurrency.limit = limit - 1
+
+    events = run_request(client)
+
+    assert events[-1].data == b"[DONE]"
+    assert limiter.concurrency.limit > limit - 1
+    assert limiter.concurrency.in_flight == 0
@@ -0,0 +1,97 @@
+import re
+
+import pytest
+
+from server.result_store import ResultStore, read_tool_result
+
+FOOTER = re.compile(r"\n\[结果 (\w+) 共 (\d+) 字符, [^\]]*\]$")
+
+
+@pytest.fixture(autouse=True)
+def result_store(monkeypatch):
+    monkeypatch.setattr(ResultStore, "page_size", 10)
+    monkeypatch.setattr(ResultStore, "max_results", 64)
+    monkeypatch.setattr(ResultStore, "max_total_chars", 1000)
+    monkeypatch.setattr(ResultStore, "ttl", 600)
+    ResultStore.clear()
+    yield ResultStore
+    ResultStore.clear()
+
+
+def split_page(page: str) -> tuple[str, str]:
+    """
+    :return: (页面内容, 结果ID)
+    """
+    match = FOOTER.search(page)
+    assert match, page
+    return page[:match.start()], match.group(1)
+
+
+def test_small_result_is_not_stored():
+    assert ResultStore.paginate("tool", "short") == "short"
+    assert not ResultStore._results
+
+
+def test_read_all_pages():
+    text = "".join(str(i % 10) for i in range(35))
+    content, result_id = split_page(ResultStore.paginate("tool", text))
+    pages = [content]
+    offset = len(content)
+    while offset < len(text):
+        page = read_tool_result(result_id, offset)
+        content, _ = split_page(page)
+        pages.append(content)
+        offset += len(content)
+    assert "".join(pages) == text
+    assert "已读取到末尾" in page
+    assert [len(page) for page in pages] == [10, 10, 10, 5]
+
+
+def test_limit_is_capped_at_page_size():
+    result_id = split_page(ResultStore.paginate("tool", "x" * 50))[1]
+    assert split_page(ResultStore.read(result_id, 0, 3))[0] == "xxx"
+    assert split_page(ResultStore.read(result_id, 0, 1000))[0] == "x" * 10
+    assert split_page(read_tool_result(result_id, 45, 0))[0] == "x" * 5
+
+
+@pytest.mark.parametrize("offset, limit", [(-1, None), (0, -5), (51, None)])
+def test_invalid_offset_or_limit(offset, limit):
+    result_id = split_page(ResultStore.paginate("tool", "x" * 50))[1]
+    with pytest.raises(ValueError):
+        ResultStore.read(result_id, offset, limit)
+    assert read_tool_result(result_id, offset, limit or 0).startswith("Error:")
+
+
+def test_unknown_result():
+    with pytest.raises(KeyError):
+        ResultStore.read("missing")
+    assert read_tool_result("missing").startswith("Error:")
+
+
+def test_evict_oldest_when_full(monkeypatch):
+    monkeypatch.setattr(ResultStore, "max_results", 2)
+    ids = [split_page(ResultStore.paginate("tool", f"{i}" * 20))[1] for i in range(3)]
+    with pytest.raises(KeyError):
+        ResultStore.read(ids[0])
+    assert ResultStore.read(ids[2]).startswith("2" * 10)
+    assert ResultStore._total_chars == 40
+
+
+def test_evict_by_total_chars_and_truncate():
+    first = split_page(ResultStore.paginate("tool", "a" * 600))[1]
+    second = split_page(ResultStore.paginate("tool", "b" * 600))[1]
+    with pytest.raises(KeyError):
+        ResultStore.read(first)
+    assert ResultStore.read(second)
+
+    # 超过总字符数上限的结果只保留前 max_total_chars 字符
+    page = ResultStore.paginate("tool", "c" * 5000)
+    assert FOOTER.search(page).group(2) == "1000"
+
+
+def test_expired_result(monkeypatch):
+    result_id = split_page(ResultStore.paginate("tool", "x" * 50))[1]
+    monkeypatch.setattr(ResultStore, "ttl", -1)
+    with pytest.raises(KeyError):
+        ResultStore.read(result_id)
+    assert ResultStore._total_chars == 0
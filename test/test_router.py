@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+import pytest
+
+from client.ratelimit import RateLimiter
+from client.router import MCPClientRouter, ProviderUnavailable
+
+
+def make_router(urls: list, **kwargs) -> MCPClientRouter:
+    providers = [{"base_url": url, "api_key": "k", "model": f"model-{i}"} for i, url in enumerate(urls)]
+    return MCPClientRouter(providers=providers, register=False, **kwargs)
+
+
+async def collect(router: MCPClientRouter) -> tuple[list, float]:
+    """
+    :return: (事件列表, 首个事件的耗时)
+    """
+    data = {"model": "", "messages": [{"role": "user", "content": "hi"}], "stream": True}
+    start = time.perf_counter()
+    first = None
+    events = []
+    async for event in router.request_stream(router.get_async_http_client(), data):
+        if first is None:
+            first = time.perf_counter() - start
+        events.append(event)
+    return events, first
+
+
+@pytest.mark.parametrize("status", [500, 400])
+def test_failover_on_error_status_with_json_body(mock_llm, status):
+    broken = mock_llm({"error_status": status})
+    healthy = mock_llm()
+    # 不重试, 直接切换服务商
+    RateLimiter.configure(broken.url, max_retries=0)
+    router = make_router([broken.url, healthy.url])
+
+    events, _ = asyncio.run(collect(router))
+
+    assert events[-1].data == b"[DONE]"
+    assert b"mock_error" not in b"".join(event.data for event in events)
+    assert 0 in router.failed_at
+    assert 1 not in router.failed_at
+
+
+def test_failover_on_connection_error(mock_llm, unused_url):
+    healthy = mock_llm()
+    router = make_router([unused_url, healthy.url])
+
+    events, _ = asyncio.run(collect(router))
+
+    assert events[-1].data == b"[DONE]"
+    assert list(router.failed_at) == [0]
+    # 降级中的服务商排到最后
+    assert router.ordered_endpoints() == [1, 0]
+
+
+def test_all_providers_failed(mock_llm, unused_url):
+    broken = mock_llm({"error_status": 500})
+    RateLimiter.configure(broken.url, max_retries=0)
+    router = make_router([unused_url, broken.url])
+
+    with pytest.raises(ProviderUnavailable):
+        asyncio.run(collect(router))
+
+
+def test_hedged_request_uses_faster_provider(mock_llm):
+    slow = mock_llm({"first_token_delay": 2.0})
+    fast = mock_llm({"first_token_delay": 0.01})
+    router = make_router([slow.url, fast.url], hedge_delay=0.1)
+
+    events, first = asyncio.run(collect(router))
+
+    assert events[-1].data == b"[DONE]"
+    assert first < 1.0
+    # 对冲请求中落后的一方不算失败
+    assert not router.failed_at
+
+
+def test_without_hedging_waits_for_primary(mock_llm):
+    slow = mock_llm({"first_token_delay": 0.5})
+    fast = mock_llm({"first_token_delay": 0.01})
+    router = make_router([slow.url, fast.url])
+
+    _, first = asyncio.run(collect(router))
+
+    assert first >= 0.5
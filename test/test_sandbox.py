@@ -0,0 +1,102 @@
+import sys
+
+import pytest
+
+from server.sandbox import SandboxPool
+
+pytest.importorskip("resource", reason="资源限制仅支持 POSIX")
+
+BUSY_LOOP = """
+import time
+end = time.process_time() + {seconds}
+while time.process_time() < end:
+    pass
+result = "done"
+"""
+
+
+@pytest.fixture(autouse=True)
+def sandbox(monkeypatch):
+    monkeypatch.setattr(SandboxPool, "size", 1)
+    monkeypatch.setattr(SandboxPool, "timeout", 10)
+    monkeypatch.setattr(SandboxPool, "cpu_seconds", 1)
+    monkeypatch.setattr(SandboxPool, "memory_mb", 256)
+    monkeypatch.setattr(SandboxPool, "max_uses", 100)
+    SandboxPool.shutdown()
+    yield SandboxPool
+    SandboxPool.shutdown()
+
+
+def test_result_variables_and_output():
+    response = SandboxPool.execute("import math\nx = math.sqrt(16)\nprint('hi')\nresult = {'x': x, 'set': {1}}")
+    assert response["executed"]
+    assert response["stdout"] == "hi\n"
+    # 无法序列化为JSON的值转换为 repr
+    assert response["result"] == "{'x': 4.0, 'set': {1}}"
+    assert response["variables"] == {"x": 4.0}
+
+
+@pytest.mark.parametrize("code, expected", [
+    ("import math\nresult = math", "<module 'math'"),
+    ("def f():\n    pass\nresult = f", "<function f at"),
+    ("class Point:\n    pass\nresult = Point", "<class '__sandbox__.Point'>"),
+    ("result = object()", "<object object at"),
+])
+def test_result_that_is_not_json_serializable(code, expected):
+    response = SandboxPool.execute(code)
+    assert response["executed"]
+    assert response["result"].startswith(expected)
+    assert "result" not in response["variables"]
+
+
+def test_each_run_uses_a_new_namespace():
+    SandboxPool.execute("leftover = 1")
+    response = SandboxPool.execute("result = 'leftover' in globals()")
+    assert response["result"] is False
+
+
+def test_exception_is_reported():
+    response = SandboxPool.execute("1 / 0")
+    assert not response["executed"]
+    assert response["error"].startswith("ZeroDivisionError")
+    assert SandboxPool.execute("result = 1")["result"] == 1
+
+
+def test_worker_does_not_import_server():
+    response = SandboxPool.execute("import sys\nresult = sorted(name for name in sys.modules if name.split('.')[0] in ('mcp', 'server', 'client'))")
+    assert response["result"] == []
+
+
+def test_timeout_replaces_worker():
+    response = SandboxPool.execute("import time\ntime.sleep(5)", timeout=0.5)
+    assert not response["executed"]
+    assert "timed out" in response["error"]
+    assert SandboxPool.execute("result = 2")["result"] == 2
+
+
+def test_cpu_limit_is_per_run():
+    # 每次执行都在预算内, 总时间超过预算也不会被结束
+    for _ in range(3):
+        assert SandboxPool.execute(BUSY_LOOP.format(seconds=0.6))["result"] == "done"
+
+
+def test_cpu_limit_kills_runaway_code():
+    response = SandboxPool.execute(BUSY_LOOP.format(seconds=30))
+    assert not response["executed"]
+    assert "crashed" in response["error"]
+    assert SandboxPool.execute("result = 3")["result"] == 3
+
+
+@pytest.mark.skipif(sys.platform == "darwin", reason="macOS 不支持 RLIMIT_AS")
+def test_memory_limit():
+    response = SandboxPool.execute("data = bytearray(1024 * 1024 * 1024)")
+    assert not response["executed"]
+    assert "MemoryError" in response["error"]
+    assert SandboxPool.execute("result = 4")["result"] == 4
+
+
+def test_worker_restarts_after_max_uses(monkeypatch):
+    monkeypatch.setattr(SandboxPool, "max_uses", 2)
+    code = "import os\nresult = os.getpid()"
+    pids = [SandboxPool.execute(code)["result"] for _ in range(3)]
+    assert pids[0] == pids[1] != pids[2]
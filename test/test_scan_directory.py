@@ -0,0 +1,103 @@
+import pytest
+
+from server.tools.common_tools import CommonTools, _DirectoryScans
+
+scan_directory = CommonTools.scan_directory
+
+
+@pytest.fixture(autouse=True)
+def scans(monkeypatch):
+    monkeypatch.setattr(_DirectoryScans, "max_scans", 32)
+    monkeypatch.setattr(_DirectoryScans, "ttl", 300)
+    yield _DirectoryScans
+    with _DirectoryScans._lock:
+        scans = list(_DirectoryScans._scans.values())
+        _DirectoryScans._scans.clear()
+    _DirectoryScans._close(scans)
+
+
+@pytest.fixture
+def directory(tmp_path):
+    for i in range(25):
+        tmp_path.joinpath(f"file{i:02}.txt").write_text("x" * i)
+    sub = tmp_path.joinpath("sub")
+    sub.mkdir()
+    sub.joinpath("a.py").write_text("pass")
+    sub.joinpath("b.txt").write_text("")
+    return tmp_path
+
+
+def read_all(path, limit: int, **kwargs) -> list:
+    pages = [scan_directory(str(path), limit=limit, **kwargs)]
+    while pages[-1].get("next_cursor"):
+        pages.append(scan_directory(str(path), cursor=pages[-1]["next_cursor"], limit=limit))
+    return pages
+
+
+def test_pages_continue_from_cursor(directory):
+    pages = read_all(directory, 10)
+
+    assert [len(page["entries"]) for page in pages] == [10, 10, 6]
+    assert [page["offset"] for page in pages] == [0, 10, 20]
+    names = [entry["name"] for page in pages for entry in page["entries"]]
+    assert sorted(names) == sorted([f"file{i:02}.txt" for i in range(25)] + ["sub"])
+    assert pages[-1]["next_cursor"] is None
+
+
+def test_last_full_page_is_followed_by_empty_page(directory):
+    pages = read_all(directory, 13)
+    assert [len(page["entries"]) for page in pages] == [13, 13, 0]
+
+
+def test_same_cursor_returns_same_page(directory):
+    first = scan_directory(str(directory), limit=5)
+    second = scan_directory(str(directory), cursor=first["next_cursor"], limit=5)
+    # 重试同一个游标(例如响应丢失)得到相同的结果, 不会跳过条目
+    assert scan_directory(str(directory), cursor=first["next_cursor"], limit=5) == second
+    third = scan_directory(str(directory), cursor=second["next_cursor"], limit=5)
+    assert third["offset"] == 10
+    # 更早的游标无法再使用
+    assert "Invalid cursor" in scan_directory(str(directory), cursor=first["next_cursor"], limit=5)["error"]
+
+
+def test_unknown_cursor():
+    assert "Cursor expired" in scan_directory("", cursor="missing:10")["error"]
+
+
+def test_expired_scan_is_closed(directory, monkeypatch):
+    first = scan_directory(str(directory), limit=5)
+    scan = _DirectoryScans._scans[first["next_cursor"].split(":")[0]]
+    monkeypatch.setattr(_DirectoryScans, "ttl", -1)
+
+    assert "Cursor expired" in scan_directory(str(directory), cursor=first["next_cursor"], limit=5)["error"]
+    assert scan.closed
+    with pytest.raises(ValueError, match="Cursor expired"):
+        scan.next_page(first["next_cursor"], 5)
+
+
+def test_oldest_scan_is_evicted(directory, monkeypatch):
+    monkeypatch.setattr(_DirectoryScans, "max_scans", 2)
+    cursors = [scan_directory(str(directory), limit=5)["next_cursor"] for _ in range(3)]
+
+    assert "Cursor expired" in scan_directory(str(directory), cursor=cursors[0], limit=5)["error"]
+    for cursor in cursors[1:]:
+        assert scan_directory(str(directory), cursor=cursor, limit=5)["offset"] == 5
+    assert len(_DirectoryScans._scans) == 2
+
+
+@pytest.mark.parametrize("limit, expected", [(0, 1), (-3, 1), (7, 7), (5000, 26)])
+def test_limit_is_clamped(directory, limit, expected):
+    assert len(scan_directory(str(directory), limit=limit)["entries"]) == expected
+
+
+def test_pattern_depth_and_stat(directory):
+    pages = read_all(directory, 100, pattern="*.py", max_depth=1)
+    assert [entry for page in pages for entry in page["entries"]] == [{"name": "sub/a.py", "type": "file"}]
+
+    entries = scan_directory(str(directory), pattern="file03.txt", include_stat=True)["entries"]
+    assert entries[0]["size"] == 3
+    assert "mtime" in entries[0]
+
+
+def test_missing_directory(tmp_path):
+    assert "Directory not found" in scan_directory(str(tmp_path.joinpath("missing")))["error"]
@@ -0,0 +1,61 @@
+import pytest
+
+from client.sse import SSEParser
+
+STREAM = (
+    b": keep-alive\n"
+    b"data: {\"a\": 1}\n\n"
+    b"event: ping\nid: 7\nretry: 1500\ndata: x\n\n"
+    b"data: line1\ndata:line2\n\n"
+    b"data: \xe4\xbd\xa0\xe5\xa5\xbd\n\n"
+    b"data: [DONE]\n\n"
+)
+
+
+def parse(chunks: list) -> list:
+    parser = SSEParser()
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    events.extend(parser.close())
+    return events
+
+
+def split(data: bytes, size: int) -> list:
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("newline", [b"\n", b"\r\n", b"\r"])
+@pytest.mark.parametrize("size", [1, 2, 5, 10000])
+def test_events_across_chunks_and_line_endings(newline, size):
+    events = parse(split(STREAM.replace(b"\n", newline), size))
+
+    assert [event.data for event in events] == [b'{"a": 1}', b"x", b"line1\nline2", "你好".encode("utf-8"), b"[DONE]"]
+    assert [event.event for event in events] == ["message", "ping", "message", "message", "message"]
+    ping = events[1]
+    assert (ping.id, ping.retry) == ("7", 1500)
+    # id 和 retry 对后续事件保持有效
+    assert events[-1].id == "7"
+
+
+def test_only_one_space_is_stripped():
+    events = parse([b"data:  two spaces\n\n", b"data:none\n\n"])
+    assert [event.data for event in events] == [b" two spaces", b"none"]
+
+
+def test_unterminated_event_is_dispatched_on_close():
+    parser = SSEParser()
+    assert parser.feed(b"data: partial") == []
+    assert [event.data for event in parser.close()] == [b"partial"]
+
+
+def test_invalid_fields_are_ignored():
+    events = parse([b"retry: soon\nid: a\0b\nunknown: 1\ndata: x\n\n"])
+    assert len(events) == 1
+    assert (events[0].id, events[0].retry) == (None, None)
+
+
+def test_json_lines_without_sse_framing():
+    # 例如 Ollama 原生接口: 每行一个JSON
+    events = parse([b'{"a": 1}\n{"b"', b': 2}\n{"c": 3}'])
+    assert [event.data for event in events] == [b'{"a": 1}', b'{"b": 2}', b'{"c": 3}']
@@ -0,0 +1,163 @@
+import asyncio
+import os
+
+import pytest
+
+from server.cache import ToolCache, canonical_key, file_mtime
+from server.executor import Executor
+
+
+@pytest.fixture(autouse=True)
+def tool_cache(monkeypatch):
+    monkeypatch.setattr(ToolCache, "max_size", 512)
+    monkeypatch.setattr(ToolCache, "ttl", 60)
+    monkeypatch.setattr(ToolCache, "max_entry_chars", 1_000_000)
+    ToolCache.invalidate()
+    yield ToolCache
+    ToolCache.invalidate()
+
+
+def cached(name: str, params: dict, result: str, invalidator=None, ttl: float = None):
+    key, token, hit = ToolCache.lookup(name, params, invalidator)
+    assert hit is None
+    ToolCache.store(key, token, result, ttl)
+
+
+def test_lookup_and_store():
+    cached("tool", {"a": 1, "b": [1, 2]}, "result")
+    # 参数顺序不影响缓存键
+    assert ToolCache.lookup("tool", {"b": [1, 2], "a": 1})[2] == "result"
+    assert ToolCache.lookup("tool", {"a": 2, "b": [1, 2]})[2] is None
+    assert ToolCache.lookup("other", {"a": 1, "b": [1, 2]})[2] is None
+
+
+def test_long_params_use_digest():
+    name, text = canonical_key("tool", {"code": "x" * 1000})
+    assert len(text) == 64
+    assert canonical_key("tool", {"code": "x" * 1000}) == (name, text)
+    assert canonical_key("tool", {"code": "y" * 1000}) != (name, text)
+
+
+def test_ttl_expiry():
+    cached("tool", {}, "short", ttl=-1)
+    assert ToolCache.lookup("tool", {})[2] is None
+    # 过期的条目在查询时被删除
+    assert ToolCache.stats()["size"] == 0
+
+    cached("tool", {}, "default")
+    assert ToolCache.lookup("tool", {})[2] == "default"
+
+
+def test_lru_eviction(monkeypatch):
+    monkeypatch.setattr(ToolCache, "max_size", 2)
+    cached("tool", {"i": 0}, "0")
+    cached("tool", {"i": 1}, "1")
+    # 访问后变为最近使用
+    assert ToolCache.lookup("tool", {"i": 0})[2] == "0"
+    cached("tool", {"i": 2}, "2")
+
+    assert ToolCache.lookup("tool", {"i": 1})[2] is None
+    assert ToolCache.lookup("tool", {"i": 0})[2] == "0"
+    assert ToolCache.lookup("tool", {"i": 2})[2] == "2"
+
+
+def test_large_or_non_string_results_are_not_stored(monkeypatch):
+    monkeypatch.setattr(ToolCache, "max_entry_chars", 10)
+    cached("tool", {"i": 0}, "x" * 11)
+    cached("tool", {"i": 1}, {"not": "serialized"})
+    assert ToolCache.stats()["size"] == 0
+
+
+def test_file_mtime_invalidator(tmp_path):
+    path = tmp_path.joinpath("a.txt")
+    path.write_text("one")
+    invalidator = file_mtime("file_path")
+    params = {"file_path": str(path)}
+    cached("read", params, "one", invalidator)
+    assert ToolCache.lookup("read", params, invalidator)[2] == "one"
+
+    path.write_text("three")
+    assert ToolCache.lookup("read", params, invalidator)[2] is None
+
+    cached("read", params, "three", invalidator)
+    # 只修改时间变化也会失效
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert ToolCache.lookup("read", params, invalidator)[2] is None
+
+
+def test_file_mtime_with_path_list_and_missing_file(tmp_path):
+    paths = [str(tmp_path.joinpath(name)) for name in ("a", "b")]
+    tmp_path.joinpath("a").write_text("a")
+    invalidator = file_mtime("file_paths")
+    params = {"file_paths": paths}
+    cached("read", params, "only a", invalidator)
+    assert ToolCache.lookup("read", params, invalidator)[2] == "only a"
+
+    # 之前不存在的文件被创建后失效
+    tmp_path.joinpath("b").write_text("b")
+    assert ToolCache.lookup("read", params, invalidator)[2] is None
+
+
+def test_invalidate_by_name():
+    cached("a", {}, "a")
+    cached("b", {}, "b")
+    ToolCache.invalidate("a")
+    assert ToolCache.lookup("a", {})[2] is None
+    assert ToolCache.lookup("b", {})[2] == "b"
+
+
+class Counter:
+    def __init__(self, result):
+        self.result = result
+        self.calls = 0
+        self.__name__ = "counter"
+
+    def __call__(self, **params):
+        self.calls += 1
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+@pytest.mark.parametrize("result", [{"value": 1}, "text", [1, 2]])
+def test_executor_caches_results(result):
+    func = Counter(result)
+    executor = Executor.get()
+    first = executor.send_function_call(func, {"x": 1}, cache={"ttl": 60})
+    assert executor.send_function_call(func, {"x": 1}, cache={"ttl": 60}) == first
+    assert func.calls == 1
+
+
+def test_executor_does_not_cache_errors():
+    executor = Executor.get()
+    # 工具返回的错误信息不缓存
+    func = Counter({"error": "temporary"})
+    executor.send_function_call(func, {}, cache={"ttl": 60})
+    executor.send_function_call(func, {}, cache={"ttl": 60})
+    assert func.calls == 2
+
+    # 工具抛出的异常不缓存
+    func = Counter(RuntimeError("boom"))
+    for _ in range(2):
+        with pytest.raises(Exception, match="boom"):
+            executor.send_function_call(func, {}, cache={"ttl": 60})
+    assert func.calls == 2
+    assert ToolCache.stats()["size"] == 0
+
+
+def test_executor_async_cache_with_invalidator(tmp_path):
+    path = tmp_path.joinpath("a.txt")
+    path.write_text("one")
+    func = Counter({"value": 1})
+    cache = {"ttl": 60, "invalidator": file_mtime("file_path")}
+
+    async def call():
+        return await Executor.get().send_function_call_async(func, {"file_path": str(path)}, "thread", cache=cache)
+
+    first = asyncio.run(call())
+    assert asyncio.run(call()) == first
+    assert func.calls == 1
+    path.write_text("changed")
+    asyncio.run(call())
+    assert func.calls == 2